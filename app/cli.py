@@ -1,42 +1,36 @@
 import argparse
 import ast
+import glob
 import json
 import os
 from pathlib import Path
 from typing import Optional, TextIO
 
-import jsonschema
-import yaml
 from pathvalidate import is_valid_filepath
 from pathvalidate.argparse import validate_filepath_arg
 
-from app.utils.main_schema_gen import generate_main_schema
-from app.utils.model_generator import generate_model
-from app.utils.rest_generator import generate_router
-from app.utils.schema_validate import is_subset
+# subcommand dependencies (jsonschema, datamodel-code-generator, black, jinja2, pydantic) are imported
+# inside the subcommands, so that --help and gen-rest do not pay for what they don't use
 
 main_schema_filename = os.path.dirname(os.path.abspath(__file__)) + "/schemas/main_schema.json"
+SCHEMA_SUFFIXES = (".json", ".yaml", ".yml")
 
 
 def main(argv: Optional[list[str]] = None) -> int:
-    if not Path(main_schema_filename).exists():
-        print(f"Main schema file '{main_schema_filename}' doesn't exist, generating it...")
-        generate_main_schema(main_schema_filename)
-
     parser = init_parser()
     args = parser.parse_args(argv)
 
     validate_arguments(parser, args)
 
     if args.subcommand == 'gen-models':
-        gen_models(parser, args)
-    elif args.subcommand == 'gen-rest':
-        gen_rest(parser, args)
-
-    return 1
+        return gen_models(parser, args)
+    return gen_rest(parser, args)
 
 
 def validate_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.jobs < 1:
+        parser.error('--jobs must be a positive number')
+
     if args.subcommand == 'gen-models':
         if args.json_schema == '':
             parser.error('--json-schema is missing required argument')
@@ -69,42 +63,132 @@ def create_output_dir_if_not_exists(path: str) -> None:
 
 
 def gen_models(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
-    create_output_dir_if_not_exists(args.out_dir)
+    from concurrent.futures import ProcessPoolExecutor
 
-    try:
-        with open(main_schema_filename) as main_schema_file, open(args.json_schema) as user_schema_file:
-            main_schema = json.load(main_schema_file)
-            jsonschema.Draft202012Validator.check_schema(main_schema)
+    import jsonschema
 
-            user_schema = get_user_schema(args.json_schema, user_schema_file)
-            jsonschema.Draft202012Validator.check_schema(user_schema)
+    from app.utils.manifest import Manifest, generator_version
+
+    if not Path(main_schema_filename).exists():
+        from app.utils.main_schema_gen import generate_main_schema
+
+        print(f"Main schema file '{main_schema_filename}' doesn't exist, generating it...")
+        generate_main_schema(main_schema_filename)
 
-            if is_subset(user_schema, main_schema):
-                generate_model(user_schema, args.json_schema, args.out_dir)
-            else:
-                parser.error(f"{args.json_schema} is not a subset of {main_schema_filename}")
+    filenames = find_schema_files(args.json_schema)
+    if not filenames:
+        parser.error(f"No schemas found for '{args.json_schema}'")
+    create_output_dir_if_not_exists(args.out_dir)
 
+    try:
+        main_schema_source = Path(main_schema_filename).read_text()
+        main_schema = json.loads(main_schema_source)
+        jsonschema.Draft202012Validator.check_schema(main_schema)
     except FileNotFoundError as fnf:
         parser.error(f"{fnf.filename} not found")
     except json.decoder.JSONDecodeError:
-        parser.error(f"{args.json_schema} is not a valid JSON file")
+        parser.error(f"{main_schema_filename} is not a valid JSON file")
     except jsonschema.exceptions.ValidationError as ve:
         parser.error(ve.message)
 
+    manifest = Manifest(args.out_dir)
+    version = generator_version()
+    digests = {filename: schema_fingerprint(filename, main_schema_source, version) for filename in filenames}
+    stale = [
+        filename
+        for filename in filenames
+        if args.force or not manifest.is_fresh(str(Path(filename).resolve()), digests[filename])
+    ]
+    if len(filenames) > len(stale):
+        print(f"Skipped {len(filenames) - len(stale)} unchanged schema(s), use --force to regenerate them")
+
+    if len(stale) <= 1 or args.jobs == 1:
+        results = [gen_model(filename, main_schema, args.out_dir) for filename in stale]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [executor.submit(gen_model, filename, main_schema, args.out_dir) for filename in stale]
+            results = [future.result() for future in futures]
+
+    errors = []
+    for filename, (error, outputs) in zip(stale, results):
+        key = str(Path(filename).resolve())
+        if error is None:
+            manifest.record(key, digests[filename], outputs)
+        else:
+            manifest.entries.pop(key, None)
+            errors.append((filename, error))
+    manifest.save()
+    report_errors(parser, errors, len(filenames), "schemas")
+
     return 0
 
 
+def find_schema_files(pattern: str) -> list[str]:
+    if Path(pattern).is_dir():
+        return sorted(str(path) for path in Path(pattern).iterdir() if path.suffix in SCHEMA_SUFFIXES)
+    if glob.has_magic(pattern):
+        return sorted(filename for filename in glob.glob(pattern) if Path(filename).is_file())
+    return [pattern]
+
+
+def schema_fingerprint(filename: str, main_schema_source: str, version: str) -> str:
+    from app.utils.manifest import fingerprint
+
+    try:
+        return fingerprint(Path(filename).read_bytes(), main_schema_source, version)
+    except OSError:
+        return ""
+
+
+def gen_model(filename: str, main_schema: dict, out_dir: str) -> tuple[Optional[str], list[str]]:
+    import jsonschema
+    import yaml
+
+    from app.utils.model_generator import generate_model
+    from app.utils.schema_validate import is_subset
+    from app.utils.validator_generator import generate_validator
+
+    try:
+        with open(filename) as user_schema_file:
+            user_schema = get_user_schema(filename, user_schema_file)
+            jsonschema.Draft202012Validator.check_schema(user_schema)
+
+            if not is_subset(user_schema, main_schema):
+                return f"{filename} is not a subset of {main_schema_filename}", []
+            kind = generate_model(user_schema, filename, out_dir)
+            generate_validator(user_schema, kind, out_dir)
+
+    except FileNotFoundError as fnf:
+        return f"{fnf.filename} not found", []
+    except (json.decoder.JSONDecodeError, yaml.YAMLError):
+        return f"{filename} is not a valid {'YAML' if filename.endswith(('.yaml', '.yml')) else 'JSON'} file", []
+    except (jsonschema.exceptions.ValidationError, jsonschema.exceptions.SchemaError) as ve:
+        return ve.message, []
+    except Exception as exc:
+        # raised in a worker it would abort the whole pool, possibly as an unpicklable exception
+        return f"{filename}: {type(exc).__name__}: {exc}", []
+
+    return None, [f"{kind}Model.py", f"{kind}Validator.py"]
+
+
 def gen_rest(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.utils.manifest import Manifest, fingerprint, generator_version
+    from app.utils.rest_generator import template_path
+
     create_output_dir_if_not_exists(args.rest_routes)
     abs_directory = Path(args.models).resolve()
+    rest_routes_directory = Path(args.rest_routes).resolve()
+    manifest = Manifest(args.rest_routes)
+    template = template_path(args.use_async).read_text()
+    version = generator_version()
     routers = []
-    for path in abs_directory.glob("*.py"):
-        if path.name == "__init__.py":
+    stale = []
+    for path in sorted(abs_directory.glob("*.py")):
+        if path.name == "__init__.py" or path.name.endswith("Validator.py"):
             continue
         abs_path = path.resolve()
-        if not is_valid_python_file(abs_path):
-            parser.error(f"{abs_path} is not a valid Python file")
-
         filename = path.name
         try:
             module_name, _ = filename.split(".py")
@@ -115,25 +199,76 @@ def gen_rest(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
             parser.error(f"{abs_path} is not a valid model file. The filename must be <ModelKind>Model.py")
             exit(1)
 
+        if not (abs_directory / f"{kind}Validator.py").exists():
+            parser.error(
+                f"{abs_directory / f'{kind}Validator.py'} not found, regenerate the model via gen-models command"
+            )
+
         model_dir = get_module_dir(abs_directory, module_name)
         values = {
             'model_dir': model_dir,
+            'validator_dir': get_module_dir(abs_directory, f"{kind}Validator"),
             'main_model': kind,
             'kind': kind.lower(),
         }
-        print(f"generating router for {abs_path} with values: {values}")
-        generate_router(values, kind, args.rest_routes)
-        router_dir = get_module_dir(Path(args.rest_routes).resolve(), kind + "Router")
+        # the model source is part of the fingerprint so that unchanged models are not parsed again
+        digest = fingerprint(template, json.dumps(values, sort_keys=True), abs_path.read_bytes(), version)
+        if args.force or not manifest.is_fresh(f"{kind}Router.py", digest):
+            stale.append((abs_path, values, kind, digest))
+        router_dir = get_module_dir(rest_routes_directory, kind + "Router")
         routers.append((router_dir, kind + "Router"))
-    insert_routers_into_init_file(routers)
+
+    if len(routers) > len(stale):
+        print(f"Skipped {len(routers) - len(stale)} unchanged router(s), use --force to regenerate them")
+
+    tasks = [(abs_path, values, kind, args.rest_routes, args.use_async) for abs_path, values, kind, _ in stale]
+    if len(tasks) <= 1 or args.jobs == 1:
+        results = [gen_router(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(gen_router, *zip(*tasks)))
+
+    errors = []
+    for (abs_path, _, kind, digest), error in zip(stale, results):
+        if error is None:
+            manifest.record(f"{kind}Router.py", digest, [f"{kind}Router.py"])
+        else:
+            manifest.entries.pop(f"{kind}Router.py", None)
+            errors.append((str(abs_path), error))
+    manifest.save()
+    report_errors(parser, errors, len(routers), "models")
+
+    insert_routers_into_init_file(rest_routes_directory, routers)
     return 0
 
 
-def insert_routers_into_init_file(routers: list[tuple[str, str]]) -> None:
-    with open('__init__.py', 'w') as f:
-        for router_dir, router in routers:
-            f.write(f'from {router_dir} import router as {router}\n')
-        f.write(f"\n\n__all__ = [{', '.join(r[1] for r in routers)}]\n")
+def gen_router(abs_path: Path, values: dict[str, str], kind: str, rest_routes: str, use_async: bool) -> Optional[str]:
+    from app.utils.rest_generator import generate_router
+
+    if not is_valid_python_file(abs_path):
+        return f"{abs_path} is not a valid Python file"
+    print(f"generating router for {abs_path} with values: {values}")
+    generate_router(values, kind, rest_routes, use_async)
+    return None
+
+
+def report_errors(parser: argparse.ArgumentParser, errors: list[tuple[str, str]], total: int, inputs: str) -> None:
+    if total == 1 and errors:
+        parser.error(errors[0][1])
+    elif errors:
+        report = "\n".join(
+            f"  {error}" if filename in error else f"  {filename}: {error}" for filename, error in errors
+        )
+        parser.error(f"{len(errors)} of {total} {inputs} failed:\n{report}")
+
+
+def insert_routers_into_init_file(package_directory: Path, routers: list[tuple[str, str]]) -> None:
+    from app.utils.manifest import write_if_changed
+
+    imports = "".join(f'from {router_dir} import router as {router}\n' for router_dir, router in routers)
+    write_if_changed(
+        package_directory / '__init__.py', f"{imports}\n\n__all__ = [{', '.join(r[1] for r in routers)}]\n"
+    )
 
 
 def get_module_dir(abs_directory: Path, module_name: str) -> str:
@@ -160,11 +295,25 @@ def init_parser() -> argparse.ArgumentParser:
     model_subparser = subparsers.add_parser("gen-models", help="Generate model from JSON Schema")
 
     model_subparser.add_argument(
-        "-j", "--json-schema", type=validate_filepath_arg, required=True, help="Path to JSON Schema"
+        "-j",
+        "--json-schema",
+        required=True,
+        help="Path to JSON Schema, a directory of schemas or a glob pattern (quote it to keep the shell from expanding)",
     )
     model_subparser.add_argument(
         "-o", "--out-dir", type=validate_filepath_arg, default="rest/models", help="Output directory to store models"
     )
+    model_subparser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes generating models in parallel (default: number of CPUs)",
+    )
+    model_subparser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every output even if its inputs did not change since the last run",
+    )
 
     rest_subparser = subparsers.add_parser("gen-rest", help="Generate REST API from JSON Schema")
 
@@ -178,12 +327,31 @@ def init_parser() -> argparse.ArgumentParser:
         default="rest/routes",
         help="Output directory to store REST routes",
     )
+    rest_subparser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Generate async def routers backed by the async database session",
+    )
+    rest_subparser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes rendering routers in parallel (default: number of CPUs)",
+    )
+    rest_subparser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every output even if its inputs did not change since the last run",
+    )
 
     return parser
 
 
 def get_user_schema(filename: str, user_schema_file: TextIO) -> dict:
-    if filename.endswith(".yaml"):
+    if filename.endswith((".yaml", ".yml")):
+        import yaml
+
         user_schema = yaml.safe_load(user_schema_file)
     else:
         user_schema = json.load(user_schema_file)
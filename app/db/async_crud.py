@@ -0,0 +1,171 @@
+import asyncio
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import Delete, Update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import cache, state_queue, statements
+from app.db.cache import JsonDocument
+from app.db.errors import StaleDocumentError
+from app.db.replicas import is_replica
+from app.models.app_model import App, Id, StateEnum
+from app.models.main_model import Configuration
+from app.models.search_model import DocumentFilter, SearchQuery
+from app.settings import BulkSettings, bulk_settings
+
+
+async def read_document(db: AsyncSession, uuid: Id) -> App | None:
+    if cache.document_cache is None:
+        return await _read_document(db, uuid)
+    # a replica may lag behind the write that invalidated the entry, what it returns is not cached
+    return await cache.document_cache.async_read_through(uuid, lambda: _read_document(db, uuid), not is_replica(db))
+
+
+async def _read_document(db: AsyncSession, uuid: Id) -> App | None:
+    return (await db.scalars(statements.select_document(uuid))).first()
+
+
+async def read_document_json(db: AsyncSession, uuid: Id) -> JsonDocument | None:
+    if cache.document_cache is None:
+        return await _read_document_json(db, uuid)
+    return await cache.document_cache.async_read_json_through(
+        uuid, lambda: _read_document_json(db, uuid), not is_replica(db)
+    )
+
+
+async def _read_document_json(db: AsyncSession, uuid: Id) -> JsonDocument | None:
+    row = (await db.execute(statements.select_document_json(uuid))).first()
+    return None if row is None else (row[0], row[1].encode())
+
+
+async def document_exists(db: AsyncSession, uuid: Id) -> bool:
+    return bool(await db.scalar(statements.document_exists(uuid)))
+
+
+async def list_documents(
+    db: AsyncSession, kind: str, after: Id | None = None, limit: int = 100, state: StateEnum | None = None
+) -> list[App]:
+    return list(await db.scalars(statements.select_documents(kind, after, state).limit(limit)))
+
+
+async def search_documents(db: AsyncSession, kind: str, query: SearchQuery, limit: int) -> list[App]:
+    return list(await db.scalars(statements.search_documents(kind, query).limit(limit)))
+
+
+async def stream_documents(
+    db: AsyncSession, kind: str, after: Id | None = None, state: StateEnum | None = None, chunk_size: int = 1000
+) -> AsyncIterator[str]:
+    # runs while the response is being sent, so the stream owns the session from here on
+    stmt = statements.select_documents_json(kind, after, state).execution_options(yield_per=chunk_size)
+    try:
+        async for document in await db.stream_scalars(stmt):
+            yield document
+    finally:
+        await db.close()
+
+
+async def create_document(db: AsyncSession, document: App) -> App | None:
+    return await _write(db, statements.insert_document(document), document.uuid)
+
+
+async def create_documents(db: AsyncSession, documents: list[App]) -> set[Id]:
+    inserted = set(await db.scalars(statements.insert_documents(documents)))
+    await db.commit()
+    return inserted
+
+
+async def update_document_state(
+    db: AsyncSession, uuid: Id, state: StateEnum, revisions: list[int] | None = None
+) -> App | None:
+    queue = state_queue.state_queue
+    if queue is not None and queue.pending_state(uuid) is not None:
+        await asyncio.to_thread(queue.settle, uuid)
+    return await _write(db, statements.update_state(uuid, state, revisions), uuid, revisions)
+
+
+async def update_document_configuration(
+    db: AsyncSession, uuid: Id, configuration: Configuration, revisions: list[int] | None = None
+) -> App | None:
+    value = statements.jsonb(jsonable_encoder(configuration))
+    return await _write(db, statements.update_configuration(uuid, [], value, revisions), uuid, revisions)
+
+
+async def update_document_settings(
+    db: AsyncSession, uuid: Id, settings: dict, revisions: list[int] | None = None
+) -> App | None:
+    value = statements.jsonb(jsonable_encoder(settings))
+    return await _write(db, statements.update_configuration(uuid, ["settings"], value, revisions), uuid, revisions)
+
+
+async def patch_document_configuration(
+    db: AsyncSession,
+    uuid: Id,
+    patch: dict,
+    revisions: list[int] | None = None,
+    configuration: Type[BaseModel] = Configuration,
+) -> App | None:
+    value = statements.merge_patch_configuration(patch)
+    stmt = statements.update_configuration(uuid, [], value, revisions)
+    # the merged configuration is validated before the commit, an invalid one is rolled back
+    return await _write(db, stmt, uuid, revisions, lambda document: configuration.parse_obj(document.configuration))
+
+
+async def delete_document(db: AsyncSession, uuid: Id, revisions: list[int] | None = None) -> App | None:
+    return await _write(db, statements.delete_document(uuid, revisions), uuid, revisions)
+
+
+async def update_documents_state(
+    db: AsyncSession, kind: str, query: DocumentFilter, state: StateEnum, settings: BulkSettings = bulk_settings
+) -> list[Id]:
+    if state_queue.state_queue is not None:
+        await asyncio.to_thread(state_queue.state_queue.settle_all)
+    write = partial(statements.update_chunk_state, state=state)
+    return await _write_chunks(db, kind, query, write, settings.chunk_size)
+
+
+async def delete_documents(
+    db: AsyncSession, kind: str, query: DocumentFilter, settings: BulkSettings = bulk_settings
+) -> list[Id]:
+    return await _write_chunks(db, kind, query, statements.delete_chunk, settings.chunk_size)
+
+
+async def _write_chunks(
+    db: AsyncSession, kind: str, query: DocumentFilter, write: Callable[..., Update | Delete], chunk_size: int
+) -> list[Id]:
+    written: list[Id] = []
+    after = None
+    while True:
+        bound = await db.scalar(statements.chunk_bound(kind, query, after, chunk_size))
+        chunk = list(await db.scalars(write(kind, query, after, bound)))
+        await db.commit()
+        if cache.document_cache is not None:
+            await cache.document_cache.async_invalidate(*chunk)
+        written.extend(chunk)
+        if bound is None:
+            return written
+        after = bound
+
+
+async def _write(
+    db: AsyncSession,
+    stmt,
+    uuid: Id,
+    revisions: list[int] | None = None,
+    validate: Callable[[App], Any] | None = None,
+) -> App | None:
+    response = (await db.scalars(stmt)).first()
+    if validate is not None and response is not None:
+        try:
+            validate(response)
+        except Exception:
+            await db.rollback()
+            raise
+    await db.commit()
+    if cache.document_cache is not None:
+        await cache.document_cache.async_invalidate(uuid)
+    if response is None and revisions is not None and await document_exists(db, uuid):
+        raise StaleDocumentError(uuid)
+    return response
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Protocol
+from uuid import UUID
+
+from app.models.app_model import App, Id, StateEnum
+from app.settings import CacheSettings, cache_settings
+
+# (revision, JSON body) of a document as rendered by Postgres
+JsonDocument = tuple[int, bytes]
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class MemoryBackend:
+    # local stand-in for a shared backend, used in tests and single-process setups
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, bytes]] = {}
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            expires, value = self._entries.get(key, (0.0, None))
+            if expires < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_SHARED_URL requires the 'redis' package to be installed") from e
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> bytes | None:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.set(key, value, px=int(ttl * 1000))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Any) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DocumentCache:
+    def __init__(self, local: LRUCache, shared: CacheBackend | None = None):
+        # with a shared backend the local tier is skipped: other workers invalidate only the shared entries,
+        # a local copy would outlive their writes
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.invalidations = 0
+        # bumped on every invalidation, a load that raced with a write must not be cached
+        self._generation = 0
+
+    def read_through(self, uuid: Id, load: Callable[[], App | None], fill: bool = True) -> App | None:
+        generation = self._generation
+        values = self._get(uuid, _key(uuid), _loads)
+        if values is not None:
+            return App(**values)
+        document = load()
+        if document is not None and fill:
+            self._set(uuid, _key(uuid), _values(document), _dumps, generation)
+        return document
+
+    async def async_read_through(
+        self, uuid: Id, load: Callable[[], Awaitable[App | None]], fill: bool = True
+    ) -> App | None:
+        generation = self._generation
+        values = await self._async_get(uuid, _key(uuid), _loads)
+        if values is not None:
+            return App(**values)
+        document = await load()
+        if document is not None and fill:
+            await self._async_set(uuid, _key(uuid), _values(document), _dumps, generation)
+        return document
+
+    def read_json_through(
+        self, uuid: Id, load: Callable[[], JsonDocument | None], fill: bool = True
+    ) -> JsonDocument | None:
+        generation = self._generation
+        document = self._get((uuid, "json"), _json_key(uuid), _loads_json)
+        if document is None:
+            document = load()
+            if document is not None and fill:
+                self._set((uuid, "json"), _json_key(uuid), document, _dumps_json, generation)
+        return document
+
+    async def async_read_json_through(
+        self, uuid: Id, load: Callable[[], Awaitable[JsonDocument | None]], fill: bool = True
+    ) -> JsonDocument | None:
+        generation = self._generation
+        document = await self._async_get((uuid, "json"), _json_key(uuid), _loads_json)
+        if document is None:
+            document = await load()
+            if document is not None and fill:
+                await self._async_set((uuid, "json"), _json_key(uuid), document, _dumps_json, generation)
+        return document
+
+    def invalidate(self, uuid: Id) -> None:
+        self._invalidate_local(uuid)
+        if self.shared is not None:
+            self._delete_shared(uuid)
+
+    async def async_invalidate(self, *uuids: Id) -> None:
+        # the local entries and the generation are dropped before the await, a racing read does not cache stale data
+        for uuid in uuids:
+            self._invalidate_local(uuid)
+        if self.shared is not None and uuids:
+            await asyncio.to_thread(self._delete_shared, *uuids)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "invalidations": self.invalidations,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
+
+    def _invalidate_local(self, uuid: Id) -> None:
+        self._generation += 1
+        self.invalidations += 1
+        self.local.delete(uuid)
+        self.local.delete((uuid, "json"))
+
+    def _delete_shared(self, *uuids: Id) -> None:
+        for uuid in uuids:
+            self.shared.delete(_key(uuid))
+            self.shared.delete(_json_key(uuid))
+
+    def _get(self, key: Any, shared_key: str, loads: Callable[[bytes], Any]) -> Any | None:
+        if self.shared is None:
+            return self.local.get(key)
+        return self._shared_value(self.shared.get(shared_key), loads)
+
+    async def _async_get(self, key: Any, shared_key: str, loads: Callable[[bytes], Any]) -> Any | None:
+        if self.shared is None:
+            return self.local.get(key)
+        # the shared backend blocks (redis-py), the async paths call it in a worker thread
+        return self._shared_value(await asyncio.to_thread(self.shared.get, shared_key), loads)
+
+    def _shared_value(self, raw: bytes | None, loads: Callable[[bytes], Any]) -> Any | None:
+        if raw is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        return loads(raw)
+
+    def _set(self, key: Any, shared_key: str, value: Any, dumps: Callable[[Any], bytes], generation: int) -> None:
+        if generation != self._generation:
+            return
+        if self.shared is None:
+            self.local.set(key, value)
+        else:
+            self.shared.set(shared_key, dumps(value), self.local.ttl)
+
+    async def _async_set(
+        self, key: Any, shared_key: str, value: Any, dumps: Callable[[Any], bytes], generation: int
+    ) -> None:
+        if generation != self._generation:
+            return
+        if self.shared is None:
+            self.local.set(key, value)
+        else:
+            await asyncio.to_thread(self.shared.set, shared_key, dumps(value), self.local.ttl)
+
+
+def _key(uuid: Id) -> str:
+    return f"document:{uuid}"
+
+
+def _json_key(uuid: Id) -> str:
+    return f"document-json:{uuid}"
+
+
+def _values(document: App) -> dict:
+    return {column.key: getattr(document, column.key) for column in App.__table__.columns}
+
+
+def _dumps(values: dict) -> bytes:
+    state = values["state"] and values["state"].name
+    return json.dumps({**values, "uuid": str(values["uuid"]), "state": state}).encode()
+
+
+def _loads(raw: bytes) -> dict:
+    values = json.loads(raw)
+    state = values["state"] and StateEnum[values["state"]]
+    return {**values, "uuid": UUID(values["uuid"]), "state": state}
+
+
+def _dumps_json(document: JsonDocument) -> bytes:
+    revision, body = document
+    return b"%d\n%s" % (revision, body)
+
+
+def _loads_json(raw: bytes) -> JsonDocument:
+    revision, body = raw.split(b"\n", 1)
+    return int(revision), body
+
+
+def create_document_cache(settings: CacheSettings = cache_settings) -> DocumentCache | None:
+    if not settings.enabled:
+        return None
+    shared = RedisBackend(settings.shared_url) if settings.shared_url else None
+    return DocumentCache(LRUCache(settings.max_size, settings.ttl), shared)
+
+
+document_cache = create_document_cache()
@@ -1,74 +1,160 @@
-import json
-from typing import Type
+from functools import partial
+from typing import Any, Callable, Iterator, Type
 
 from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import Delete, Update
 from sqlalchemy.orm import Session
 
+from app.db import cache, state_queue, statements
+from app.db.cache import JsonDocument
+from app.db.errors import StaleDocumentError
+from app.db.replicas import is_replica
 from app.models.app_model import App, Id, StateEnum
 from app.models.main_model import Configuration
+from app.models.search_model import DocumentFilter, SearchQuery
+from app.settings import BulkSettings, bulk_settings
 
 
-def read_document(db: Session, uuid: Id):
-    response = db.query(App).filter_by(uuid=uuid).first()
-    if response is None:
-        return None
-    return response
+def read_document(db: Session, uuid: Id) -> App | None:
+    if cache.document_cache is None:
+        return _read_document(db, uuid)
+    # a replica may lag behind the write that invalidated the entry, what it returns is not cached
+    return cache.document_cache.read_through(uuid, lambda: _read_document(db, uuid), not is_replica(db))
 
 
-def create_document(db: Session, document: App):
-    response = db.query(App).filter_by(uuid=document.uuid).first()
-    if response is not None:
-        return None
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-    return document
+def _read_document(db: Session, uuid: Id) -> App | None:
+    return db.scalars(statements.select_document(uuid)).first()
 
 
-def update_document_state(db: Session, uuid: Id, state: StateEnum):
-    response = db.query(App).filter_by(uuid=uuid).first()
-    if response is None:
-        return None
-    response.state = state
-    db.merge(response)
-    db.commit()
-    db.refresh(response)
-    return response
+def read_document_json(db: Session, uuid: Id) -> JsonDocument | None:
+    if cache.document_cache is None:
+        return _read_document_json(db, uuid)
+    return cache.document_cache.read_json_through(uuid, lambda: _read_document_json(db, uuid), not is_replica(db))
 
 
-def update_document_configuration(db: Session, uuid: Id, configuration: Configuration):
-    response = db.query(App).filter_by(uuid=uuid).first()
-    if response is None:
-        return None
-    json_str = str(response.json)
-    dic = json.loads(json_str)
-    dic["configuration"] = configuration.__dict__
-    json_dict = jsonable_encoder(dic)
-    response.json = json.dumps(json_dict)  # type: ignore
-    db.merge(response)
-    db.commit()
-    db.refresh(response)
-    return response
+def _read_document_json(db: Session, uuid: Id) -> JsonDocument | None:
+    row = (db.execute(statements.select_document_json(uuid))).first()
+    return None if row is None else (row[0], row[1].encode())
+
+
+def document_exists(db: Session, uuid: Id) -> bool:
+    return bool(db.scalar(statements.document_exists(uuid)))
+
 
+def list_documents(
+    db: Session, kind: str, after: Id | None = None, limit: int = 100, state: StateEnum | None = None
+) -> list[App]:
+    return list(db.scalars(statements.select_documents(kind, after, state).limit(limit)))
 
-def update_document_settings(db: Session, uuid: Id, settings: dict):
-    response = db.query(App).filter_by(uuid=uuid).first()
-    if response is None:
-        return None
-    json_str = str(response.json)
-    json_dict = json.loads(json_str)
-    json_dict["configuration"]["settings"] = settings
-    response.json = json.dumps(json_dict)  # type: ignore
-    db.merge(response)
+
+def search_documents(db: Session, kind: str, query: SearchQuery, limit: int) -> list[App]:
+    return list(db.scalars(statements.search_documents(kind, query).limit(limit)))
+
+
+def stream_documents(
+    db: Session, kind: str, after: Id | None = None, state: StateEnum | None = None, chunk_size: int = 1000
+) -> Iterator[str]:
+    # runs while the response is being sent, so the stream owns the session from here on
+    stmt = statements.select_documents_json(kind, after, state).execution_options(yield_per=chunk_size)
+    try:
+        yield from db.scalars(stmt)
+    finally:
+        db.close()
+
+
+def create_document(db: Session, document: App) -> App | None:
+    return _write(db, statements.insert_document(document), document.uuid)
+
+
+def create_documents(db: Session, documents: list[App]) -> set[Id]:
+    inserted = set(db.scalars(statements.insert_documents(documents)))
     db.commit()
-    db.refresh(response)
-    return response
+    return inserted
+
+
+def update_document_state(db: Session, uuid: Id, state: StateEnum, revisions: list[int] | None = None) -> App | None:
+    queue = state_queue.state_queue
+    if queue is not None and queue.pending_state(uuid) is not None:
+        queue.settle(uuid)
+    return _write(db, statements.update_state(uuid, state, revisions), uuid, revisions)
+
+
+def update_document_configuration(
+    db: Session, uuid: Id, configuration: Configuration, revisions: list[int] | None = None
+) -> App | None:
+    value = statements.jsonb(jsonable_encoder(configuration))
+    return _write(db, statements.update_configuration(uuid, [], value, revisions), uuid, revisions)
+
+
+def update_document_settings(db: Session, uuid: Id, settings: dict, revisions: list[int] | None = None) -> App | None:
+    value = statements.jsonb(jsonable_encoder(settings))
+    return _write(db, statements.update_configuration(uuid, ["settings"], value, revisions), uuid, revisions)
+
+
+def patch_document_configuration(
+    db: Session,
+    uuid: Id,
+    patch: dict,
+    revisions: list[int] | None = None,
+    configuration: Type[BaseModel] = Configuration,
+) -> App | None:
+    value = statements.merge_patch_configuration(patch)
+    stmt = statements.update_configuration(uuid, [], value, revisions)
+    # the merged configuration is validated before the commit, an invalid one is rolled back
+    return _write(db, stmt, uuid, revisions, lambda document: configuration.parse_obj(document.configuration))
+
+
+def delete_document(db: Session, uuid: Id, revisions: list[int] | None = None) -> App | None:
+    return _write(db, statements.delete_document(uuid, revisions), uuid, revisions)
+
+
+def update_documents_state(
+    db: Session, kind: str, query: DocumentFilter, state: StateEnum, settings: BulkSettings = bulk_settings
+) -> list[Id]:
+    if state_queue.state_queue is not None:
+        state_queue.state_queue.settle_all()
+    write = partial(statements.update_chunk_state, state=state)
+    return _write_chunks(db, kind, query, write, settings.chunk_size)
+
+
+def delete_documents(db: Session, kind: str, query: DocumentFilter, settings: BulkSettings = bulk_settings) -> list[Id]:
+    return _write_chunks(db, kind, query, statements.delete_chunk, settings.chunk_size)
+
+
+def _write_chunks(
+    db: Session, kind: str, query: DocumentFilter, write: Callable[..., Update | Delete], chunk_size: int
+) -> list[Id]:
+    # every chunk is a transaction of its own, so no more than chunk_size rows are locked at a time; chunks are
+    # ranges of uuids, so documents that stop matching the filter meanwhile neither stall nor end the loop early
+    written: list[Id] = []
+    after = None
+    while True:
+        bound = db.scalar(statements.chunk_bound(kind, query, after, chunk_size))
+        chunk = list(db.scalars(write(kind, query, after, bound)))
+        db.commit()
+        if cache.document_cache is not None:
+            for uuid in chunk:
+                cache.document_cache.invalidate(uuid)
+        written.extend(chunk)
+        if bound is None:
+            return written
+        after = bound
 
 
-def delete_document(db: Session, uuid: Id) -> Type[App] | None:
-    response = db.query(App).filter_by(uuid=uuid).first()
-    if response is None:
-        return None
-    db.delete(response)
+def _write(
+    db: Session, stmt, uuid: Id, revisions: list[int] | None = None, validate: Callable[[App], Any] | None = None
+) -> App | None:
+    response = db.scalars(stmt).first()
+    if validate is not None and response is not None:
+        try:
+            validate(response)
+        except Exception:
+            db.rollback()
+            raise
     db.commit()
+    if cache.document_cache is not None:
+        cache.document_cache.invalidate(uuid)
+    if response is None and revisions is not None and document_exists(db, uuid):
+        raise StaleDocumentError(uuid)
     return response
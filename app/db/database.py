@@ -1,13 +1,63 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-engine = create_engine("postgresql://postgres:password123@db/app", echo=True)
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.settings import DatabaseSettings, database_settings
+
+
+def _pool_options(settings: DatabaseSettings) -> dict:
+    return {
+        "echo": settings.echo,
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+
+
+def create_db_engine(
+    settings: DatabaseSettings = database_settings, url: str | None = None, connect_timeout: int | None = None
+) -> Engine:
+    connect_args: dict = {"options": f"-c statement_timeout={settings.statement_timeout_ms}"}
+    if connect_timeout is not None:
+        connect_args["connect_timeout"] = connect_timeout
+    return create_engine(
+        url or settings.url, poolclass=InstrumentedQueuePool, connect_args=connect_args, **_pool_options(settings)
+    )
+
+
+def create_async_db_engine(
+    settings: DatabaseSettings = database_settings, url: str | None = None, connect_timeout: int | None = None
+) -> AsyncEngine:
+    connect_args: dict = {"server_settings": {"statement_timeout": str(settings.statement_timeout_ms)}}
+    if connect_timeout is not None:
+        connect_args["timeout"] = connect_timeout
+    return create_async_engine(
+        url or settings.async_url,
+        poolclass=InstrumentedAsyncQueuePool,
+        connect_args=connect_args,
+        **_pool_options(settings),
+    )
+
+
+def pool_stats() -> dict:
+    return {
+        "sync": engine.pool.metrics.snapshot(engine.pool),  # type: ignore[attr-defined]
+        "async": async_engine.pool.metrics.snapshot(async_engine.pool),  # type: ignore[attr-defined]
+    }
+
+
+engine = create_db_engine()
+async_engine = create_async_db_engine()
 
 Base = declarative_base()
 
-SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
+SessionLocal = sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=async_engine)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -18,6 +68,14 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 def recreate_db() -> None:
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,15 @@
+from app.models.app_model import Id
+
+
+class StaleDocumentError(Exception):
+    def __init__(self, uuid: Id):
+        super().__init__(f"Document {uuid} has been modified")
+        self.uuid = uuid
+
+
+class StateQueueBusyError(Exception):
+    pass
+
+
+class NotificationsUnavailableError(Exception):
+    pass
@@ -0,0 +1,166 @@
+import asyncio
+import contextlib
+import json
+import logging
+
+import asyncpg
+
+from app.db.errors import NotificationsUnavailableError
+from app.models.app_model import STATE_CHANNEL, Id
+from app.settings import NotificationsSettings, database_settings, notifications_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, notifier: "StateNotifier", key: tuple[str, str], buffer_size: int):
+        self.notifier = notifier
+        self.key = key
+        self.buffer_size = buffer_size
+        self.closed = False
+        self._events: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    def put(self, event: dict) -> bool:
+        if self._events.qsize() >= self.buffer_size:
+            return False
+        self._events.put_nowait(event)
+        return True
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        # None when nothing arrived within the timeout or once the subscription is closed
+        if self.closed and self._events.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self._events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._events.put_nowait(None)
+            self.notifier.unsubscribe(self)
+
+
+class StateNotifier:
+    # one LISTEN connection per worker fans the committed state transitions out to every watcher of the worker
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = STATE_CHANNEL,
+        buffer_size: int = 1000,
+        connect_timeout: float = 5.0,
+        reconnect_delay: float = 1.0,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.buffer_size = buffer_size
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: dict[tuple[str, str], set[Subscription]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._connected = asyncio.Event()
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    async def subscribe(self, uuid: Id | None = None, kind: str | None = None) -> Subscription:
+        await self._listening()
+        subscription = Subscription(
+            self, ("uuid", str(uuid)) if uuid is not None else ("kind", str(kind)), self.buffer_size
+        )
+        self._subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._close_subscriptions()
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._connected.is_set(),
+            "watched": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+    async def _listening(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # the connection belongs to the loop that opened it, a new loop (e.g. a new TestClient) opens its own
+            if self._loop is not loop:
+                self._subscribers = {}
+            self._loop = loop
+            self._connected = asyncio.Event()
+            self._task = loop.create_task(self._run(self._connected))
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise NotificationsUnavailableError("Not listening for state transitions") from None
+
+    async def _run(self, connected: asyncio.Event) -> None:
+        while True:
+            try:
+                await self._listen(connected)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Listening for state transitions failed: %s", e)
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self, connected: asyncio.Event) -> None:
+        connection = await asyncpg.connect(self.dsn, timeout=self.connect_timeout)
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        try:
+            await connection.add_listener(self.channel, self._dispatch)
+            connected.set()
+            await lost.wait()
+        finally:
+            connected.clear()
+            # transitions are missed until the connection is back, the watchers are closed and read the state again
+            self._close_subscriptions()
+            if not connection.is_closed():
+                connection.terminate()
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        event = json.loads(payload)
+        self.received += 1
+        for key in (("uuid", event["uuid"]), ("kind", event["kind"])):
+            for subscription in list(self._subscribers.get(key, ())):
+                if subscription.put(event):
+                    self.delivered += 1
+                else:
+                    # a watcher this far behind is disconnected instead of buffering without a bound
+                    self.dropped += 1
+                    subscription.close()
+
+    def _close_subscriptions(self) -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+
+
+def create_notifier(settings: NotificationsSettings = notifications_settings) -> StateNotifier | None:
+    if not settings.enabled:
+        return None
+    dsn = settings.url or database_settings.async_url.replace("+asyncpg", "", 1)
+    return StateNotifier(dsn, buffer_size=settings.buffer_size, connect_timeout=settings.connect_timeout)
+
+
+notifier = create_notifier()
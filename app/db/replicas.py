@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import AsyncGenerator, Generator
+
+from fastapi import Depends, Request
+from sqlalchemy import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.database import create_async_db_engine, create_db_engine, get_async_db, get_db
+from app.settings import ReplicaSettings, database_settings, replica_settings
+
+REPLICA = "replica"
+
+
+def is_replica(db: Session | AsyncSession) -> bool:
+    return db.info.get(REPLICA, False)
+
+
+class Replica:
+    def __init__(self, url: str, engine: Engine, async_engine: AsyncEngine):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.async_engine = async_engine
+        # marked so that what a lagging replica returns is not put into the document cache
+        self.session = sessionmaker(
+            autoflush=False, autocommit=False, expire_on_commit=False, bind=engine, info={REPLICA: True}
+        )
+        self.async_session = async_sessionmaker(
+            autoflush=False, autocommit=False, expire_on_commit=False, bind=async_engine, info={REPLICA: True}
+        )
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaSet:
+    # round-robin over the replicas; one that could not be connected to is skipped for retry_interval
+    def __init__(self, replicas: list[Replica], retry_interval: float = 10.0):
+        self.replicas = replicas
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._next = count()
+        self.fallbacks = 0
+
+    def candidates(self) -> list[Replica]:
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next)
+            rotated = self.replicas[start % len(self.replicas) :] + self.replicas[: start % len(self.replicas)]
+        return [replica for replica in rotated if replica.down_until <= now]
+
+    def served(self, replica: Replica) -> None:
+        with self._lock:
+            replica.reads += 1
+
+    def failed(self, replica: Replica) -> None:
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_interval
+
+    def fell_back(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "fallbacks": self.fallbacks,
+                "replicas": [
+                    {
+                        "name": replica.name,
+                        "healthy": replica.down_until <= now,
+                        "reads": replica.reads,
+                        "failures": replica.failures,
+                    }
+                    for replica in self.replicas
+                ],
+            }
+
+
+class StickyWindow:
+    # read-after-write: clients and documents written within the last `seconds` are read from the primary
+    def __init__(self, seconds: float, max_size: int = 100_000):
+        self.seconds = seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+
+    def mark(self, keys: list[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._expiry[key] = now + self.seconds
+                self._expiry.move_to_end(key)
+            # every key gets the same window, so the oldest marks are at the front
+            while self._expiry and (len(self._expiry) > self.max_size or next(iter(self._expiry.values())) <= now):
+                self._expiry.popitem(last=False)
+
+    def active(self, keys: list[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return any(self._expiry.get(key, 0.0) > now for key in keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._expiry)
+
+
+def sticky_keys(request: Request, settings: ReplicaSettings = replica_settings) -> list[str]:
+    client = request.headers.get(settings.client_header) or (request.client.host if request.client else None)
+    keys = [] if client is None else [f"client:{client}"]
+    if "uuid" in request.path_params:
+        keys.append(f"uuid:{request.path_params['uuid']}")
+    return keys
+
+
+def _replicas(request: Request) -> list[Replica]:
+    if replica_set is None or sticky.active(sticky_keys(request)):
+        return []
+    return replica_set.candidates()
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)) -> Generator[Session, None, None]:
+    # a replica session when one is healthy and the request is not within the stickiness window, else the primary;
+    # the primary session is only created, it does not take a connection unless it is used
+    for replica in _replicas(request):
+        session = replica.session()
+        try:
+            session.connection()
+        except (DBAPIError, OSError):
+            session.close()
+            replica_set.failed(replica)  # type: ignore[union-attr]
+            continue
+        replica_set.served(replica)  # type: ignore[union-attr]
+        try:
+            yield session
+        finally:
+            session.close()
+        return
+    if replica_set is not None:
+        replica_set.fell_back()
+    yield db
+
+
+async def get_async_read_db(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> AsyncGenerator[AsyncSession, None]:
+    for replica in _replicas(request):
+        session = replica.async_session()
+        try:
+            await session.connection()
+        except (DBAPIError, OSError):
+            await session.close()
+            replica_set.failed(replica)  # type: ignore[union-attr]
+            continue
+        replica_set.served(replica)  # type: ignore[union-attr]
+        try:
+            yield session
+        finally:
+            await session.close()
+        return
+    if replica_set is not None:
+        replica_set.fell_back()
+    yield db
+
+
+def get_write_db(request: Request, db: Session = Depends(get_db)) -> Generator[Session, None, None]:
+    yield db
+    # only a write that went through starts the window
+    sticky.mark(sticky_keys(request))
+
+
+async def get_async_write_db(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> AsyncGenerator[AsyncSession, None]:
+    yield db
+    sticky.mark(sticky_keys(request))
+
+
+def async_url(url: str) -> str:
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def create_replica_set(settings: ReplicaSettings = replica_settings) -> ReplicaSet | None:
+    if not settings.urls:
+        return None
+    replicas = [
+        Replica(
+            url,
+            create_db_engine(database_settings, url, settings.connect_timeout),
+            create_async_db_engine(database_settings, async_url(url), settings.connect_timeout),
+        )
+        for url in settings.urls
+    ]
+    return ReplicaSet(replicas, settings.retry_interval)
+
+
+replica_set = create_replica_set()
+sticky = StickyWindow(replica_settings.sticky_seconds, replica_settings.sticky_size)
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from itertools import islice
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.db import cache, statements
+from app.db.database import SessionLocal
+from app.db.errors import StateQueueBusyError
+from app.models.app_model import Id, StateEnum
+from app.settings import StateQueueSettings, state_queue_settings
+
+logger = logging.getLogger(__name__)
+
+
+class StateQueue:
+    # write-behind for PUT /{kind}/{uuid}/state/: transitions of a document within one window collapse to the
+    # latest one and every batch is written by a single UPDATE ... FROM (VALUES ...)
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_size: int = 10_000,
+        window: float = 0.05,
+        batch_size: int = 1000,
+        retry_delay: float = 1.0,
+        wait_timeout: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.window = window
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        self._pending: dict[Id, StateEnum] = {}
+        self._in_flight: dict[Id, StateEnum] = {}
+        self._flush_requested = False
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        with self._condition:
+            self._closed = False
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="state-queue", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, uuid: Id, state: StateEnum) -> None:
+        with self._condition:
+            if self._closed:
+                raise StateQueueBusyError("State queue is closed")
+            if uuid in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_size:
+                self.rejected += 1
+                raise StateQueueBusyError("State queue is full")
+            self._pending[uuid] = state
+            self.enqueued += 1
+            self._start_worker()
+            self._condition.notify_all()
+
+    def pending_state(self, uuid: Id) -> StateEnum | None:
+        # read-your-writes: the latest transition that has not been committed yet
+        with self._condition:
+            return self._pending.get(uuid) or self._in_flight.get(uuid)
+
+    def wait_for(self, uuid: Id, timeout: float | None = None) -> bool:
+        with self._condition:
+            if uuid in self._pending:
+                self._flush_requested = True
+                self._condition.notify_all()
+            return self._condition.wait_for(lambda: uuid not in self._pending and uuid not in self._in_flight, timeout)
+
+    def settle(self, uuid: Id) -> None:
+        # a direct write of the state must not be overtaken by an older queued transition
+        if not self.wait_for(uuid, self.wait_timeout):
+            raise StateQueueBusyError("Queued state transitions of the document are not written yet")
+
+    def settle_all(self) -> None:
+        # the same for a write of many documents at once, which cannot tell whose transitions are queued
+        if not self.flush(self.wait_timeout):
+            raise StateQueueBusyError("Queued state transitions are not written yet")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout: float | None = None) -> None:
+        # the worker writes everything that is queued before it exits
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            if self._thread is thread:
+                self._thread = None
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "max_size": self.max_size,
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "written": self.written,
+                "batches": self.batches,
+                "failures": self.failures,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.window
+                while not self._closed and not self._flush_requested and (remaining := deadline - time.monotonic()) > 0:
+                    self._condition.wait(remaining)
+                self._in_flight, self._pending = self._pending, {}
+                self._flush_requested = False
+                batch = self._in_flight
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Writing %d queued state transitions failed", len(batch))
+                with self._condition:
+                    self.failures += 1
+                    closed = self._closed
+                    if not closed:
+                        # transitions queued in the meantime are newer and win
+                        self._pending = {**batch, **self._pending}
+                if not closed:
+                    time.sleep(self.retry_delay)
+            finally:
+                with self._condition:
+                    self._in_flight = {}
+                    self._condition.notify_all()
+
+    def _write(self, batch: dict[Id, StateEnum]) -> None:
+        items = iter(batch.items())
+        with self.session_factory() as db:
+            while chunk := list(islice(items, self.batch_size)):
+                db.execute(statements.update_states(chunk))
+                with self._condition:
+                    self.batches += 1
+            db.commit()
+        with self._condition:
+            self.written += len(batch)
+        if cache.document_cache is not None:
+            for uuid in batch:
+                cache.document_cache.invalidate(uuid)
+
+
+def create_state_queue(settings: StateQueueSettings = state_queue_settings) -> StateQueue | None:
+    if not settings.enabled:
+        return None
+    return StateQueue(
+        SessionLocal, settings.max_size, settings.window, settings.batch_size, wait_timeout=settings.wait_timeout
+    )
+
+
+state_queue = create_state_queue()
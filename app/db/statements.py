@@ -0,0 +1,203 @@
+import json
+from typing import Any
+
+from sqlalchemy import (
+    ColumnElement,
+    Delete,
+    Select,
+    String,
+    Text,
+    Update,
+    and_,
+    cast,
+    column,
+    delete,
+    exists,
+    false,
+    func,
+    literal,
+    literal_column,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, JSONPATH, Insert, insert
+
+from app.models.app_model import METADATA, App, Id, StateEnum
+from app.models.search_model import DocumentFilter, SearchQuery
+
+
+def jsonb(value: Any) -> ColumnElement:
+    return cast(literal(value, JSONB), JSONB)
+
+
+def select_document(uuid: Id) -> Select:
+    return select(App).where(App.uuid == uuid)
+
+
+def _json_object(**items: ColumnElement) -> ColumnElement:
+    # json_build_object keeps the key order; the keys are inlined, asyncpg cannot infer the type of a bound one
+    return func.json_build_object(
+        *(item for key, value in items.items() for item in (literal_column(f"'{key}'"), value))
+    )
+
+
+def document_json() -> ColumnElement:
+    # the document rendered as JSON text by Postgres in the shape App.keys() serves, so Python neither decodes nor
+    # re-encodes it; the posted document is rebuilt from the metadata columns and the configuration
+    metadata = {key: getattr(App, column) for key, column in METADATA.items()}
+    document = _json_object(**metadata, configuration=App.configuration)
+    return cast(_json_object(uuid=App.uuid, **metadata, state=App.state, json=document, revision=App.revision), Text)
+
+
+def select_document_json(uuid: Id) -> Select:
+    return select(App.revision, document_json()).where(App.uuid == uuid)
+
+
+def document_exists(uuid: Id) -> Select:
+    return select(exists().where(App.uuid == uuid))
+
+
+def select_documents(kind: str, after: Id | None = None, state: StateEnum | None = None) -> Select:
+    return _filter_documents(select(App), kind, after, state)
+
+
+def select_documents_json(kind: str, after: Id | None = None, state: StateEnum | None = None) -> Select:
+    return _filter_documents(select(document_json()), kind, after, state)
+
+
+def _filter_documents(stmt: Select, kind: str, after: Id | None, state: StateEnum | None) -> Select:
+    stmt = stmt.where(App.kind == kind).order_by(App.uuid)
+    if after is not None:
+        stmt = stmt.where(App.uuid > after)
+    if state is not None:
+        stmt = stmt.where(App.state == state)
+    return stmt
+
+
+def search_documents(kind: str, query: SearchQuery) -> Select:
+    return select_documents(kind, query.after).where(*_document_filter(query))
+
+
+def _document_filter(query: DocumentFilter) -> list[ColumnElement]:
+    # the metadata is compared with its columns, the configuration with @> and @@, the operators served by the
+    # jsonb_path_ops GIN index on apps.configuration
+    conditions = []
+    if query.state is not None:
+        conditions.append(App.state == query.state)
+    if query.version is not None:
+        conditions.append(App.version == query.version)
+    conditions.extend(_contains(key, value) for key, value in (query.contains or {}).items())
+    conditions.extend(_equals(path.split("."), value) for path, value in query.equals.items())
+    return conditions
+
+
+def _contains(key: str, value: Any) -> ColumnElement:
+    if key == "configuration":
+        return App.configuration.contains(value)
+    if key in METADATA and isinstance(value, str):
+        return getattr(App, METADATA[key]) == value
+    return false()
+
+
+def _equals(keys: list[str], value: Any) -> ColumnElement:
+    if keys[0] == "configuration":
+        return App.configuration.path_match(cast(literal(_jsonpath_equals(keys[1:], value)), JSONPATH))
+    if len(keys) == 1 and keys[0] in METADATA and isinstance(value, str):
+        return getattr(App, METADATA[keys[0]]) == value
+    return false()
+
+
+def _jsonpath_equals(keys: list[str], value: Any) -> str:
+    path = "".join(f".{json.dumps(key)}" for key in keys)
+    return f"${path} == {json.dumps(value)}"
+
+
+def _column_values(document: App) -> dict:
+    values = {column.key: getattr(document, column.key) for column in App.__table__.columns}
+    # unset columns are left out so that their column defaults apply
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def insert_document(document: App) -> Insert:
+    return insert(App).values(_column_values(document)).on_conflict_do_nothing(index_elements=[App.uuid]).returning(App)
+
+
+def insert_documents(documents: list[App]) -> Insert:
+    rows = [_column_values(document) for document in documents]
+    return insert(App).values(rows).on_conflict_do_nothing(index_elements=[App.uuid]).returning(App.uuid)
+
+
+def _matches(uuid: Id, revisions: list[int] | None) -> ColumnElement:
+    # revisions come from If-Match; a stale revision makes the write match no row at all
+    if revisions is None:
+        return App.uuid == uuid
+    return and_(App.uuid == uuid, App.revision.in_(revisions))
+
+
+def _update(uuid: Id, revisions: list[int] | None) -> Update:
+    return update(App).where(_matches(uuid, revisions)).values(revision=App.revision + 1).returning(App)
+
+
+def update_state(uuid: Id, state: StateEnum, revisions: list[int] | None = None) -> Update:
+    return _update(uuid, revisions).values(state=state)
+
+
+def update_states(states: list[tuple[Id, StateEnum]]) -> Update:
+    # one statement for a whole batch of queued transitions, VALUES carries the state as text
+    rows = values(column("uuid", App.uuid.type), column("state", String), name="queued").data(
+        [(uuid, state.value) for uuid, state in states]
+    )
+    return (
+        update(App)
+        .where(App.uuid == rows.c.uuid)
+        .values(state=cast(rows.c.state, App.state.type), revision=App.revision + 1)
+    )
+
+
+def update_configuration(uuid: Id, path: list[str], value: ColumnElement, revisions: list[int] | None = None) -> Update:
+    # jsonb_set runs in Postgres, so the document is neither fetched nor re-serialized here; an empty path replaces
+    # the whole configuration
+    if path:
+        value = func.jsonb_set(App.configuration, cast(literal(path, ARRAY(String)), ARRAY(String)), value)
+    return _update(uuid, revisions).values(configuration=value)
+
+
+def merge_patch_configuration(patch: dict) -> ColumnElement:
+    return func.jsonb_merge_patch(App.configuration, jsonb(patch))
+
+
+def delete_document(uuid: Id, revisions: list[int] | None = None) -> Delete:
+    return delete(App).where(_matches(uuid, revisions)).returning(App)
+
+
+def chunk_bound(kind: str, query: DocumentFilter, after: Id | None, chunk_size: int) -> Select:
+    # the last uuid of the next chunk of matching documents, none when fewer than chunk_size of them are left
+    stmt = _filter_documents(select(App.uuid), kind, after, None)
+    return stmt.where(*_document_filter(query)).offset(chunk_size - 1).limit(1)
+
+
+def _chunk(kind: str, query: DocumentFilter, after: Id | None, bound: Id | None) -> list[ColumnElement]:
+    conditions = [App.kind == kind, *_document_filter(query)]
+    if after is not None:
+        conditions.append(App.uuid > after)
+    if bound is not None:
+        conditions.append(App.uuid <= bound)
+    return conditions
+
+
+def update_chunk_state(
+    kind: str, query: DocumentFilter, after: Id | None, bound: Id | None, state: StateEnum
+) -> Update:
+    # the filter is applied again by the UPDATE itself, so a document changed since the bound was read is skipped;
+    # documents already in the state keep their revision and are not counted
+    return (
+        update(App)
+        .where(*_chunk(kind, query, after, bound), App.state != state)
+        .values(state=state, revision=App.revision + 1)
+        .returning(App.uuid)
+    )
+
+
+def delete_chunk(kind: str, query: DocumentFilter, after: Id | None, bound: Id | None) -> Delete:
+    return delete(App).where(*_chunk(kind, query, after, bound)).returning(App.uuid)
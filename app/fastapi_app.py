@@ -1,30 +1,80 @@
+import importlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.exceptions import HTTPException, RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse
 
+from app.db import notifications, state_queue
 from app.db.database import engine
+from app.db.errors import NotificationsUnavailableError, StaleDocumentError, StateQueueBusyError
+from app.metrics import MetricsMiddleware, install_query_events
 from app.models.app_model import Base
+from app.models.validation import DocumentValidationError
+from app.profiling import ProfilingMiddleware
+from app.routers.admin import router as admin_router
+from app.routers.metrics import router as metrics_router
+from app.routers.registry import RegistryRoute, SchemasWatcher, registry
+from app.settings import metrics_settings, profiling_settings, registry_settings, routes_settings
 from app.templates.router_template import router as router_template
 
+# orjson is optional, it only speeds up encoding of the responses that are not rendered by Postgres
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse  # type: ignore[misc]
 
-def include_routers_from_init(fastapi_app: FastAPI):
-    try:
-        from app import __all__ as routers  # type: ignore
 
-        for router in routers:
-            fastapi_app.include_router(router)
-            print(f"Included router: {router}")
+def include_routers_from_init(package: str = routes_settings.package):
+    try:
+        routers = getattr(importlib.import_module(package), "__all__", None)
     except ImportError as e:
-        print(f"No routers found in __all__. Generate routers via gen-rest command. ({e})")
-    except AttributeError:
-        print("Error importing routers from __all__. No routers generated.")
+        print(f"Error importing routers from {package}. No routers generated. ({e})")
+        return
+    if not routers:
+        print(f"No routers found in {package}.__all__. Generate routers via gen-rest command.")
+        return
+    for router in routers:
+        registry.register_router(router.prefix.strip("/"), router)
+        print(f"Included router: {router.prefix}")
 
 
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(fastapi_app: FastAPI):
+    watcher = None
+    if registry_settings.schemas_dir:
+        watcher = SchemasWatcher(registry, registry_settings.schemas_dir, registry_settings.poll_interval)
+        watcher.start()
+    if state_queue.state_queue is not None:
+        state_queue.state_queue.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    # acknowledged transitions are written before the process exits
+    if state_queue.state_queue is not None:
+        state_queue.state_queue.close()
+    if notifications.notifier is not None:
+        await notifications.notifier.close()
+
+
 app = FastAPI(
     title="JSON to Pydantic Generator",
     version="1.0.0",
+    default_response_class=DefaultResponse,
+    lifespan=lifespan,
 )
+registry.dependency_overrides_provider = app
+
+if metrics_settings.enabled:
+    install_query_events()
+    app.add_middleware(MetricsMiddleware)
+if profiling_settings.enabled:
+    app.add_middleware(ProfilingMiddleware)
 
 
 @app.exception_handler(RequestValidationError)
@@ -32,5 +82,41 @@ async def validation_exception_handler(request, exc):
     raise HTTPException(status_code=400, detail=exc.errors()[0]["msg"])
 
 
-include_routers_from_init(app)
-app.include_router(router_template)
+@app.exception_handler(DocumentValidationError)
+async def document_validation_exception_handler(request, exc):
+    raise HTTPException(status_code=400, detail=exc.msg)
+
+
+@app.exception_handler(StaleDocumentError)
+async def stale_document_exception_handler(request, exc):
+    raise HTTPException(status_code=412, detail="Document has been modified")
+
+
+@app.exception_handler(StateQueueBusyError)
+async def state_queue_busy_exception_handler(request, exc):
+    raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+@app.exception_handler(NotificationsUnavailableError)
+async def notifications_unavailable_exception_handler(request, exc):
+    raise HTTPException(status_code=503, detail=str(exc))
+
+
+def openapi() -> dict:
+    # the kind routers are dispatched by RegistryRoute, they are added here so the generated ones stay documented
+    if app.openapi_schema is None:
+        app.openapi_schema = get_openapi(
+            title=app.title, version=app.version, routes=[*app.routes, *registry.generated_routes()]
+        )
+    return app.openapi_schema
+
+
+app.openapi = openapi  # type: ignore[method-assign]
+
+# kind routers are looked up by the first path segment instead of being scanned one route at a time
+include_routers_from_init()
+registry.register_router(router_template.prefix.strip("/"), router_template)
+app.include_router(admin_router)
+if metrics_settings.enabled:
+    app.include_router(metrics_router)
+app.router.routes.append(RegistryRoute(registry))
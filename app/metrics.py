@@ -0,0 +1,251 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# upper bounds of the histogram buckets, the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.bounds)
+        histogram.counts = self.counts.copy()
+        histogram.count = self.count
+        histogram.sum = self.sum
+        return histogram
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class RequestMetrics:
+    __slots__ = ("duration", "queries", "query_seconds")
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_seconds = Histogram(LATENCY_BUCKETS)
+
+
+# the queries of the current request are accounted here, the threadpool and the asyncpg greenlets inherit it
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: dict[tuple[str, str, str], RequestMetrics] = {}
+        self.responses: dict[tuple[str, str, str, int], int] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def observe_request(
+        self, kind: str, endpoint: str, method: str, status: int, seconds: float, stats: RequestStats
+    ) -> None:
+        key = (kind, endpoint, method)
+        with self._lock:
+            metrics = self.requests.get(key)
+            if metrics is None:
+                metrics = self.requests[key] = RequestMetrics()
+            metrics.duration.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            metrics.query_seconds.observe(stats.query_seconds)
+            self.responses[(*key, status)] = self.responses.get((*key, status), 0) + 1
+            self.queries += stats.queries
+            self.query_seconds += stats.query_seconds
+
+    def observe_query(self, seconds: float) -> None:
+        stats = _request_stats.get()
+        if stats is not None:
+            # added to the totals once the request is done
+            stats.queries += 1
+            stats.query_seconds += seconds
+            return
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def snapshot(self) -> tuple[dict, dict, int, float]:
+        with self._lock:
+            requests = {
+                key: (metrics.duration.copy(), metrics.queries.copy(), metrics.query_seconds.copy())
+                for key, metrics in self.requests.items()
+            }
+            return requests, dict(self.responses), self.queries, self.query_seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.responses.clear()
+            self.queries = 0
+            self.query_seconds = 0.0
+
+
+metrics = Metrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    start = conn.info.pop("query_start", None)
+    if start is not None:
+        metrics.observe_query(time.perf_counter() - start)
+
+
+def install_query_events() -> None:
+    # listening on the Engine class covers every engine, including the sync side of the async ones
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def remove_query_events() -> None:
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_labels(scope: Scope) -> tuple[str, str]:
+    # raw paths would give every document its own series, the route template is used instead
+    route = scope.get("route")
+    if route is None:
+        return "", "unmatched"
+    if "kind_router" in scope:
+        kind = scope["path"].split("/", 2)[1]
+        return kind, "/{kind}" + route.path[len(kind) + 1 :]
+    return "", route.path
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, collector: Metrics = metrics):
+        self.app = app
+        self.collector = collector
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_stats.reset(token)
+            kind, endpoint = route_labels(scope)
+            self.collector.observe_request(kind, endpoint, scope["method"], status, time.perf_counter() - start, stats)
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: object) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram(lines: list[str], name: str, histogram: Histogram, **labels: object) -> None:
+    cumulative = 0
+    for bound, count in zip([*map(str, histogram.bounds), "+Inf"], histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def _header(lines: list[str], name: str, kind: str, description: str) -> None:
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _pool_lines(lines: list[str], pools: dict) -> None:
+    gauges = {
+        "size": "Connections kept in the pool",
+        "checked_out": "Connections in use",
+        "overflow": "Connections opened beyond the pool size",
+        "saturation": "Share of the pool capacity in use",
+    }
+    for field, description in gauges.items():
+        _header(lines, f"db_pool_{field}", "gauge", description)
+        lines.extend(f"db_pool_{field}{_labels(engine=name)} {stats[field]}" for name, stats in pools.items())
+    for field, description in {"checkouts": "Connection checkouts", "timeouts": "Checkouts that timed out"}.items():
+        _header(lines, f"db_pool_{field}_total", "counter", description)
+        lines.extend(f"db_pool_{field}_total{_labels(engine=name)} {stats[field]}" for name, stats in pools.items())
+    _header(lines, "db_pool_wait_seconds", "histogram", "Time spent waiting for a connection")
+    for name, stats in pools.items():
+        wait = Histogram(tuple(float(bound) for bound in stats["wait_buckets"] if bound != "+Inf"))
+        wait.counts = list(stats["wait_buckets"].values())
+        wait.count = stats["checkouts"]
+        wait.sum = stats["wait_seconds_total"]
+        _histogram(lines, "db_pool_wait_seconds", wait, engine=name)
+
+
+def _cache_lines(lines: list[str], stats: dict) -> None:
+    for field in ("size", "max_size"):
+        _header(lines, f"document_cache_{field}", "gauge", f"Document cache {field.replace('_', ' ')}")
+        lines.append(f"document_cache_{field} {stats[field]}")
+    for field in ("hits", "misses", "evictions", "expirations", "invalidations", "shared_hits", "shared_misses"):
+        _header(lines, f"document_cache_{field}_total", "counter", f"Document cache {field.replace('_', ' ')}")
+        lines.append(f"document_cache_{field}_total {stats[field]}")
+
+
+def render(collector: Metrics = metrics, pools: dict | None = None, cache: dict | None = None) -> str:
+    requests, responses, queries, query_seconds = collector.snapshot()
+    lines: list[str] = []
+    _header(lines, "http_requests_total", "counter", "Requests by kind, endpoint, method and status")
+    for (kind, endpoint, method, status), count in sorted(responses.items()):
+        lines.append(
+            f"http_requests_total{_labels(kind=kind, endpoint=endpoint, method=method, status=status)} {count}"
+        )
+    histograms = {
+        "http_request_duration_seconds": "Request latency",
+        "http_request_db_queries": "SQL statements executed per request",
+        "http_request_db_seconds": "Time spent in SQL statements per request",
+    }
+    for index, (name, description) in enumerate(histograms.items()):
+        _header(lines, name, "histogram", description)
+        for (kind, endpoint, method), request in sorted(requests.items()):
+            _histogram(lines, name, request[index], kind=kind, endpoint=endpoint, method=method)
+    _header(lines, "db_queries_total", "counter", "SQL statements executed")
+    lines.append(f"db_queries_total {queries}")
+    _header(lines, "db_query_seconds_total", "counter", "Time spent in SQL statements")
+    lines.append(f"db_query_seconds_total {query_seconds}")
+    if pools:
+        _pool_lines(lines, pools)
+    if cache:
+        _cache_lines(lines, cache)
+    return "\n".join(lines) + "\n"
@@ -2,7 +2,7 @@ import enum
 import uuid
 from typing import Any, NewType, cast
 
-from sqlalchemy import Column, Enum, String
+from sqlalchemy import DDL, Column, Enum, Index, Integer, String, event
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.types import TypeEngine
@@ -20,18 +20,104 @@ class StateEnum(enum.Enum):
     RUNNING = 'RUNNING'
 
 
+# top level fields of a document that are stored as columns instead of inside the JSONB, by their column
+METADATA = {"kind": "document_kind", "name": "name", "version": "version", "description": "description"}
+DOCUMENT_KEYS = ("uuid", *METADATA, "state", "json", "revision")
+
+
 class App(Base):
     __tablename__ = 'apps'
 
     uuid: Column[Id] = Column(PSQLId, primary_key=True, default=uuid.uuid4)
+    # the kind of the router the document was posted to, which listing, search and bulk writes filter on
     kind: Column[str] = Column(String(32), nullable=False)
+    # the kind field of the posted document, nothing requires it to match the router's
+    document_kind: Column[str] = Column(String(32), nullable=False)
     name: Column[str] = Column(String(128), nullable=False)
     version: Column[str] = Column(String(255), nullable=False)
     description: Column[str] = Column(String(4096), nullable=False)
     state: StateEnum = Column(Enum(StateEnum, name='state_enum', nullable=False))  # type: ignore # noqa
-    json: Column[Any] = Column(JSONB, nullable=False)
+    # only the configuration, the rest of the document is already stored in the columns above
+    configuration: Column[Any] = Column(JSONB, nullable=False)
+    # bumped by every write, exposed as the document's ETag
+    revision: Column[int] = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        # keyset pagination for GET /{kind}/, optionally filtered by state
+        Index("ix_apps_kind_uuid", "kind", "uuid"),
+        Index("ix_apps_kind_state_uuid", "kind", "state", "uuid"),
+        # containment (@>) and jsonpath (@@) search over the configuration
+        Index(
+            "ix_apps_configuration",
+            "configuration",
+            postgresql_using="gin",
+            postgresql_ops={"configuration": "jsonb_path_ops"},
+        ),
+    )
+
+    @property
+    def json(self) -> dict:
+        # the document as it was posted, rebuilt from the metadata columns and the configuration
+        return {**{key: getattr(self, column) for key, column in METADATA.items()}, "configuration": self.configuration}
+
+    # the shape the API serves a document in, dict(document) is what jsonable_encoder encodes
+    def keys(self) -> tuple[str, ...]:
+        return DOCUMENT_KEYS
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, METADATA.get(key, key))
 
     def __repr__(self):
         return (
-            f"App({self.uuid}, {self.kind}, {self.name}, {self.version}, {self.description}, {self.state}, {self.json})"
+            f"App({self.uuid}, {self.kind}, {self.document_kind}, {self.name}, {self.version}, {self.description}, {self.state}, "
+            f"{self.revision}, {self.json})"
         )
+
+
+# RFC 7396 JSON merge patch, applied in place by PATCH /{kind}/{uuid}/configuration/
+jsonb_merge_patch = DDL("""
+    CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb)
+    RETURNS jsonb LANGUAGE plpgsql IMMUTABLE AS $$
+    BEGIN
+        IF jsonb_typeof(patch) IS DISTINCT FROM 'object' THEN
+            RETURN patch;
+        END IF;
+        IF jsonb_typeof(target) IS DISTINCT FROM 'object' THEN
+            target := '{}'::jsonb;
+        END IF;
+        RETURN (
+            SELECT coalesce(
+                jsonb_object_agg(
+                    coalesce(p.key, t.key),
+                    CASE WHEN p.key IS NULL THEN t.value ELSE jsonb_merge_patch(t.value, p.value) END
+                ),
+                '{}'::jsonb
+            )
+            FROM jsonb_each(target) AS t
+            FULL OUTER JOIN jsonb_each(patch) AS p ON t.key = p.key
+            WHERE p.key IS NULL OR jsonb_typeof(p.value) <> 'null'
+        );
+    END
+    $$
+    """)
+
+event.listen(App.__table__, "after_create", jsonb_merge_patch)
+
+# every committed state transition is published on this channel and fanned out by app.db.notifications
+STATE_CHANNEL = "app_state"
+
+notify_state = DDL(f"""
+    CREATE OR REPLACE FUNCTION notify_app_state() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify(
+            '{STATE_CHANNEL}',
+            json_build_object('uuid', NEW.uuid, 'kind', NEW.kind, 'state', NEW.state, 'revision', NEW.revision)::text
+        );
+        RETURN NULL;
+    END
+    $$;
+    CREATE TRIGGER apps_notify_state AFTER UPDATE OF state ON apps
+    FOR EACH ROW WHEN (OLD.state IS DISTINCT FROM NEW.state) EXECUTE FUNCTION notify_app_state()
+    """)
+
+event.listen(App.__table__, "after_create", notify_state)
@@ -0,0 +1,148 @@
+# generated by gen-cli gen-models from the 'Main Schema' JSON schema, do not edit
+import re
+from typing import Any
+
+from app.models.validation import DocumentValidationError, parse_json
+
+_C0 = re.compile(
+    '^(?P<major>0|[1-9]\\d*)\\.(?P<minor>0|[1-9]\\d*)\\.(?P<patch>0|[1-9]\\d*)(?:-(?P<prerelease>(?:0|[1-9]\\d*|\\d*[a-zA-Z-][0-9a-zA-Z-]*)(?:\\.(?:0|[1-9]\\d*|\\d*[a-zA-Z-][0-9a-zA-Z-]*))*))?(?:\\+(?P<buildmetadata>[0-9a-zA-Z-]+(?:\\.[0-9a-zA-Z-]+)*))?$'
+)
+_C1 = frozenset(('specification', 'settings'))
+_C2 = frozenset(('kind', 'name', 'description', 'version', 'configuration'))
+
+
+def _v0(value):
+    if not (type(value) is dict):
+        raise DocumentValidationError('value is not a valid dict')
+    key = None
+    try:
+        key = 'kind'
+        if 'kind' in value:
+            if value['kind'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v1(value['kind'])
+        else:
+            raise DocumentValidationError('field required')
+        key = 'name'
+        if 'name' in value:
+            if value['name'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v2(value['name'])
+        else:
+            raise DocumentValidationError('field required')
+        key = 'description'
+        if 'description' in value:
+            if value['description'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v3(value['description'])
+        else:
+            raise DocumentValidationError('field required')
+        key = 'version'
+        if 'version' in value:
+            if value['version'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v4(value['version'])
+        else:
+            raise DocumentValidationError('field required')
+        key = 'configuration'
+        if 'configuration' in value:
+            if value['configuration'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v5(value['configuration'])
+        else:
+            raise DocumentValidationError('field required')
+        for key in value:
+            if key not in _C2:
+                raise DocumentValidationError('extra fields not permitted')
+    except DocumentValidationError as e:
+        e.loc = (key, *e.loc)
+        raise
+    return value
+
+
+def _v1(value):
+    if not (type(value) is str):
+        raise DocumentValidationError('str type expected')
+    if len(value) < 1:
+        raise DocumentValidationError('ensure this value has at least 1 characters')
+    if len(value) > 32:
+        raise DocumentValidationError('ensure this value has at most 32 characters')
+    return value
+
+
+def _v2(value):
+    if not (type(value) is str):
+        raise DocumentValidationError('str type expected')
+    if len(value) < 1:
+        raise DocumentValidationError('ensure this value has at least 1 characters')
+    if len(value) > 128:
+        raise DocumentValidationError('ensure this value has at most 128 characters')
+    return value
+
+
+def _v3(value):
+    if not (type(value) is str):
+        raise DocumentValidationError('str type expected')
+    if len(value) < 1:
+        raise DocumentValidationError('ensure this value has at least 1 characters')
+    if len(value) > 4096:
+        raise DocumentValidationError('ensure this value has at most 4096 characters')
+    return value
+
+
+def _v4(value):
+    if not (type(value) is str):
+        raise DocumentValidationError('str type expected')
+    if _C0.search(value) is None:
+        raise DocumentValidationError(
+            'string does not match regex "^(?P<major>0|[1-9]\\d*)\\.(?P<minor>0|[1-9]\\d*)\\.(?P<patch>0|[1-9]\\d*)(?:-(?P<prerelease>(?:0|[1-9]\\d*|\\d*[a-zA-Z-][0-9a-zA-Z-]*)(?:\\.(?:0|[1-9]\\d*|\\d*[a-zA-Z-][0-9a-zA-Z-]*))*))?(?:\\+(?P<buildmetadata>[0-9a-zA-Z-]+(?:\\.[0-9a-zA-Z-]+)*))?$"'
+        )
+    return value
+
+
+def _v5(value):
+    if not (type(value) is dict):
+        raise DocumentValidationError('value is not a valid dict')
+    key = None
+    try:
+        key = 'specification'
+        if 'specification' in value:
+            if value['specification'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v6(value['specification'])
+        else:
+            raise DocumentValidationError('field required')
+        key = 'settings'
+        if 'settings' in value:
+            if value['settings'] is None:
+                raise DocumentValidationError('none is not an allowed value')
+            _v7(value['settings'])
+        else:
+            raise DocumentValidationError('field required')
+        for key in value:
+            if key not in _C1:
+                raise DocumentValidationError('extra fields not permitted')
+    except DocumentValidationError as e:
+        e.loc = (key, *e.loc)
+        raise
+    return value
+
+
+def _v6(value):
+    if not (type(value) is dict):
+        raise DocumentValidationError('value is not a valid dict')
+    return value
+
+
+def _v7(value):
+    if not (type(value) is dict):
+        raise DocumentValidationError('value is not a valid dict')
+    return value
+
+
+def validate(document: Any) -> dict:
+    return _v0(document)
+
+
+def validate_json(body: bytes) -> dict:
+    return _v0(parse_json(body))
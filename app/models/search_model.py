@@ -0,0 +1,29 @@
+from typing import Any
+
+from pydantic import BaseModel, Field, validator
+
+from app.models.app_model import Id, StateEnum
+
+
+class DocumentFilter(BaseModel):
+    class Config:
+        extra = "forbid"
+
+    contains: dict[str, Any] | None = Field(None, description="Documents containing this JSON object (@>)")
+    equals: dict[str, Any] = Field({}, description="Dotted path to scalar value, e.g. configuration.settings.a")
+    state: StateEnum | None = None
+    version: str | None = None
+
+    @validator("equals")
+    def check_equals(cls, equals: dict[str, Any]) -> dict[str, Any]:
+        for path, value in equals.items():
+            if not path or "" in path.split("."):
+                raise ValueError(f"'{path}' is not a valid dotted path")
+            if isinstance(value, (dict, list)):
+                raise ValueError(f"'{path}' must be compared with a scalar, use contains for objects")
+        return equals
+
+
+class SearchQuery(DocumentFilter):
+    after: Id | None = None
+    limit: int = Field(100, ge=1, le=1000)
@@ -0,0 +1,26 @@
+import json
+from typing import Any
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+
+class DocumentValidationError(ValueError):
+    def __init__(self, msg: str, loc: tuple = ()):
+        super().__init__(msg)
+        self.msg = msg
+        self.loc = loc
+
+
+def parse_json(body: bytes) -> Any:
+    try:
+        return _loads(body)
+    except ValueError:
+        raise DocumentValidationError("Request body is not valid JSON")
+
+
+def in_enum(value: Any, options: list) -> bool:
+    # JSON Schema compares by JSON type as well, so True must not match 1
+    return any(value == option and type(value) is type(option) for option in options)
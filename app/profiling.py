@@ -0,0 +1,257 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import count
+from types import FrameType
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+from starlette import concurrency
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import route_labels
+from app.settings import profiling_settings
+
+# a thread whose innermost frame is in one of these files is waiting, not working for the request
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+MAX_STATEMENT_LENGTH = 1000
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str):
+        self.id = profile_id
+        self.started = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.method = method
+        self.path = path
+        self.kind = ""
+        self.endpoint = ""
+        self.status = 500
+        self.duration = 0.0
+        self.stacks: Counter[str] = Counter()
+        self.queries: list[dict] = []
+        # the worker threads while they run the request's code, the event loop thread is sampled only while it
+        # runs the request's task, whose outermost frame is task_frame
+        self.threads: set[int] = set()
+        self.loop_thread: int | None = None
+        self.task_frame: FrameType | None = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "started": self.started.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "kind": self.kind,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "duration_ms": self.duration * 1000,
+            "samples": sum(self.stacks.values()),
+            "queries": len(self.queries),
+            "query_ms": sum(query["duration_ms"] for query in self.queries),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "stacks": dict(self.stacks.most_common()), "sql": self.queries}
+
+    def folded(self) -> str:
+        # the folded stack format read by flamegraph.pl and speedscope
+        return "".join(f"{stack} {samples}\n" for stack, samples in self.stacks.most_common())
+
+
+class ProfileBuffer:
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._profiles: deque[Profile] = deque(maxlen=size)
+        self._ids = count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def list(self) -> list[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profiles = ProfileBuffer(profiling_settings.buffer_size)
+
+_profile: ContextVar[Profile | None] = ContextVar("profile", default=None)
+
+
+def _folded_stack(frame: FrameType | None) -> str | None:
+    if frame is None or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+        return None
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _runs(frame: FrameType | None, task_frame: FrameType | None) -> bool:
+    # the loop thread is running the request's task, not one of the other requests it interleaves with
+    while frame is not None:
+        if frame is task_frame:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class Sampler(threading.Thread):
+    def __init__(self, profile: Profile, interval: float):
+        super().__init__(name=f"profile-{profile.id}", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if self._sampled(thread_id, frame) and (stack := _folded_stack(frame)) is not None:
+                    self.profile.stacks[stack] += 1
+
+    def _sampled(self, thread_id: int, frame: FrameType) -> bool:
+        if thread_id == self.profile.loop_thread:
+            return _runs(frame, self.profile.task_frame)
+        return thread_id in self.profile.threads
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def request_thread(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # a sync endpoint runs in a pool thread that other requests reuse, so the thread is sampled only meanwhile
+    @wraps(endpoint)
+    def run(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.threads.discard(thread_id)
+
+    run.request_thread = True
+    return run
+
+
+async def run_in_threadpool(func: Callable[..., Any], *args, **kwargs) -> Any:
+    # for the work async endpoints hand to the threadpool
+    return await concurrency.run_in_threadpool(request_thread(func), *args, **kwargs)
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        # include_router copies the route with its class, the endpoint is wrapped once
+        if not asyncio.iscoroutinefunction(endpoint) and not getattr(endpoint, "request_thread", False):
+            endpoint = request_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _profile.get() is not None:
+        conn.info["profile_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _profile.get()
+    start = conn.info.pop("profile_query_start", None)
+    if profile is None or start is None:
+        return
+    profile.queries.append(
+        {
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "offset_ms": (start - profile.start) * 1000,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+            "thread": threading.current_thread().name,
+        }
+    )
+
+
+def install_query_events() -> None:
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        buffer: ProfileBuffer = profiles,
+        header: str = profiling_settings.header,
+        sample_rate: float = profiling_settings.sample_rate,
+        interval: float = profiling_settings.interval,
+    ):
+        self.app = app
+        self.buffer = buffer
+        self.header = header.lower().encode()
+        self.sample_rate = sample_rate
+        self.interval = interval
+        # one request is profiled at a time, which bounds the sampling overhead
+        self._active = threading.Lock()
+        install_query_events()
+
+    def requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value.lower() not in (b"0", b"false", b"no")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.requested(scope) or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.profile(scope, receive, send)
+        finally:
+            self._active.release()
+
+    async def profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profile = Profile(self.buffer.next_id(), scope["method"], scope["path"])
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        token = _profile.set(profile)
+        profile.loop_thread = threading.get_ident()
+        profile.task_frame = sys._getframe()
+        sampler = Sampler(profile, self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration = time.perf_counter() - profile.start
+            # joining the sampler must not block the event loop
+            await asyncio.to_thread(sampler.stop)
+            profile.task_frame = None
+            _profile.reset(token)
+            profile.kind, profile.endpoint = route_labels(scope)
+            self.buffer.add(profile)
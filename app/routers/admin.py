@@ -0,0 +1,99 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.db import cache, notifications, replicas, state_queue
+from app.db.database import pool_stats
+from app.profiling import Profile, profiles
+from app.routers.registry import InvalidSchemaError, registry
+from app.settings import registry_settings
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/pool/", status_code=200)
+def get_pool_stats():
+    return pool_stats()
+
+
+@router.get("/cache/", status_code=200)
+def get_cache_stats():
+    if cache.document_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.document_cache.stats()}
+
+
+@router.get("/state-queue/", status_code=200)
+def get_state_queue_stats():
+    if state_queue.state_queue is None:
+        return {"enabled": False}
+    return {"enabled": True, **state_queue.state_queue.stats()}
+
+
+@router.get("/replicas/", status_code=200)
+def get_replica_stats():
+    if replicas.replica_set is None:
+        return {"enabled": False}
+    return {"enabled": True, **replicas.replica_set.stats(), "sticky": len(replicas.sticky)}
+
+
+@router.get("/notifications/", status_code=200)
+async def get_notifications_stats():
+    # the subscribers belong to the event loop, they are counted there instead of in the threadpool
+    if notifications.notifier is None:
+        return {"enabled": False}
+    return {"enabled": True, **notifications.notifier.stats()}
+
+
+@router.get("/kinds/", status_code=200)
+def get_kinds():
+    return registry.kinds()
+
+
+def require_admin_token(authorization: str | None = Header(None)) -> None:
+    token = registry_settings.admin_token
+    if not token:
+        raise HTTPException(status_code=403, detail="Registering kinds is disabled, set REGISTRY_ADMIN_TOKEN")
+    if authorization is None or not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.post("/kinds/", status_code=201, dependencies=[Depends(require_admin_token)])
+def post_kind(schema: dict):
+    try:
+        return registry.register_schema(schema)
+    except InvalidSchemaError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.delete("/kinds/{kind}/", status_code=204, response_model=None, dependencies=[Depends(require_admin_token)])
+def delete_kind(kind: str) -> None:
+    if not registry.unregister(kind):
+        raise HTTPException(status_code=404, detail="Kind not found")
+    return None
+
+
+@router.get("/profiles/", status_code=200)
+def get_profiles():
+    return [profile.summary() for profile in profiles.list()]
+
+
+def _get_profile(profile_id: int) -> Profile:
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}/", status_code=200)
+def get_profile(profile_id: int):
+    return _get_profile(profile_id).to_dict()
+
+
+@router.get("/profiles/{profile_id}/folded", status_code=200, response_class=PlainTextResponse)
+def get_profile_folded(profile_id: int):
+    profile = _get_profile(profile_id)
+    return PlainTextResponse(
+        profile.folded(), headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'}
+    )
@@ -0,0 +1,122 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Type
+from uuid import uuid4
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+from app.models.app_model import App, Id, StateEnum
+from app.models.validation import DocumentValidationError, parse_json
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CHUNK_SIZE = 1000
+
+_INVALID_LINE = object()
+
+
+async def iter_items(request: Request) -> AsyncIterator[Any]:
+    if request.headers.get("content-type", "").split(";")[0].strip() not in NDJSON_MEDIA_TYPES:
+        try:
+            items = parse_json(await request.body())
+        except DocumentValidationError as exc:
+            raise HTTPException(status_code=400, detail=exc.msg)
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+        for item in items:
+            yield item
+        return
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return parse_json(line)
+    except DocumentValidationError:
+        return _INVALID_LINE
+
+
+def request_body(model: Type[BaseModel] | None, array: bool = False) -> dict | None:
+    # the body is read raw for the compiled validator, so its schema is added to OpenAPI by hand
+    if model is None:
+        return None
+    # model.schema() is cached by pydantic and is not modified here
+    schema = model.schema()
+    definitions = schema.get("definitions", {})
+    schema = _inline({key: value for key, value in schema.items() if key != "definitions"}, definitions, frozenset())
+    content = {"application/json": {"schema": {"type": "array", "items": schema} if array else schema}}
+    if array:
+        content.update({media_type: {"schema": schema} for media_type in NDJSON_MEDIA_TYPES})
+    return {"requestBody": {"content": content, "required": True}}
+
+
+def _inline(schema: Any, definitions: dict, seen: frozenset) -> Any:
+    # the schema is embedded in the operation, where #/definitions/ does not resolve; a recursive reference is
+    # left open
+    if isinstance(schema, list):
+        return [_inline(item, definitions, seen) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    name = schema.get("$ref", "").removeprefix("#/definitions/")
+    if name in definitions:
+        return {} if name in seen else _inline(definitions[name], definitions, seen | {name})
+    return {key: _inline(value, definitions, seen) for key, value in schema.items()}
+
+
+def build_document(document: dict, kind: str, state: StateEnum) -> App:
+    # the document is stored under the kind of the router it was posted to, whatever its own kind field says
+    return App(
+        uuid=uuid4(),
+        kind=kind,
+        document_kind=document["kind"],
+        name=document["name"],
+        version=document["version"],
+        description=document["description"],
+        state=state,
+        configuration=document["configuration"],
+    )
+
+
+async def ingest(
+    request: Request,
+    kind: str,
+    validate: Callable[[Any], dict],
+    state: StateEnum,
+    insert_chunk: Callable[[list[App]], Awaitable[set[Id]]],
+    chunk_size: int = CHUNK_SIZE,
+) -> list[dict]:
+    results: list[dict] = []
+    pending: list[tuple[dict, App]] = []
+
+    async def flush() -> None:
+        inserted = await insert_chunk([document for _, document in pending])
+        for result, document in pending:
+            if document.uuid in inserted:
+                result["uuid"] = document.uuid
+            else:
+                result["error"] = "Document already exists"
+        pending.clear()
+
+    async for item in iter_items(request):
+        result: dict = {"index": len(results)}
+        results.append(result)
+        if item is _INVALID_LINE:
+            result["error"] = "Line is not valid JSON"
+            continue
+        try:
+            pending.append((result, build_document(validate(item), kind, state)))
+        except DocumentValidationError as exc:
+            result["error"] = exc.msg
+            continue
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+    return results
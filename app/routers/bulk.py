@@ -0,0 +1,6 @@
+from app.models.app_model import Id
+
+
+def result(uuids: list[Id], ids: bool) -> dict:
+    # a rollout can touch many thousands of documents, so their uuids are only sent when asked for
+    return {"count": len(uuids), "uuids": uuids} if ids else {"count": len(uuids)}
@@ -0,0 +1,42 @@
+from fastapi import Response
+
+
+def etag(revision: int) -> str:
+    return f'"{revision}"'
+
+
+def _revision(tag: str, weak: bool) -> int | None:
+    # If-Match compares strongly (RFC 9110, 13.1.1), a weak tag there matches nothing; If-None-Match compares weakly
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        if not weak:
+            return None
+        tag = tag[2:]
+    tag = tag.strip('"')
+    return int(tag) if tag.isdigit() else None
+
+
+def _revisions(header: str, weak: bool) -> list[int]:
+    return [revision for tag in header.split(",") if (revision := _revision(tag, weak)) is not None]
+
+
+def revisions(if_match: str | None) -> list[int] | None:
+    # None means unconditional; an If-Match without any usable ETag matches no revision at all
+    if if_match is None or if_match.strip() == "*":
+        return None
+    return _revisions(if_match, weak=False)
+
+
+def not_modified(if_none_match: str | None, revision: int) -> bool:
+    if if_none_match is None:
+        return False
+    return if_none_match.strip() == "*" or revision in _revisions(if_none_match, weak=True)
+
+
+def not_modified_response(revision: int) -> Response:
+    return Response(status_code=304, headers={"ETag": etag(revision)})
+
+
+def json_response(revision: int, body: bytes) -> Response:
+    # body is already JSON rendered by Postgres, it is sent as is
+    return Response(content=body, media_type="application/json", headers={"ETag": etag(revision)})
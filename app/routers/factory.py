@@ -0,0 +1,448 @@
+from functools import partial
+from typing import Any, Callable, Type
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import async_crud, crud
+from app.db.database import get_async_db, get_db
+from app.db.replicas import get_async_read_db, get_async_write_db, get_read_db, get_write_db
+from app.models.app_model import Id, StateEnum
+from app.models.main_model import Configuration, MainModel
+from app.models.search_model import DocumentFilter, SearchQuery
+from app.profiling import ProfiledRoute, run_in_threadpool
+from app.routers import batch, bulk, conditional, streaming, watch, write_behind
+
+
+def create_router(
+    kind: str,
+    validate: Callable[[Any], dict],
+    validate_json: Callable[[bytes], dict],
+    configuration: Type[BaseModel] = Configuration,
+    model: Type[BaseModel] | None = MainModel,
+) -> APIRouter:
+    # the endpoints of every kind: the generated routers, the static /test router and the kinds served from the registry
+    router = APIRouter(
+        prefix=f"/{kind}",
+        route_class=ProfiledRoute,
+        responses={
+            "400": {"description": "Bad Request"},
+            "404": {"description": "Not Found"},
+            "409": {"description": "Conflict"},
+            "500": {"description": "Internal Server Error"},
+        },
+    )
+
+    @router.post("/", status_code=201, openapi_extra=batch.request_body(model))
+    async def post_document(
+        request: Request,
+        state: StateEnum = StateEnum.NEW,
+        db: Session = Depends(get_write_db),
+    ):
+        document = batch.build_document(validate_json(await request.body()), kind, state)
+        response = await run_in_threadpool(crud.create_document, db, document)
+        if response is None:
+            raise HTTPException(status_code=409, detail="Document already exists")
+        return document.uuid
+
+    @router.post("/batch", status_code=200, openapi_extra=batch.request_body(model, array=True))
+    async def post_documents(
+        request: Request,
+        state: StateEnum = StateEnum.NEW,
+        db: Session = Depends(get_write_db),
+    ):
+        return await batch.ingest(request, kind, validate, state, partial(run_in_threadpool, crud.create_documents, db))
+
+    @router.get("/", status_code=200)
+    def list_documents(
+        after: Id | None = None,
+        limit: int = Query(100, ge=1, le=1000),
+        state: StateEnum | None = None,
+        stream: bool = False,
+        db: Session = Depends(get_read_db),
+    ):
+        if stream:
+            documents = crud.stream_documents(db, kind, after, state)
+            return StreamingResponse(streaming.ndjson_lines(documents), media_type=streaming.NDJSON_MEDIA_TYPE)
+        return streaming.page(crud.list_documents(db, kind, after, limit + 1, state), limit)
+
+    @router.post("/search", status_code=200)
+    def search_documents(query: SearchQuery, db: Session = Depends(get_read_db)):
+        return streaming.page(crud.search_documents(db, kind, query, query.limit + 1), query.limit)
+
+    @router.put("/state/", status_code=200)
+    def put_documents_state(
+        state: StateEnum,
+        query: DocumentFilter,
+        ids: bool = False,
+        db: Session = Depends(get_write_db),
+    ):
+        return bulk.result(crud.update_documents_state(db, kind, query, state), ids)
+
+    @router.delete("/", status_code=200)
+    def delete_documents(query: DocumentFilter, ids: bool = False, db: Session = Depends(get_write_db)):
+        return bulk.result(crud.delete_documents(db, kind, query), ids)
+
+    @router.delete(
+        "/{uuid}/",
+        status_code=204,
+        response_model=None,
+        responses={
+            "204": {"description": "Document deleted successfully"},
+            "412": {"description": "Precondition Failed"},
+        },
+    )
+    def delete_document(uuid: Id, if_match: str | None = Header(None), db: Session = Depends(get_write_db)) -> None:
+        document = crud.delete_document(db, uuid, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return None
+
+    @router.get(
+        "/{uuid}/",
+        status_code=200,
+        response_class=Response,
+        responses={"200": {"content": {"application/json": {}}}, "304": {"description": "Not Modified"}},
+    )
+    def get_document(uuid: Id, if_none_match: str | None = Header(None), db: Session = Depends(get_read_db)):
+        document = crud.read_document_json(db, uuid)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        revision, body = document
+        if conditional.not_modified(if_none_match, revision):
+            return conditional.not_modified_response(revision)
+        return conditional.json_response(revision, body)
+
+    @router.get("/{uuid}/state/", status_code=200, responses={"304": {"description": "Not Modified"}})
+    def get_document_state(
+        uuid: Id, response: Response, if_none_match: str | None = Header(None), db: Session = Depends(get_read_db)
+    ):
+        document = crud.read_document(db, uuid)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        pending = write_behind.pending_state(uuid)
+        if pending is not None:
+            # a queued transition has no revision yet, so it is served without an ETag
+            return pending
+        if conditional.not_modified(if_none_match, document.revision):
+            return conditional.not_modified_response(document.revision)
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document.state
+
+    @router.put(
+        "/{uuid}/state/",
+        status_code=200,
+        responses={"202": {"description": "Accepted, written behind"}, "412": {"description": "Precondition Failed"}},
+    )
+    def put_document_state(
+        uuid: Id,
+        state: StateEnum,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: Session = Depends(get_write_db),
+    ):
+        if write_behind.writes_behind(if_match):
+            # the transition is acknowledged before it is written, so the document is looked up (or found queued)
+            if write_behind.pending_state(uuid) is None and crud.read_document(db, uuid) is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            return write_behind.enqueue_state(uuid, state)
+        document = crud.update_document_state(db, uuid, state, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.get(
+        "/{uuid}/state/watch",
+        status_code=200,
+        responses={"200": {"content": {"text/event-stream": {}}}, "304": {"description": "Not Modified"}},
+    )
+    async def watch_document_state(
+        uuid: Id,
+        request: Request,
+        timeout: float | None = Query(None, gt=0, le=3600),
+        if_none_match: str | None = Header(None),
+        db: Session = Depends(get_db),
+    ):
+        return await watch.watch_state(request, uuid, watch.sync_loader(db, uuid), if_none_match, timeout)
+
+    @router.get("/state/events", status_code=200, responses={"200": {"content": {"text/event-stream": {}}}})
+    async def watch_kind_states(timeout: float | None = Query(None, gt=0, le=3600)):
+        return await watch.watch_kind(kind, timeout)
+
+    @router.put("/{uuid}/configuration/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    def put_document_config(
+        uuid: Id,
+        config: configuration,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: Session = Depends(get_write_db),
+    ):
+        document = crud.update_document_configuration(db, uuid, config, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.patch("/{uuid}/configuration/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    def patch_document_config(
+        uuid: Id,
+        response: Response,
+        patch: dict = Body(..., media_type="application/merge-patch+json"),
+        if_match: str | None = Header(None),
+        db: Session = Depends(get_write_db),
+    ):
+        for field, value in patch.items():
+            if field not in configuration.__fields__:
+                raise HTTPException(status_code=400, detail="extra fields not permitted")
+            if not isinstance(value, dict):
+                raise HTTPException(status_code=400, detail=f"{field} must be an object")
+        try:
+            document = crud.patch_document_configuration(
+                db, uuid, patch, conditional.revisions(if_match), configuration
+            )
+        except ValidationError as exc:
+            raise HTTPException(status_code=400, detail=exc.errors()[0]["msg"])
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.put("/{uuid}/settings/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    def put_document_settings(
+        uuid: Id,
+        settings: dict,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: Session = Depends(get_write_db),
+    ):
+        document = crud.update_document_settings(db, uuid, settings, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    return router
+
+
+def create_async_router(
+    kind: str,
+    validate: Callable[[Any], dict],
+    validate_json: Callable[[bytes], dict],
+    configuration: Type[BaseModel] = Configuration,
+    model: Type[BaseModel] | None = MainModel,
+) -> APIRouter:
+    # the same endpoints on async_crud and the asyncpg engine
+    router = APIRouter(
+        prefix=f"/{kind}",
+        route_class=ProfiledRoute,
+        responses={
+            "400": {"description": "Bad Request"},
+            "404": {"description": "Not Found"},
+            "409": {"description": "Conflict"},
+            "500": {"description": "Internal Server Error"},
+        },
+    )
+
+    @router.post("/", status_code=201, openapi_extra=batch.request_body(model))
+    async def post_document(
+        request: Request,
+        state: StateEnum = StateEnum.NEW,
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        document = batch.build_document(validate_json(await request.body()), kind, state)
+        response = await async_crud.create_document(db, document)
+        if response is None:
+            raise HTTPException(status_code=409, detail="Document already exists")
+        return document.uuid
+
+    @router.post("/batch", status_code=200, openapi_extra=batch.request_body(model, array=True))
+    async def post_documents(
+        request: Request,
+        state: StateEnum = StateEnum.NEW,
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        return await batch.ingest(request, kind, validate, state, partial(async_crud.create_documents, db))
+
+    @router.get("/", status_code=200)
+    async def list_documents(
+        after: Id | None = None,
+        limit: int = Query(100, ge=1, le=1000),
+        state: StateEnum | None = None,
+        stream: bool = False,
+        db: AsyncSession = Depends(get_async_read_db),
+    ):
+        if stream:
+            documents = async_crud.stream_documents(db, kind, after, state)
+            return StreamingResponse(streaming.async_ndjson_lines(documents), media_type=streaming.NDJSON_MEDIA_TYPE)
+        return streaming.page(await async_crud.list_documents(db, kind, after, limit + 1, state), limit)
+
+    @router.post("/search", status_code=200)
+    async def search_documents(query: SearchQuery, db: AsyncSession = Depends(get_async_read_db)):
+        return streaming.page(await async_crud.search_documents(db, kind, query, query.limit + 1), query.limit)
+
+    @router.put("/state/", status_code=200)
+    async def put_documents_state(
+        state: StateEnum,
+        query: DocumentFilter,
+        ids: bool = False,
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        return bulk.result(await async_crud.update_documents_state(db, kind, query, state), ids)
+
+    @router.delete("/", status_code=200)
+    async def delete_documents(
+        query: DocumentFilter, ids: bool = False, db: AsyncSession = Depends(get_async_write_db)
+    ):
+        return bulk.result(await async_crud.delete_documents(db, kind, query), ids)
+
+    @router.delete(
+        "/{uuid}/",
+        status_code=204,
+        response_model=None,
+        responses={
+            "204": {"description": "Document deleted successfully"},
+            "412": {"description": "Precondition Failed"},
+        },
+    )
+    async def delete_document(
+        uuid: Id, if_match: str | None = Header(None), db: AsyncSession = Depends(get_async_write_db)
+    ) -> None:
+        document = await async_crud.delete_document(db, uuid, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return None
+
+    @router.get(
+        "/{uuid}/",
+        status_code=200,
+        response_class=Response,
+        responses={"200": {"content": {"application/json": {}}}, "304": {"description": "Not Modified"}},
+    )
+    async def get_document(
+        uuid: Id, if_none_match: str | None = Header(None), db: AsyncSession = Depends(get_async_read_db)
+    ):
+        document = await async_crud.read_document_json(db, uuid)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        revision, body = document
+        if conditional.not_modified(if_none_match, revision):
+            return conditional.not_modified_response(revision)
+        return conditional.json_response(revision, body)
+
+    @router.get("/{uuid}/state/", status_code=200, responses={"304": {"description": "Not Modified"}})
+    async def get_document_state(
+        uuid: Id,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_read_db),
+    ):
+        document = await async_crud.read_document(db, uuid)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        pending = write_behind.pending_state(uuid)
+        if pending is not None:
+            # a queued transition has no revision yet, so it is served without an ETag
+            return pending
+        if conditional.not_modified(if_none_match, document.revision):
+            return conditional.not_modified_response(document.revision)
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document.state
+
+    @router.put(
+        "/{uuid}/state/",
+        status_code=200,
+        responses={"202": {"description": "Accepted, written behind"}, "412": {"description": "Precondition Failed"}},
+    )
+    async def put_document_state(
+        uuid: Id,
+        state: StateEnum,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        if write_behind.writes_behind(if_match):
+            # the transition is acknowledged before it is written, so the document is looked up (or found queued)
+            if write_behind.pending_state(uuid) is None and await async_crud.read_document(db, uuid) is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            return write_behind.enqueue_state(uuid, state)
+        document = await async_crud.update_document_state(db, uuid, state, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.get(
+        "/{uuid}/state/watch",
+        status_code=200,
+        responses={"200": {"content": {"text/event-stream": {}}}, "304": {"description": "Not Modified"}},
+    )
+    async def watch_document_state(
+        uuid: Id,
+        request: Request,
+        timeout: float | None = Query(None, gt=0, le=3600),
+        if_none_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        return await watch.watch_state(request, uuid, watch.async_loader(db, uuid), if_none_match, timeout)
+
+    @router.get("/state/events", status_code=200, responses={"200": {"content": {"text/event-stream": {}}}})
+    async def watch_kind_states(timeout: float | None = Query(None, gt=0, le=3600)):
+        return await watch.watch_kind(kind, timeout)
+
+    @router.put("/{uuid}/configuration/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    async def put_document_config(
+        uuid: Id,
+        config: configuration,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        document = await async_crud.update_document_configuration(db, uuid, config, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.patch("/{uuid}/configuration/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    async def patch_document_config(
+        uuid: Id,
+        response: Response,
+        patch: dict = Body(..., media_type="application/merge-patch+json"),
+        if_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        for field, value in patch.items():
+            if field not in configuration.__fields__:
+                raise HTTPException(status_code=400, detail="extra fields not permitted")
+            if not isinstance(value, dict):
+                raise HTTPException(status_code=400, detail=f"{field} must be an object")
+        try:
+            document = await async_crud.patch_document_configuration(
+                db, uuid, patch, conditional.revisions(if_match), configuration
+            )
+        except ValidationError as exc:
+            raise HTTPException(status_code=400, detail=exc.errors()[0]["msg"])
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    @router.put("/{uuid}/settings/", status_code=200, responses={"412": {"description": "Precondition Failed"}})
+    async def put_document_settings(
+        uuid: Id,
+        settings: dict,
+        response: Response,
+        if_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_write_db),
+    ):
+        document = await async_crud.update_document_settings(db, uuid, settings, conditional.revisions(if_match))
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        response.headers["ETag"] = conditional.etag(document.revision)
+        return document
+
+    return router
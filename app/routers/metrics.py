@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.db import cache
+from app.db.database import pool_stats
+from app.metrics import CONTENT_TYPE, render
+
+router = APIRouter(tags=["metrics"])
+
+
+# a plain def runs in the threadpool, so rendering never blocks the event loop
+@router.get("/metrics", status_code=200, response_class=PlainTextResponse)
+def get_metrics():
+    document_cache = cache.document_cache
+    text = render(pools=pool_stats(), cache=None if document_cache is None else document_cache.stats())
+    return PlainTextResponse(text, media_type=CONTENT_TYPE)
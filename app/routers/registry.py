@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import jsonschema
+import yaml
+from fastapi import APIRouter
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+from app.routers.factory import create_router
+from app.utils.model_generator import compile_model
+from app.utils.schema_validate import get_kind, is_subset
+from app.utils.validator_generator import compile_validator
+
+main_schema_filename = os.path.dirname(os.path.abspath(__file__)) + "/../schemas/main_schema.json"
+SCHEMA_SUFFIXES = (".json", ".yaml", ".yml")
+
+
+class InvalidSchemaError(ValueError):
+    pass
+
+
+@lru_cache
+def main_schema() -> dict:
+    with open(main_schema_filename) as f:
+        return json.load(f)
+
+
+def check_schema(schema: dict) -> None:
+    try:
+        jsonschema.Draft202012Validator.check_schema(schema)
+    except jsonschema.exceptions.SchemaError as exc:
+        raise InvalidSchemaError(exc.message)
+
+
+class KindRegistry:
+    def __init__(self, dependency_overrides_provider: Any = None):
+        # the FastAPI app, so that its dependency_overrides apply to the registered kinds as to included routers
+        self.dependency_overrides_provider = dependency_overrides_provider
+        self._routers: dict[str, APIRouter] = {}
+        # routers generated by gen-rest, they take precedence over the kinds registered from schemas
+        self._generated: dict[str, APIRouter] = {}
+        self._lock = threading.Lock()
+        # compile_model registers its module in sys.modules while it runs, so builds do not overlap
+        self._build_lock = threading.Lock()
+
+    def kinds(self) -> list[str]:
+        return sorted(self._routers.keys() | self._generated.keys())
+
+    def generated_routes(self) -> list[BaseRoute]:
+        return [route for router in self._generated.values() for route in router.routes]
+
+    def register_schema(self, schema: dict) -> str:
+        # the router is built here, off the event loop (the watcher thread or the threadpool of the admin endpoint),
+        # so that dispatching a request stays a dict lookup
+        check_schema(schema)
+        kind = get_kind(schema)
+        if not kind:
+            raise InvalidSchemaError("Kind is not defined, check the schema for validity.")
+        if not is_subset(schema, main_schema()):
+            raise InvalidSchemaError("Schema is not a subset of the main schema")
+        router = self._build(kind.lower(), {**schema, "title": kind})
+        with self._lock:
+            self._routers[kind.lower()] = router
+        return kind.lower()
+
+    def register_router(self, kind: str, router: APIRouter) -> None:
+        with self._lock:
+            self._generated[kind] = self._wrap(router)
+
+    def unregister_router(self, kind: str) -> bool:
+        with self._lock:
+            return self._generated.pop(kind, None) is not None
+
+    def unregister(self, kind: str) -> bool:
+        with self._lock:
+            return self._routers.pop(kind, None) is not None
+
+    def get(self, kind: str) -> APIRouter | None:
+        return self._generated.get(kind) or self._routers.get(kind)
+
+    def _build(self, kind: str, schema: dict) -> APIRouter:
+        with self._build_lock:
+            try:
+                # the Configuration model the generated routers import, for PUT and PATCH of the configuration
+                model = compile_model(schema, f"{schema['title']}Model")
+                validator = compile_validator(schema, f"{schema['title']}Validator")
+            except Exception as exc:
+                raise InvalidSchemaError(f"Kind '{kind}' cannot be built: {exc}")
+        # the kinds served from the registry are not in the OpenAPI schema
+        return self._wrap(create_router(kind, validator.validate, validator.validate_json, model.Configuration, None))
+
+    def _wrap(self, router: APIRouter) -> APIRouter:
+        wrapper = APIRouter(dependency_overrides_provider=self.dependency_overrides_provider)
+        wrapper.include_router(router)
+        return wrapper
+
+
+class RegistryRoute(BaseRoute):
+    # a single route that looks the kind up by the first path segment and hands the request to its router,
+    # so routing costs one dict lookup plus the kind's own routes however many kinds are registered
+    def __init__(self, registry: KindRegistry):
+        self.registry = registry
+
+    def matches(self, scope: Scope) -> tuple[Match, Scope]:
+        if scope["type"] == "http":
+            router = self.registry.get(scope["path"].split("/", 2)[1])
+            if router is not None:
+                return Match.FULL, {"kind_router": router}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await scope["kind_router"](scope, receive, send)
+
+
+class SchemasWatcher:
+    def __init__(self, registry: KindRegistry, directory: str, interval: float = 1.0):
+        self.registry = registry
+        self.directory = Path(directory)
+        self.interval = interval
+        self._mtimes: dict[Path, int] = {}
+        self._kinds: dict[Path, str] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def scan(self) -> None:
+        paths = {path for path in self.directory.iterdir() if path.suffix in SCHEMA_SUFFIXES}
+        for path in self._mtimes.keys() - paths:
+            del self._mtimes[path]
+            # a schema that failed to load has no kind
+            kind = self._kinds.pop(path, None)
+            if kind is not None:
+                self.registry.unregister(kind)
+        for path in sorted(paths):
+            try:
+                modified = path.stat().st_mtime_ns
+                if self._mtimes.get(path) == modified:
+                    continue
+                self._mtimes[path] = modified
+                with open(path) as f:
+                    schema = yaml.safe_load(f) if path.suffix != ".json" else json.load(f)
+                kind = self.registry.register_schema(schema)
+            except (OSError, ValueError, yaml.YAMLError) as exc:
+                print(f"Skipped schema '{path}': {exc}")
+                continue
+            previous = self._kinds.get(path)
+            if previous is not None and previous != kind:
+                self.registry.unregister(previous)
+            self._kinds[path] = kind
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="schemas-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        # the first scan runs here as well, so startup does not wait for the schemas directory
+        self._scan()
+        while not self._stop.wait(self.interval):
+            self._scan()
+
+    def _scan(self) -> None:
+        # a failed scan is retried on the next tick instead of stopping the watcher
+        try:
+            self.scan()
+        except Exception as exc:
+            print(f"Schemas scan failed: {exc!r}")
+
+
+registry = KindRegistry()
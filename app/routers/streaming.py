@@ -0,0 +1,21 @@
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from app.models.app_model import App
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_lines(documents: Iterable[str]) -> Iterator[str]:
+    for document in documents:
+        yield document + "\n"
+
+
+async def async_ndjson_lines(documents: AsyncIterable[str]) -> AsyncIterator[str]:
+    async for document in documents:
+        yield document + "\n"
+
+
+def page(documents: list[App], limit: int) -> dict:
+    # the caller fetches limit + 1 rows, the extra one only tells whether there is a next page
+    items = documents[:limit]
+    return {"items": items, "next": items[-1].uuid if len(documents) > limit else None}
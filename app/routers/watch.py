@@ -0,0 +1,127 @@
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import notifications, statements
+from app.db.errors import NotificationsUnavailableError
+from app.db.notifications import Subscription
+from app.models.app_model import App, Id
+from app.profiling import run_in_threadpool
+from app.routers import conditional
+from app.settings import notifications_settings
+
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+Loader = Callable[[], Awaitable[App | None]]
+
+
+# the watch reads go past the document cache, a stale revision would wait for a transition that already happened
+# and the session is closed right after the read, so a waiting watcher holds no pooled connection
+def sync_loader(db: Session, uuid: Id) -> Loader:
+    def load() -> App | None:
+        try:
+            return db.scalars(statements.select_document(uuid)).first()
+        finally:
+            db.close()
+
+    return lambda: run_in_threadpool(load)
+
+
+def async_loader(db: AsyncSession, uuid: Id) -> Loader:
+    async def load() -> App | None:
+        try:
+            return (await db.scalars(statements.select_document(uuid))).first()
+        finally:
+            await db.close()
+
+    return load
+
+
+async def subscribe(uuid: Id | None = None, kind: str | None = None) -> Subscription:
+    if notifications.notifier is None:
+        raise NotificationsUnavailableError("State notifications are disabled")
+    return await notifications.notifier.subscribe(uuid, kind)
+
+
+def state_response(event: dict) -> JSONResponse:
+    return JSONResponse(event["state"], headers={"ETag": conditional.etag(event["revision"])})
+
+
+def _event(event: dict) -> str:
+    return f"id: {event['revision']}\nevent: state\ndata: {json.dumps(event)}\n\n"
+
+
+async def _events(subscription: Subscription, current: dict | None, timeout: float | None) -> AsyncIterator[str]:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        if current is not None:
+            yield _event(current)
+        while True:
+            wait = notifications_settings.heartbeat
+            if deadline is not None:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    return
+                wait = min(wait, remaining)
+            event = await subscription.get(wait)
+            if event is not None:
+                # a transition committed between the subscription and the read is already in the current state
+                if current is None or event["revision"] > current["revision"]:
+                    yield _event(event)
+            elif subscription.closed:
+                return
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+
+def event_stream(subscription: Subscription, current: dict | None = None, timeout: float | None = None) -> Response:
+    return StreamingResponse(
+        _events(subscription, current, timeout),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def watch_state(
+    request: Request, uuid: Id, load: Loader, if_none_match: str | None, timeout: float | None
+) -> Response:
+    # subscribed before the read, so a transition committed in between is not missed
+    subscription = await subscribe(uuid=uuid)
+    streaming = False
+    try:
+        document = await load()
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        current = {
+            "uuid": str(uuid),
+            "kind": document.kind,
+            "state": document.state.value,
+            "revision": document.revision,
+        }
+        if EVENT_STREAM_MEDIA_TYPE in request.headers.get("accept", ""):
+            streaming = True
+            return event_stream(subscription, current, timeout)
+        # a long-poll: answered at once unless the client already has the current revision
+        if not conditional.not_modified(if_none_match, document.revision):
+            return state_response(current)
+        deadline = time.monotonic() + (timeout or notifications_settings.poll_timeout)
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = await subscription.get(remaining)
+            if event is None:
+                break
+            if event["revision"] > document.revision:
+                return state_response(event)
+        return conditional.not_modified_response(document.revision)
+    finally:
+        if not streaming:
+            subscription.close()
+
+
+async def watch_kind(kind: str, timeout: float | None) -> Response:
+    return event_stream(await subscribe(kind=kind), timeout=timeout)
@@ -0,0 +1,19 @@
+from fastapi.responses import JSONResponse
+
+from app.db import state_queue
+from app.models.app_model import Id, StateEnum
+
+
+def writes_behind(if_match: str | None) -> bool:
+    # a conditional write needs the current revision, so only unconditional ones are written behind
+    return state_queue.state_queue is not None and if_match is None
+
+
+def enqueue_state(uuid: Id, state: StateEnum) -> JSONResponse:
+    state_queue.state_queue.enqueue(uuid, state)
+    return JSONResponse({"uuid": str(uuid), "state": state.value}, status_code=202)
+
+
+def pending_state(uuid: Id) -> StateEnum | None:
+    queue = state_queue.state_queue
+    return None if queue is None else queue.pending_state(uuid)
@@ -1,16 +1,21 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
-from app.db.database import Base, get_db
+from app.db.database import Base, get_async_db, get_db
 from app.fastapi_app import app
 
 DATABASE_URL = "postgresql://postgres:password123@db/app_test"
 
 engine = create_engine(DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# every TestClient runs its own event loop, so async connections must not outlive a request
+async_engine = create_async_engine("postgresql+asyncpg://postgres:password123@db/app_test", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
 
 
 def override_get_db():
@@ -21,7 +26,16 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    db = AsyncTestingSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 @pytest.fixture(scope="module")
@@ -39,3 +53,17 @@ def db_session():
     finally:
         db.close()
         Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def query_counter():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
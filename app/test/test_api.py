@@ -1,4 +1,3 @@
-import json
 from copy import deepcopy
 from uuid import uuid4
 
@@ -147,8 +146,7 @@ class TestPutDocumentConfig:
         put_response = test_client.put(f"{endpoint}/{uuid}/configuration", json=config_dict)
         print("the put response is:\n", put_response.json())
         assert put_response.status_code == 200
-        json_dict = json.loads(put_response.json().get("json"))
-        assert json_dict["configuration"] == config_dict
+        assert put_response.json()["json"]["configuration"] == config_dict
 
     def test_invalid_config(self, test_client, db_session):
         post_response = test_client.post(endpoint, json=valid_json)
@@ -198,6 +196,57 @@ class TestPutDocumentConfig:
         assert put_response.status_code == 400
 
 
+class TestPatchDocumentConfig:
+    merge_patch = {"Content-Type": "application/merge-patch+json"}
+
+    def post_document(self, test_client):
+        json_copy = deepcopy(valid_json)
+        json_copy["configuration"] = {
+            "settings": {"settingA": "valueA", "nested": {"a": 1, "b": 2}},
+            "specification": {"specificationA": "valueA"},
+        }
+        post_response = test_client.post(endpoint, json=json_copy)
+        assert post_response.status_code == 201
+        return post_response.json()
+
+    def test_merge_patch(self, test_client, db_session):
+        uuid = self.post_document(test_client)
+        patch = {"settings": {"settingA": None, "settingB": "valueB", "nested": {"b": None, "c": 3}}}
+        patch_response = test_client.patch(f"{endpoint}/{uuid}/configuration", json=patch, headers=self.merge_patch)
+        print(patch_response.json())
+        assert patch_response.status_code == 200
+        assert patch_response.json()["json"]["configuration"] == {
+            "settings": {"settingB": "valueB", "nested": {"a": 1, "c": 3}},
+            "specification": {"specificationA": "valueA"},
+        }
+
+    def test_stored_as_object(self, test_client, db_session):
+        uuid = self.post_document(test_client)
+        get_response = test_client.get(f"{endpoint}/{uuid}")
+        assert get_response.status_code == 200
+        assert get_response.json()["json"]["kind"] == valid_json["kind"]
+
+    def test_extra_field(self, test_client, db_session):
+        uuid = self.post_document(test_client)
+        patch_response = test_client.patch(
+            f"{endpoint}/{uuid}/configuration", json={"extra": {}}, headers=self.merge_patch
+        )
+        assert patch_response.status_code == 400
+
+    def test_remove_required_field(self, test_client, db_session):
+        uuid = self.post_document(test_client)
+        patch_response = test_client.patch(
+            f"{endpoint}/{uuid}/configuration", json={"settings": None}, headers=self.merge_patch
+        )
+        assert patch_response.status_code == 400
+
+    def test_invalid_uuid(self, test_client, db_session):
+        patch_response = test_client.patch(
+            f"{endpoint}/{uuid4()}/configuration", json={"settings": {}}, headers=self.merge_patch
+        )
+        assert patch_response.status_code == 404
+
+
 class TestPutDocumentSettings:
     def test_valid_settings(self, test_client, db_session):
         post_response = test_client.post(endpoint, json=valid_json)
@@ -209,8 +258,9 @@ class TestPutDocumentSettings:
         put_response = test_client.put(f"{endpoint}/{uuid}/settings", json=settings)
         print(put_response.json())
         assert put_response.status_code == 200
-        json_dict = json.loads(put_response.json().get("json"))
+        json_dict = put_response.json()["json"]
         assert json_dict["configuration"]["settings"] == settings
+        assert json_dict["name"] == valid_json["name"]
 
     def test_invalid_settings(self, test_client, db_session):
         post_response = test_client.post(endpoint, json=valid_json)
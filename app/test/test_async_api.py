@@ -0,0 +1,110 @@
+import importlib.util
+import inspect
+import json
+from uuid import uuid4
+
+import pytest
+
+from app.db import notifications
+from app.db.notifications import StateNotifier
+from app.fastapi_app import app
+from app.models.app_model import StateEnum
+from app.test.test_api import valid_json
+from app.test.test_notifications import DSN
+from app.test.test_replicas import ReplicaQueries, replica_set, wait_for_replay  # noqa: F401
+from app.utils.rest_generator import generate_router
+
+endpoint = "/test_async"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def async_router(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp("routes")
+    values = {
+        "model_dir": "app.models.main_model",
+        "validator_dir": "app.models.main_validator",
+        "main_model": "MainModel",
+        "kind": "test_async",
+    }
+    generate_router(values, "TestAsync", str(output_dir), use_async=True)
+    spec = importlib.util.spec_from_file_location("TestAsyncRouter", output_dir / "TestAsyncRouter.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    app.include_router(module.router)
+    return module.router
+
+
+class TestAsyncRouter:
+    def test_handlers_are_async(self, async_router):
+        assert all(inspect.iscoroutinefunction(route.endpoint) for route in async_router.routes)
+
+    def test_document_lifecycle(self, test_client, db_session):
+        post_response = test_client.post(endpoint, json=valid_json)
+        assert post_response.status_code == 201
+        uuid = post_response.json()
+
+        get_response = test_client.get(f"{endpoint}/{uuid}")
+        assert get_response.status_code == 200
+        assert get_response.json()["json"]["name"] == valid_json["name"]
+
+        put_response = test_client.put(f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name})
+        assert put_response.status_code == 200
+        assert test_client.get(f"{endpoint}/{uuid}/state").json() == StateEnum.RUNNING.name
+
+        settings = {"settingA": "valueA"}
+        put_response = test_client.put(f"{endpoint}/{uuid}/settings", json=settings)
+        assert put_response.status_code == 200
+        assert put_response.json()["json"]["configuration"]["settings"] == settings
+
+        patch_response = test_client.patch(
+            f"{endpoint}/{uuid}/configuration",
+            json={"settings": {"settingA": None}},
+            headers={"Content-Type": "application/merge-patch+json"},
+        )
+        assert patch_response.status_code == 200
+        assert patch_response.json()["json"]["configuration"]["settings"] == {}
+
+        assert test_client.delete(f"{endpoint}/{uuid}").status_code == 204
+        assert test_client.get(f"{endpoint}/{uuid}").status_code == 404
+
+    def test_list_documents(self, test_client, db_session):
+        uuids = sorted(result["uuid"] for result in test_client.post(f"{endpoint}/batch", json=[valid_json] * 5).json())
+        page = test_client.get(f"{endpoint}/", params={"limit": 3}).json()
+        assert [document["uuid"] for document in page["items"]] == uuids[:3]
+        assert page["next"] == uuids[2]
+        lines = test_client.get(f"{endpoint}/", params={"stream": True, "after": page["next"]}).text.splitlines()
+        assert [json.loads(line)["uuid"] for line in lines] == uuids[3:]
+
+    def test_missing_document(self, test_client, db_session):
+        assert test_client.get(f"{endpoint}/{uuid4()}").status_code == 404
+        assert test_client.put(f"{endpoint}/{uuid4()}/settings", json={}).status_code == 404
+        assert test_client.delete(f"{endpoint}/{uuid4()}").status_code == 404
+
+    def test_watch_state(self, test_client, db_session, monkeypatch):
+        notifier = StateNotifier(DSN)
+        monkeypatch.setattr(notifications, "notifier", notifier)
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        assert test_client.get(f"{endpoint}/{uuid}/state/watch").json() == StateEnum.NEW.name
+        response = test_client.get(
+            f"{endpoint}/{uuid}/state/watch", params={"timeout": 0.2}, headers={"If-None-Match": '"1"'}
+        )
+        assert response.status_code == 304
+        test_client.portal.call(notifier.close)
+
+    def test_read_replica(self, test_client, db_session, replica_set):
+        uuid = test_client.post(endpoint, json=valid_json, headers={"X-Client-Id": "writer"}).json()
+        wait_for_replay()
+        queries = ReplicaQueries(replica_set.replicas[0])
+        assert test_client.get(f"{endpoint}/{uuid}", headers={"X-Client-Id": "reader"}).status_code == 200
+        assert test_client.get(f"{endpoint}/{uuid}", headers={"X-Client-Id": "writer"}).status_code == 200
+        assert queries.count == 1
+
+    def test_bulk_writes(self, test_client, db_session):
+        uuids = sorted(result["uuid"] for result in test_client.post(f"{endpoint}/batch", json=[valid_json] * 3).json())
+        response = test_client.put(
+            f"{endpoint}/state/", params={"state": "RUNNING", "ids": True}, json={"state": "NEW"}
+        )
+        assert sorted(response.json()["uuids"]) == uuids
+        assert test_client.get(f"{endpoint}/{uuids[0]}/state").json() == StateEnum.RUNNING.name
+        response = test_client.request("DELETE", f"{endpoint}/", json={"state": "RUNNING"})
+        assert response.json() == {"count": 3}
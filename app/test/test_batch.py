@@ -0,0 +1,50 @@
+import json
+from copy import deepcopy
+
+from app.test.test_api import endpoint, valid_json
+
+invalid_json = {**valid_json, "version": "1.0"}
+
+
+class TestPostDocuments:
+    def test_json_array(self, test_client, db_session):
+        response = test_client.post(f"{endpoint}/batch", json=[valid_json, invalid_json, valid_json])
+        assert response.status_code == 200
+        results = response.json()
+        assert [result["index"] for result in results] == [0, 1, 2]
+        assert "uuid" in results[0] and "uuid" in results[2]
+        assert results[1]["error"].startswith("string does not match regex")
+        get_response = test_client.get(f"{endpoint}/{results[2]['uuid']}")
+        assert get_response.status_code == 200
+        assert get_response.json()["json"] == valid_json
+
+    def test_ndjson(self, test_client, db_session):
+        lines = [json.dumps(valid_json), "{not json", "", json.dumps(valid_json)]
+        response = test_client.post(
+            f"{endpoint}/batch",
+            content="\n".join(lines).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert len(results) == 3
+        assert "uuid" in results[0] and "uuid" in results[2]
+        assert results[1]["error"] == "Line is not valid JSON"
+
+    def test_chunks(self, test_client, db_session, query_counter):
+        documents = [deepcopy(valid_json) for _ in range(2500)]
+        response = test_client.post(f"{endpoint}/batch", json=documents, params={"state": "RUNNING"})
+        assert response.status_code == 200
+        uuids = {result["uuid"] for result in response.json()}
+        assert len(uuids) == 2500
+        assert len(query_counter) == 3
+        assert test_client.get(f"{endpoint}/{uuids.pop()}/state").json() == "RUNNING"
+
+    def test_not_an_array(self, test_client, db_session):
+        response = test_client.post(f"{endpoint}/batch", json=valid_json)
+        assert response.status_code == 400
+
+    def test_empty(self, test_client, db_session):
+        response = test_client.post(f"{endpoint}/batch", json=[])
+        assert response.status_code == 200
+        assert response.json() == []
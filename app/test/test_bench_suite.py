@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from app.routers.registry import main_schema
+from app.utils.schema_validate import get_kind, is_subset
+from app.utils.validator_generator import compile_validator
+from benchmarks.bench_suite import compare, main, run, synthetic_document, synthetic_schema
+
+
+def results(p99_ms: float, rps: float, per_kind_ms: float = 100.0) -> dict:
+    return {
+        "meta": {"kinds": 1, "fields": 1, "documents": 1, "concurrency": 1, "jobs": 1, "async": False},
+        "generation": {"gen-models": {"seconds": per_kind_ms / 1000, "per_kind_ms": per_kind_ms}},
+        "endpoints": {"GET /{kind}/{uuid}/": {"requests": 10, "p50_ms": 1.0, "p99_ms": p99_ms, "rps": rps}},
+    }
+
+
+class TestSynthetic:
+    def test_schema_is_a_subset_of_the_main_schema(self):
+        schema = synthetic_schema(3, 5)
+        assert is_subset(schema, main_schema())
+        assert get_kind(schema) == "Bench0003"
+
+    def test_documents_are_valid(self):
+        validator = compile_validator(synthetic_schema(0, 5))
+        document = synthetic_document("bench0000", 5, 7)
+        assert validator.validate(document) == document
+
+
+class TestCompare:
+    def test_regressions(self):
+        assert compare(results(10.0, 100.0), results(12.0, 80.0), 0.1) == [
+            "GET /{kind}/{uuid}/ p99_ms",
+            "GET /{kind}/{uuid}/ rps",
+        ]
+
+    def test_within_threshold_and_improvements(self):
+        assert compare(results(10.0, 100.0, 100.0), results(10.5, 150.0, 50.0), 0.1) == []
+
+    def test_exit_code(self, tmp_path):
+        (tmp_path / "baseline.json").write_text(json.dumps(results(10.0, 100.0)))
+        (tmp_path / "current.json").write_text(json.dumps(results(10.0, 100.0, 200.0)))
+        assert main(["compare", str(tmp_path / "baseline.json"), str(tmp_path / "baseline.json")]) == 0
+        assert main(["compare", str(tmp_path / "baseline.json"), str(tmp_path / "current.json")]) == 1
+
+    def test_invalid_arguments(self):
+        with pytest.raises(SystemExit):
+            main(["run", "--kinds", "0"])
+
+
+class TestRun:
+    def test_every_endpoint_is_measured(self, test_client, db_session):
+        report = run(kinds=1, fields=2, documents=2, concurrency=2, jobs=1, use_async=False)
+        assert set(report["generation"]) == {"gen-models", "gen-rest"}
+        assert len(report["endpoints"]) == 11
+        assert report["endpoints"]["DELETE /{kind}/{uuid}/"]["requests"] == 2 + 100
+        assert test_client.get("/bench0000/").status_code == 404
@@ -0,0 +1,125 @@
+from app.db import crud
+from app.models.app_model import StateEnum
+from app.routers.batch import build_document
+from app.settings import bulk_settings
+from app.test.test_api import endpoint, valid_json
+from app.test.test_cache import document_cache  # noqa: F401
+from app.test.test_state_queue import queue  # noqa: F401
+
+
+def post_documents(test_client, documents: list[dict], state: StateEnum = StateEnum.NEW) -> list[str]:
+    response = test_client.post(f"{endpoint}/batch", params={"state": state.name}, json=documents)
+    return sorted(result["uuid"] for result in response.json())
+
+
+def states(test_client, uuids: list[str]) -> list[str]:
+    return [test_client.get(f"{endpoint}/{uuid}/state/").json() for uuid in uuids]
+
+
+def transition(test_client, query: dict, state: StateEnum = StateEnum.RUNNING, **params):
+    return test_client.put(f"{endpoint}/state/", params={"state": state.name, **params}, json=query)
+
+
+def delete(test_client, query: dict | None, **params):
+    return test_client.request("DELETE", f"{endpoint}/", params=params, json=query)
+
+
+def create_other(db_session) -> str:
+    # a document of another router, whose own kind field is the same
+    return str(crud.create_document(db_session, build_document(valid_json, "other", StateEnum.NEW)).uuid)
+
+
+def settings(settings: dict, version: str = "1.0.0") -> dict:
+    return {**valid_json, "version": version, "configuration": {"settings": settings, "specification": {}}}
+
+
+class TestBulkStateTransition:
+    def test_current_state(self, test_client, db_session):
+        installing = post_documents(test_client, [valid_json] * 3, StateEnum.INSTALLING)
+        new = post_documents(test_client, [valid_json])
+        response = transition(test_client, {"state": "INSTALLING"})
+        assert response.status_code == 200
+        assert response.json() == {"count": 3}
+        assert states(test_client, installing) == ["RUNNING"] * 3
+        assert states(test_client, new) == ["NEW"]
+        assert test_client.get(f"{endpoint}/{installing[0]}/").headers["ETag"] == '"2"'
+
+    def test_version_and_configuration(self, test_client, db_session):
+        matching = post_documents(test_client, [settings({"env": "prod"}, "2.0.0")] * 2)
+        post_documents(test_client, [settings({"env": "dev"}, "2.0.0"), settings({"env": "prod"}, "1.0.0")])
+        query = {"version": "2.0.0", "contains": {"configuration": {"settings": {"env": "prod"}}}}
+        response = transition(test_client, query, ids=True)
+        assert sorted(response.json()["uuids"]) == matching
+        assert response.json()["count"] == 2
+        query = {"equals": {"configuration.settings.env": "dev"}}
+        assert transition(test_client, query, StateEnum.INSTALLING).json() == {"count": 1}
+
+    def test_other_kinds_are_untouched(self, test_client, db_session):
+        other = create_other(db_session)
+        # nor does a document of another router whose own kind field names this one
+        crud.create_document(db_session, build_document({**valid_json, "kind": "test"}, "other", StateEnum.NEW))
+        post_documents(test_client, [valid_json])
+        assert transition(test_client, {}).json() == {"count": 1}
+        assert crud.read_document(db_session, other).state == StateEnum.NEW
+        assert delete(test_client, {}).json() == {"count": 1}
+        assert crud.document_exists(db_session, other)
+
+    def test_chunked(self, test_client, db_session, query_counter, monkeypatch):
+        monkeypatch.setattr(bulk_settings, "chunk_size", 2)
+        uuids = post_documents(test_client, [valid_json] * 5)
+        query_counter.clear()
+        # the documents keep matching the empty filter, the uuid ranges still move on
+        response = transition(test_client, {}, ids=True)
+        assert sorted(response.json()["uuids"]) == uuids
+        assert len([statement for statement in query_counter if statement.startswith("UPDATE")]) == 3
+        assert test_client.get(f"{endpoint}/{uuids[0]}/").headers["ETag"] == '"2"'
+
+    def test_documents_in_the_state_are_untouched(self, test_client, db_session):
+        running = post_documents(test_client, [valid_json], StateEnum.RUNNING)
+        new = post_documents(test_client, [valid_json])
+        assert transition(test_client, {}, ids=True).json() == {"count": 1, "uuids": new}
+        # the ETag a client holds for a document that did not change stays valid
+        assert test_client.get(f"{endpoint}/{running[0]}/").headers["ETag"] == '"1"'
+
+    def test_invalid_filter(self, test_client, db_session):
+        assert transition(test_client, {"unknown": 1}).status_code == 400
+        assert transition(test_client, {"equals": {"a..b": 1}}).status_code == 400
+        assert test_client.put(f"{endpoint}/state/", json={}).status_code == 400
+
+    def test_cached_state_is_invalidated(self, test_client, db_session, document_cache):
+        uuids = post_documents(test_client, [valid_json] * 2)
+        assert states(test_client, uuids) == ["NEW"] * 2
+        transition(test_client, {})
+        assert states(test_client, uuids) == ["RUNNING"] * 2
+
+    def test_queued_transitions_are_written_first(self, test_client, db_session, queue):
+        uuids = post_documents(test_client, [valid_json] * 2)
+        assert test_client.put(f"{endpoint}/{uuids[0]}/state", params={"state": "INSTALLING"}).status_code == 202
+        assert transition(test_client, {"state": "INSTALLING"}).json() == {"count": 1}
+        assert states(test_client, uuids) == ["RUNNING", "NEW"]
+
+
+class TestBulkDelete:
+    def test_filter(self, test_client, db_session):
+        installing = post_documents(test_client, [valid_json] * 2, StateEnum.INSTALLING)
+        running = post_documents(test_client, [valid_json], StateEnum.RUNNING)
+        response = delete(test_client, {"state": "INSTALLING"}, ids=True)
+        assert response.status_code == 200
+        assert sorted(response.json()["uuids"]) == installing
+        assert test_client.get(f"{endpoint}/{installing[0]}/").status_code == 404
+        assert states(test_client, running) == ["RUNNING"]
+
+    def test_posted_through_the_router(self, test_client, db_session):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        assert delete(test_client, {}).json() == {"count": 1}
+        assert test_client.get(f"{endpoint}/{uuid}/").status_code == 404
+
+    def test_whole_kind(self, test_client, db_session, monkeypatch):
+        monkeypatch.setattr(bulk_settings, "chunk_size", 2)
+        post_documents(test_client, [valid_json] * 5)
+        other = create_other(db_session)
+        # an empty filter has to be sent explicitly
+        assert delete(test_client, None).status_code == 400
+        assert delete(test_client, {}).json() == {"count": 5}
+        assert test_client.get(f"{endpoint}/").json()["items"] == []
+        assert crud.document_exists(db_session, other)
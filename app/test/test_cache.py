@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.db import cache
+from app.models.app_model import App, StateEnum
+from app.test.test_api import endpoint, valid_json
+
+
+class ThreadsBackend(cache.MemoryBackend):
+    # records the threads the backend is called from
+    def __init__(self):
+        super().__init__()
+        self.threads: list[int] = []
+
+    def get(self, key: str) -> bytes | None:
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.threads.append(threading.get_ident())
+        super().set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.threads.append(threading.get_ident())
+        super().delete(key)
+
+
+@pytest.fixture()
+def shared_backend():
+    return cache.MemoryBackend()
+
+
+@pytest.fixture()
+def document_cache(monkeypatch):
+    document_cache = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60))
+    monkeypatch.setattr(cache, "document_cache", document_cache)
+    return document_cache
+
+
+@pytest.fixture()
+def shared_cache(monkeypatch, shared_backend):
+    shared_cache = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60), shared_backend)
+    monkeypatch.setattr(cache, "document_cache", shared_cache)
+    return shared_cache
+
+
+class TestLRUCache:
+    def test_eviction(self):
+        lru = cache.LRUCache(max_size=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        assert lru.get("a") == 1
+        lru.set("c", 3)
+        assert lru.get("b") is None
+        assert lru.get("a") == 1 and lru.get("c") == 3
+        assert (lru.hits, lru.misses, lru.evictions) == (3, 1, 1)
+
+    def test_ttl(self):
+        lru = cache.LRUCache(max_size=2, ttl=0.01)
+        lru.set("a", 1)
+        time.sleep(0.02)
+        assert lru.get("a") is None
+        assert lru.expirations == 1
+        assert len(lru) == 0
+
+
+class TestDocumentCache:
+    def test_read_through(self, test_client, db_session, query_counter, document_cache):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        query_counter.clear()
+        for _ in range(3):
+            assert test_client.get(f"{endpoint}/{uuid}").json()["json"] == valid_json
+            assert test_client.get(f"{endpoint}/{uuid}/state").json() == StateEnum.NEW.name
+        # the document body and the App row are cached separately, one load each
+        assert len(query_counter) == 2
+        assert document_cache.stats()["hits"] == 4
+
+    def test_write_invalidates(self, test_client, db_session, query_counter, document_cache):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        test_client.get(f"{endpoint}/{uuid}")
+        test_client.put(f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name})
+        assert test_client.get(f"{endpoint}/{uuid}/state").json() == StateEnum.RUNNING.name
+        test_client.put(f"{endpoint}/{uuid}/settings", json={"a": "b"})
+        assert test_client.get(f"{endpoint}/{uuid}").json()["json"]["configuration"]["settings"] == {"a": "b"}
+        test_client.delete(f"{endpoint}/{uuid}")
+        assert test_client.get(f"{endpoint}/{uuid}").status_code == 404
+        assert document_cache.stats()["invalidations"] == 4
+
+    def test_shared_backend(self, test_client, db_session, query_counter, shared_cache, shared_backend):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        test_client.get(f"{endpoint}/{uuid}/state")
+        # another worker: empty local LRU, same shared backend
+        other_worker = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60), shared_backend)
+        document = other_worker.read_through(uuid, lambda: pytest.fail("should be served from the shared backend"))
+        assert document.state == StateEnum.NEW
+        assert document.json == valid_json
+        assert other_worker.stats()["shared_hits"] == 1
+
+    def test_shared_backend_json(self, test_client, db_session, shared_cache, shared_backend):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        body = test_client.get(f"{endpoint}/{uuid}").content
+        other_worker = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60), shared_backend)
+        document = other_worker.read_json_through(uuid, lambda: pytest.fail("should be served from the shared backend"))
+        assert document == (1, body)
+
+    def test_shared_backend_invalidates_other_workers(self, test_client, db_session, shared_cache, shared_backend):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        test_client.get(f"{endpoint}/{uuid}/state")
+        other_worker = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60), shared_backend)
+        assert other_worker.read_through(uuid, lambda: pytest.fail("should be served from the shared backend"))
+        # the write goes through this worker, the other one must not serve what it read before
+        test_client.put(f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name})
+        assert other_worker.read_through(uuid, lambda: None) is None
+        assert len(other_worker.local) == 0
+
+    def test_stale_load_is_not_cached(self, document_cache):
+        def load_while_writing():
+            document_cache.invalidate(uuid)
+            return app
+
+        uuid = uuid4()
+        app = App(
+            uuid=uuid,
+            kind="k",
+            document_kind="k",
+            name="n",
+            version="1.0.0",
+            description="d",
+            state=StateEnum.NEW,
+            configuration={},
+        )
+        assert document_cache.read_through(uuid, load_while_writing) is app
+        assert len(document_cache.local) == 0
+
+    def test_async_paths_do_not_block_the_loop(self):
+        shared = ThreadsBackend()
+        document_cache = cache.DocumentCache(cache.LRUCache(max_size=100, ttl=60), shared)
+
+        async def load():
+            return 1, b"{}"
+
+        async def read_and_invalidate():
+            uuid = uuid4()
+            assert await document_cache.async_read_json_through(uuid, load) == (1, b"{}")
+            await document_cache.async_invalidate(uuid)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(read_and_invalidate())
+        # a get and a set on the miss, the two keys of the document on invalidation
+        assert len(shared.threads) == 4
+        assert loop_thread not in shared.threads
+
+    def test_stats_endpoint(self, test_client, document_cache):
+        response = test_client.get("/admin/cache")
+        assert response.status_code == 200
+        assert response.json()["enabled"] is True
+        assert {"hits", "misses", "evictions"} <= response.json().keys()
+
+    def test_disabled(self, test_client, monkeypatch):
+        monkeypatch.setattr(cache, "document_cache", None)
+        assert test_client.get("/admin/cache").json() == {"enabled": False}
@@ -0,0 +1,209 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.cli import main
+from app.utils.rest_generator import render_router
+from app.utils.validator_generator import generate_validator_source
+from benchmarks.bench_cli_startup import import_time_us
+
+user_schema = os.path.abspath("app/schemas/user_schema1.json")
+other_schema = os.path.abspath("app/schemas/3.json")
+
+
+@pytest.fixture
+def schemas_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models").mkdir()
+    (tmp_path / "schemas").mkdir()
+    return tmp_path / "schemas"
+
+
+class TestGenModels:
+    def test_writes_validator_next_to_model(self, schemas_dir):
+        main(["gen-models", "-j", user_schema, "-o", "models"])
+        assert os.path.exists("models/CheckModel.py")
+        with open(user_schema) as f:
+            expected = generate_validator_source({**json.load(f), "title": "Check"})
+        with open("models/CheckValidator.py") as f:
+            assert f.read() == expected
+
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_directory(self, schemas_dir, jobs):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        (schemas_dir / "other.json").write_text(open(other_schema).read())
+        (schemas_dir / "notes.txt").write_text("not a schema")
+        main(["gen-models", "-j", "schemas", "-o", "models", "--jobs", jobs])
+        assert sorted(name for name in os.listdir("models") if not name.startswith(".")) == [
+            "CheckModel.py",
+            "CheckValidator.py",
+            "NewThingModel.py",
+            "NewThingValidator.py",
+            "__init__.py",
+        ]
+
+    def test_glob(self, schemas_dir):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        (schemas_dir / "other.yaml").write_text(open(other_schema).read())
+        main(["gen-models", "-j", "schemas/*.json", "-o", "models"])
+        assert not os.path.exists("models/NewThingModel.py")
+        assert os.path.exists("models/CheckModel.py")
+
+    def test_errors_are_collected(self, schemas_dir, capsys):
+        (schemas_dir / "a.json").write_text("{not json")
+        (schemas_dir / "b.json").write_text(open(user_schema).read())
+        (schemas_dir / "c.json").write_text(json.dumps({"type": "object", "properties": {}}))
+        with pytest.raises(SystemExit) as exc:
+            main(["gen-models", "-j", "schemas", "-o", "models", "--jobs", "2"])
+        assert exc.value.code == 2
+        error = capsys.readouterr().err
+        assert "2 of 3 schemas failed" in error
+        assert "schemas/a.json is not a valid JSON file" in error
+        assert "schemas/c.json is not a subset of" in error
+        assert os.path.exists("models/CheckModel.py")
+
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_invalid_schema_is_collected(self, schemas_dir, capsys, jobs):
+        (schemas_dir / "a.json").write_text(json.dumps({"type": 5}))
+        (schemas_dir / "b.json").write_text(open(user_schema).read())
+        with pytest.raises(SystemExit):
+            main(["gen-models", "-j", "schemas", "-o", "models", "--jobs", jobs])
+        error = capsys.readouterr().err
+        assert "1 of 2 schemas failed" in error
+        assert "schemas/a.json: 5 is not valid" in error
+        assert os.path.exists("models/CheckModel.py")
+        assert os.path.exists("models/.gen-manifest.json")
+
+    def test_no_schemas(self, schemas_dir):
+        with pytest.raises(SystemExit):
+            main(["gen-models", "-j", "schemas", "-o", "models"])
+
+
+class TestIncrementalGeneration:
+    def test_unchanged_schemas_are_skipped(self, schemas_dir, capsys):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        modified = os.stat("models/CheckModel.py").st_mtime_ns
+        capsys.readouterr()
+
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        assert "Skipped 1 unchanged schema(s)" in capsys.readouterr().out
+        assert os.stat("models/CheckModel.py").st_mtime_ns == modified
+
+        main(["gen-models", "-j", "schemas", "-o", "models", "--force"])
+        assert "Generated" not in capsys.readouterr().out
+        assert os.stat("models/CheckModel.py").st_mtime_ns == modified
+
+    def test_changed_schema_is_regenerated(self, schemas_dir):
+        schema = json.loads(open(user_schema).read())
+        (schemas_dir / "check.json").write_text(json.dumps(schema))
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        schema["properties"]["name"]["maxLength"] = 42
+        (schemas_dir / "check.json").write_text(json.dumps(schema))
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        assert "max_length=42" in open("models/CheckModel.py").read()
+
+    def test_deleted_output_is_regenerated(self, schemas_dir):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        os.remove("models/CheckValidator.py")
+        main(["gen-models", "-j", "schemas", "-o", "models"])
+        assert os.path.exists("models/CheckValidator.py")
+
+    def test_routers(self, schemas_dir, capsys):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        os.makedirs("app/models")
+        os.makedirs("app/routes")
+        main(["gen-models", "-j", "schemas", "-o", "app/models"])
+        main(["gen-rest", "-m", "app/models", "-o", "app/routes"])
+        modified = os.stat("app/routes/CheckRouter.py").st_mtime_ns
+        assert not os.path.exists("__init__.py")
+        with open("app/routes/__init__.py") as f:
+            assert f.read() == (
+                "from app.routes.CheckRouter import router as CheckRouter\n\n\n__all__ = [CheckRouter]\n"
+            )
+        capsys.readouterr()
+
+        main(["gen-rest", "-m", "app/models", "-o", "app/routes"])
+        assert "Skipped 1 unchanged router(s)" in capsys.readouterr().out
+        assert os.stat("app/routes/CheckRouter.py").st_mtime_ns == modified
+
+        main(["gen-rest", "-m", "app/models", "-o", "app/routes", "--async"])
+        assert "create_async_router" in open("app/routes/CheckRouter.py").read()
+
+
+class TestStartup:
+    # budget for `import app.cli` measured with -X importtime, the eager imports used to cost ~650ms
+    IMPORT_BUDGET_US = 150_000
+    HEAVY_MODULES = ("datamodel_code_generator", "black", "jsonschema", "jinja2", "yaml", "pydantic")
+
+    def test_import_budget(self):
+        assert import_time_us("app.cli") < self.IMPORT_BUDGET_US
+
+    @pytest.mark.parametrize("argv", [["--help"], ["gen-rest", "--help"], ["gen-models", "--help"]])
+    def test_help_does_not_import_generators(self, argv):
+        script = (
+            "import sys\n"
+            "from app.cli import main\n"
+            "try:\n"
+            f"    main({argv!r})\n"
+            "except SystemExit:\n"
+            f"    print([module for module in {self.HEAVY_MODULES!r} if module in sys.modules], file=sys.stderr)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        assert result.stderr.strip() == "[]"
+
+    def test_gen_rest_does_not_import_model_generators(self, tmp_path):
+        (tmp_path / "app" / "models").mkdir(parents=True)
+        (tmp_path / "app" / "routes").mkdir()
+        script = (
+            "import sys\n"
+            "from app.cli import main\n"
+            "main(['gen-rest', '-m', 'app/models', '-o', 'app/routes'])\n"
+            "print([module for module in ('datamodel_code_generator', 'black', 'jsonschema') if module in sys.modules])\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+class TestGenRest:
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_parallel(self, schemas_dir, jobs):
+        (schemas_dir / "check.json").write_text(open(user_schema).read())
+        (schemas_dir / "other.json").write_text(open(other_schema).read())
+        os.makedirs("app/models")
+        os.makedirs("app/routes")
+        main(["gen-models", "-j", "schemas", "-o", "app/models"])
+        main(["gen-rest", "-m", "app/models", "-o", "app/routes", "--jobs", jobs])
+        for kind in ("Check", "NewThing"):
+            with open(f"app/routes/{kind}Router.py") as f:
+                assert f.read() == render_router(
+                    {
+                        "model_dir": f"app.models.{kind}Model",
+                        "validator_dir": f"app.models.{kind}Validator",
+                        "main_model": kind,
+                        "kind": kind.lower(),
+                    }
+                )
+
+    def test_invalid_models_are_reported_together(self, schemas_dir, capsys):
+        os.makedirs("app/models")
+        os.makedirs("app/routes")
+        for kind in ("First", "Second"):
+            (schemas_dir.parent / "app" / "models" / f"{kind}Model.py").write_text("def broken(:\n")
+            (schemas_dir.parent / "app" / "models" / f"{kind}Validator.py").write_text("")
+        with pytest.raises(SystemExit):
+            main(["gen-rest", "-m", "app/models", "-o", "app/routes", "--jobs", "2"])
+        error = capsys.readouterr().err
+        assert "2 of 2 models failed" in error
+        assert "FirstModel.py is not a valid Python file" in error
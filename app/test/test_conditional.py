@@ -0,0 +1,89 @@
+from app.models.app_model import StateEnum
+from app.test.test_api import endpoint, valid_json
+
+config = {"settings": {"settingA": "valueA"}, "specification": {"specificationA": "valueA"}}
+
+
+def post_document(test_client) -> str:
+    return test_client.post(endpoint, json=valid_json).json()
+
+
+class TestETag:
+    def test_get_returns_etag(self, test_client, db_session):
+        uuid = post_document(test_client)
+        response = test_client.get(f"{endpoint}/{uuid}")
+        assert response.headers["ETag"] == '"1"'
+        assert response.json()["revision"] == 1
+        assert test_client.get(f"{endpoint}/{uuid}/state").headers["ETag"] == '"1"'
+
+    def test_writes_bump_revision(self, test_client, db_session):
+        uuid = post_document(test_client)
+        put_response = test_client.put(f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name})
+        assert put_response.headers["ETag"] == '"2"'
+        put_response = test_client.put(f"{endpoint}/{uuid}/configuration", json=config)
+        assert put_response.headers["ETag"] == '"3"'
+        assert test_client.get(f"{endpoint}/{uuid}").headers["ETag"] == '"3"'
+
+    def test_if_none_match(self, test_client, db_session):
+        uuid = post_document(test_client)
+        etag = test_client.get(f"{endpoint}/{uuid}").headers["ETag"]
+        response = test_client.get(f"{endpoint}/{uuid}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        response = test_client.get(f"{endpoint}/{uuid}/state", headers={"If-None-Match": f'"7", {etag}'})
+        assert response.status_code == 304
+
+        test_client.put(f"{endpoint}/{uuid}/settings", json={"a": "b"})
+        response = test_client.get(f"{endpoint}/{uuid}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+class TestIfMatch:
+    def test_matching_write(self, test_client, db_session, query_counter):
+        uuid = post_document(test_client)
+        query_counter.clear()
+        response = test_client.put(f"{endpoint}/{uuid}/configuration", json=config, headers={"If-Match": '"1"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        assert len(query_counter) == 1
+
+    def test_stale_write(self, test_client, db_session):
+        uuid = post_document(test_client)
+        test_client.put(f"{endpoint}/{uuid}/settings", json={"a": "b"})
+        response = test_client.put(f"{endpoint}/{uuid}/settings", json={"c": "d"}, headers={"If-Match": '"1"'})
+        assert response.status_code == 412
+        response = test_client.patch(
+            f"{endpoint}/{uuid}/configuration",
+            json={"settings": {}},
+            headers={"If-Match": '"1"', "Content-Type": "application/merge-patch+json"},
+        )
+        assert response.status_code == 412
+        response = test_client.put(
+            f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name}, headers={"If-Match": "garbage"}
+        )
+        assert response.status_code == 412
+        assert test_client.get(f"{endpoint}/{uuid}").json()["json"]["configuration"]["settings"] == {"a": "b"}
+
+    def test_weak_etag(self, test_client, db_session):
+        uuid = post_document(test_client)
+        # If-Match compares strongly, a weak tag of the current revision does not match it
+        response = test_client.put(f"{endpoint}/{uuid}/settings", json={"c": "d"}, headers={"If-Match": 'W/"1"'})
+        assert response.status_code == 412
+        response = test_client.put(f"{endpoint}/{uuid}/settings", json={"c": "d"}, headers={"If-Match": 'W/"1", "1"'})
+        assert response.status_code == 200
+        # If-None-Match compares weakly
+        assert test_client.get(f"{endpoint}/{uuid}", headers={"If-None-Match": 'W/"2"'}).status_code == 304
+
+    def test_conditional_delete(self, test_client, db_session):
+        uuid = post_document(test_client)
+        assert test_client.delete(f"{endpoint}/{uuid}", headers={"If-Match": '"2"'}).status_code == 412
+        assert test_client.delete(f"{endpoint}/{uuid}", headers={"If-Match": '"1"'}).status_code == 204
+        assert test_client.delete(f"{endpoint}/{uuid}", headers={"If-Match": '"1"'}).status_code == 404
+
+    def test_wildcard(self, test_client, db_session):
+        uuid = post_document(test_client)
+        test_client.put(f"{endpoint}/{uuid}/settings", json={"a": "b"})
+        response = test_client.put(f"{endpoint}/{uuid}/settings", json={"c": "d"}, headers={"If-Match": "*"})
+        assert response.status_code == 200
@@ -0,0 +1,62 @@
+import json
+
+from sqlalchemy import text
+
+from app.db import crud
+from app.models.app_model import StateEnum
+from app.routers.batch import build_document
+from app.test.test_api import endpoint, valid_json
+
+
+def post_documents(test_client, count, state=StateEnum.NEW):
+    response = test_client.post(f"{endpoint}/batch", json=[valid_json] * count, params={"state": state.name})
+    return sorted(result["uuid"] for result in response.json())
+
+
+class TestListDocuments:
+    def test_pagination(self, test_client, db_session):
+        uuids = post_documents(test_client, 25)
+        crud.create_document(db_session, build_document(valid_json, "other", StateEnum.NEW))
+        seen, after = [], None
+        while True:
+            params = {"limit": 10} if after is None else {"limit": 10, "after": after}
+            response = test_client.get(f"{endpoint}/", params=params)
+            assert response.status_code == 200
+            seen += [document["uuid"] for document in response.json()["items"]]
+            after = response.json()["next"]
+            if after is None:
+                break
+        assert seen == uuids
+
+    def test_listed_under_the_router_kind(self, test_client, db_session):
+        # the kind field of the body is the document's own, it does not have to name the router
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        items = test_client.get(f"{endpoint}/").json()["items"]
+        assert [item["uuid"] for item in items] == [uuid]
+        assert items[0]["kind"] == items[0]["json"]["kind"] == valid_json["kind"]
+
+    def test_state_filter(self, test_client, db_session):
+        post_documents(test_client, 3)
+        running = post_documents(test_client, 2, StateEnum.RUNNING)
+        response = test_client.get(f"{endpoint}/", params={"state": StateEnum.RUNNING.name})
+        assert [document["uuid"] for document in response.json()["items"]] == running
+        assert response.json()["next"] is None
+
+    def test_stream(self, test_client, db_session):
+        uuids = post_documents(test_client, 30)
+        response = test_client.get(f"{endpoint}/", params={"stream": True, "after": uuids[9]})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        documents = [json.loads(line) for line in response.text.splitlines()]
+        assert [document["uuid"] for document in documents] == uuids[10:]
+        assert documents[0]["json"] == valid_json
+
+    def test_invalid_limit(self, test_client, db_session):
+        assert test_client.get(f"{endpoint}/", params={"limit": 0}).status_code == 400
+
+    def test_index_backed(self, db_session):
+        db_session.execute(text("SET enable_seqscan = off"))
+        plan = db_session.execute(
+            text("EXPLAIN SELECT * FROM apps WHERE kind = 'test' AND uuid > gen_random_uuid() ORDER BY uuid LIMIT 10")
+        ).scalars()
+        assert "ix_apps_kind_uuid" in "\n".join(plan)
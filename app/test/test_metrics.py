@@ -0,0 +1,107 @@
+import importlib.util
+
+import pytest
+
+from app.metrics import Histogram, Metrics, RequestStats, metrics, render
+from app.routers.registry import registry
+from app.test.test_api import valid_json
+from app.utils.rest_generator import generate_router
+
+
+@pytest.fixture
+def clean_metrics():
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+@pytest.fixture(scope="module")
+def async_router(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp("routes")
+    values = {
+        "model_dir": "app.models.main_model",
+        "validator_dir": "app.models.main_validator",
+        "main_model": "MainModel",
+        "kind": "metrics_async",
+    }
+    generate_router(values, "MetricsAsync", str(output_dir), use_async=True)
+    spec = importlib.util.spec_from_file_location("MetricsAsyncRouter", output_dir / "MetricsAsyncRouter.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    registry.register_router("metrics_async", module.router)
+    yield module.router
+    registry.unregister_router("metrics_async")
+
+
+def sample(text: str, name: str) -> float:
+    values = [line.rsplit(" ", 1)[1] for line in text.splitlines() if line.startswith(name + " ")]
+    assert len(values) == 1, name
+    return float(values[0])
+
+
+class TestRender:
+    def test_histogram_buckets_are_cumulative(self):
+        collector = Metrics()
+        for seconds in (0.002, 0.002, 0.3, 20.0):
+            collector.observe_request("test", "/{kind}/", "GET", 200, seconds, RequestStats())
+        text = render(collector)
+        labels = 'kind="test",endpoint="/{kind}/",method="GET"'
+        assert sample(text, f'http_request_duration_seconds_bucket{{{labels},le="0.001"}}') == 0
+        assert sample(text, f'http_request_duration_seconds_bucket{{{labels},le="0.005"}}') == 2
+        assert sample(text, f'http_request_duration_seconds_bucket{{{labels},le="0.5"}}') == 3
+        assert sample(text, f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 4
+        assert sample(text, f"http_request_duration_seconds_count{{{labels}}}") == 4
+        assert sample(text, f'http_requests_total{{{labels},status="200"}}') == 4
+
+    def test_labels_are_escaped(self):
+        collector = Metrics()
+        collector.observe_request('a"b\\c', "/", "GET", 200, 0.1, RequestStats())
+        assert 'kind="a\\"b\\\\c"' in render(collector)
+
+    def test_queries_outside_requests(self):
+        collector = Metrics()
+        collector.observe_query(0.5)
+        assert sample(render(collector), "db_queries_total") == 1
+        assert sample(render(collector), "db_query_seconds_total") == 0.5
+
+    def test_histogram_copy_is_independent(self):
+        histogram = Histogram((1.0,))
+        copy = histogram.copy()
+        histogram.observe(0.5)
+        assert copy.count == 0 and copy.counts == [0, 0]
+
+
+class TestMetricsEndpoint:
+    def test_requests_and_queries_per_endpoint(self, test_client, db_session, clean_metrics):
+        uuid = test_client.post("/test/", json=valid_json).json()
+        test_client.get(f"/test/{uuid}/state/")
+        test_client.get(f"/test/{uuid}/state/")
+        test_client.get("/unknown/")
+        response = test_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        labels = 'kind="test",endpoint="/{kind}/{uuid}/state/",method="GET"'
+        assert sample(text, f'http_requests_total{{{labels},status="200"}}') == 2
+        assert sample(text, f"http_request_db_queries_sum{{{labels}}}") == 2
+        assert sample(text, f'http_request_db_queries_bucket{{{labels},le="1"}}') == 2
+        assert sample(text, 'http_requests_total{kind="test",endpoint="/{kind}/",method="POST",status="201"}') == 1
+        assert sample(text, 'http_requests_total{kind="",endpoint="unmatched",method="GET",status="404"}') == 1
+        assert sample(text, "db_queries_total") >= 3
+        assert sample(text, 'db_pool_size{engine="sync"}') >= 1
+
+    def test_async_queries_are_accounted(self, test_client, db_session, clean_metrics, async_router):
+        uuid = test_client.post("/metrics_async/", json=valid_json).json()
+        assert test_client.get(f"/metrics_async/{uuid}/state/").status_code == 200
+        text = test_client.get("/metrics").text
+        labels = 'kind="metrics_async",endpoint="/{kind}/{uuid}/state/",method="GET"'
+        assert sample(text, f"http_request_db_queries_sum{{{labels}}}") == 1
+        assert sample(text, f"http_request_db_seconds_sum{{{labels}}}") > 0
+
+    def test_cache_statistics(self, test_client, db_session, clean_metrics, monkeypatch):
+        from app.db import cache
+
+        monkeypatch.setattr(cache, "document_cache", cache.DocumentCache(cache.LRUCache(10, 5.0)))
+        text = test_client.get("/metrics").text
+        assert sample(text, "document_cache_max_size") == 10
+        assert sample(text, "document_cache_hits_total") == 0
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.db import crud, notifications
+from app.db.notifications import StateNotifier
+from app.fastapi_app import app
+from app.models.app_model import STATE_CHANNEL, StateEnum
+from app.routers.batch import build_document
+from app.test.conftest import TestingSessionLocal
+from app.test.test_api import valid_json
+
+DSN = "postgresql://postgres:password123@db/app_test"
+
+endpoint = "/test"
+
+
+@pytest.fixture
+def watch_client(monkeypatch):
+    notifier = StateNotifier(DSN, reconnect_delay=0.05)
+    monkeypatch.setattr(notifications, "notifier", notifier)
+    # a client of its own, its lifespan closes the listening connection of this notifier
+    with TestClient(app) as client:
+        yield client
+
+
+def create(client) -> str:
+    return client.post(endpoint, json=valid_json).json()
+
+
+def transition_later(uuids: list[str], state: StateEnum = StateEnum.RUNNING, delay: float = 0.3) -> threading.Thread:
+    def transition():
+        time.sleep(delay)
+        with TestingSessionLocal() as db:
+            for uuid in uuids:
+                crud.update_document_state(db, uuid, state)
+
+    thread = threading.Thread(target=transition)
+    thread.start()
+    return thread
+
+
+def events(body: str) -> list[dict]:
+    return [json.loads(line.removeprefix("data: ")) for line in body.splitlines() if line.startswith("data: ")]
+
+
+class TestLongPoll:
+    def test_answers_at_once_without_the_current_revision(self, watch_client, db_session):
+        uuid = create(watch_client)
+        response = watch_client.get(f"{endpoint}/{uuid}/state/watch")
+        assert response.status_code == 200
+        assert response.json() == "NEW"
+        assert response.headers["ETag"] == '"1"'
+
+    def test_waits_for_the_transition(self, watch_client, db_session):
+        uuid = create(watch_client)
+        thread = transition_later([uuid])
+        start = time.monotonic()
+        response = watch_client.get(f"{endpoint}/{uuid}/state/watch", headers={"If-None-Match": '"1"'})
+        thread.join()
+        assert time.monotonic() - start >= 0.2
+        assert response.status_code == 200
+        assert response.json() == "RUNNING"
+        assert response.headers["ETag"] == '"2"'
+
+    def test_timeout(self, watch_client, db_session):
+        uuid = create(watch_client)
+        response = watch_client.get(
+            f"{endpoint}/{uuid}/state/watch", params={"timeout": 0.2}, headers={"If-None-Match": '"1"'}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == '"1"'
+
+    def test_not_found(self, watch_client, db_session):
+        response = watch_client.get(f"{endpoint}/00000000-0000-0000-0000-000000000000/state/watch")
+        assert response.status_code == 404
+
+    def test_watchers_share_one_connection(self, watch_client, db_session, query_counter):
+        uuid = create(watch_client)
+        watchers = 20
+        query_counter.clear()
+        with ThreadPoolExecutor(watchers) as executor:
+            responses = [
+                executor.submit(watch_client.get, f"{endpoint}/{uuid}/state/watch", headers={"If-None-Match": '"1"'})
+                for _ in range(watchers)
+            ]
+            while watch_client.get("/admin/notifications/").json()["subscribers"] < watchers:
+                time.sleep(0.01)
+            transition_later([uuid], delay=0).join()
+            assert all(response.result().json() == "RUNNING" for response in responses)
+        # one read per watcher, the wait itself costs no queries
+        assert len([statement for statement in query_counter if statement.startswith("SELECT")]) == watchers
+        stats = watch_client.get("/admin/notifications/").json()
+        assert stats["received"] == 1
+        assert stats["delivered"] == watchers
+        assert stats["subscribers"] == 0
+
+    def test_disabled(self, test_client, db_session, monkeypatch):
+        monkeypatch.setattr(notifications, "notifier", None)
+        uuid = create(test_client)
+        assert test_client.get(f"{endpoint}/{uuid}/state/watch").status_code == 503
+        assert test_client.get("/admin/notifications/").json() == {"enabled": False}
+
+
+class TestEventStream:
+    def test_document_stream(self, watch_client, db_session):
+        uuid = create(watch_client)
+        thread = transition_later([uuid])
+        response = watch_client.get(
+            f"{endpoint}/{uuid}/state/watch", params={"timeout": 1}, headers={"Accept": "text/event-stream"}
+        )
+        thread.join()
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert [(event["state"], event["revision"]) for event in events(response.text)] == [("NEW", 1), ("RUNNING", 2)]
+        assert "id: 2\nevent: state\n" in response.text
+
+    def test_kind_stream(self, watch_client, db_session):
+        uuids = [create(watch_client) for _ in range(2)]
+        other = crud.create_document(db_session, build_document(valid_json, "other", StateEnum.NEW)).uuid
+        thread = transition_later([*uuids, other])
+        response = watch_client.get(f"{endpoint}/state/events", params={"timeout": 1})
+        thread.join()
+        received = events(response.text)
+        assert sorted(event["uuid"] for event in received) == sorted(uuids)
+        assert all(event["kind"] == "test" and event["state"] == "RUNNING" for event in received)
+
+    def test_unchanged_state_is_not_published(self, watch_client, db_session):
+        uuid = create(watch_client)
+        thread = transition_later([uuid], StateEnum.NEW)
+        response = watch_client.get(f"{endpoint}/state/events", params={"timeout": 0.6})
+        thread.join()
+        assert events(response.text) == []
+
+
+class TestStateNotifier:
+    def test_slow_watcher_is_dropped(self, db_session):
+        async def scenario():
+            notifier = StateNotifier(DSN, buffer_size=1)
+            subscription = await notifier.subscribe(kind="test")
+            payload = {"uuid": "00000000-0000-0000-0000-000000000000", "kind": "test", "state": "RUNNING"}
+            for revision in (2, 3):
+                db_session.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": STATE_CHANNEL, "payload": json.dumps({**payload, "revision": revision})},
+                )
+                db_session.commit()
+            while notifier.received < 2:
+                await asyncio.sleep(0.01)
+            received = [await subscription.get(1), await subscription.get(1)]
+            stats = notifier.stats()
+            await notifier.close()
+            return received, stats
+
+        received, stats = asyncio.run(scenario())
+        assert received[0]["revision"] == 2
+        assert received[1] is None
+        assert stats["dropped"] == 1
+        assert stats["subscribers"] == 0
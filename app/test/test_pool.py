@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import exc, text
+
+from app.db.database import create_db_engine
+from app.settings import DatabaseSettings
+from app.test.conftest import DATABASE_URL
+
+
+@pytest.fixture()
+def small_engine():
+    engine = create_db_engine(
+        DatabaseSettings(url=DATABASE_URL, pool_size=1, max_overflow=0, pool_timeout=0.1, statement_timeout_ms=50)
+    )
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+class TestDatabaseSettings:
+    def test_defaults(self):
+        settings = DatabaseSettings()
+        assert settings.echo is False
+        assert settings.pool_pre_ping is True
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_SIZE", "20")
+        monkeypatch.setenv("DB_ECHO", "true")
+        settings = DatabaseSettings()
+        assert settings.pool_size == 20
+        assert settings.echo is True
+
+
+class TestPoolMetrics:
+    def test_saturation(self, small_engine):
+        with small_engine.connect():
+            stats = small_engine.pool.metrics.snapshot(small_engine.pool)
+            assert stats["checked_out"] == 1
+            assert stats["saturation"] == 1.0
+        stats = small_engine.pool.metrics.snapshot(small_engine.pool)
+        assert stats["checked_out"] == 0
+        assert stats["checkouts"] == 1
+
+    def test_checkout_timeout(self, small_engine):
+        with small_engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                small_engine.connect()
+        stats = small_engine.pool.metrics.snapshot(small_engine.pool)
+        assert stats["timeouts"] == 1
+        assert stats["wait_seconds_max"] >= 0.1
+        assert sum(stats["wait_buckets"].values()) == stats["checkouts"] == 2
+
+    def test_statement_timeout(self, small_engine):
+        with small_engine.connect() as connection:
+            with pytest.raises(exc.OperationalError, match="statement timeout"):
+                connection.execute(text("SELECT pg_sleep(1)"))
+
+
+class TestPoolEndpoint:
+    def test_pool_stats(self, test_client):
+        response = test_client.get("/admin/pool")
+        assert response.status_code == 200
+        assert {"sync", "async"} <= response.json().keys()
+        assert "saturation" in response.json()["sync"]
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.fastapi_app import app
+from app.profiling import Profile, ProfileBuffer, ProfilingMiddleware, profiles, run_in_threadpool
+from app.test.test_api import valid_json
+
+
+@pytest.fixture
+def profiled_client():
+    # the middleware is opt-in, so it is wrapped around the app here instead of enabled by the settings
+    profiles.clear()
+    with TestClient(ProfilingMiddleware(app, profiles, interval=0.001)) as client:
+        yield client
+    profiles.clear()
+
+
+class TestProfilingMiddleware:
+    def test_header_enables_profiling(self, profiled_client, db_session):
+        uuid = profiled_client.post("/test/", json=valid_json).json()
+        response = profiled_client.get(f"/test/{uuid}/state/", headers={"X-Profile": "1"})
+        assert response.status_code == 200
+        profile_id = int(response.headers["X-Profile-Id"])
+
+        summaries = profiled_client.get("/admin/profiles/").json()
+        assert [summary["id"] for summary in summaries] == [profile_id]
+        assert summaries[0]["kind"] == "test"
+        assert summaries[0]["endpoint"] == "/{kind}/{uuid}/state/"
+
+        profile = profiled_client.get(f"/admin/profiles/{profile_id}/").json()
+        assert profile["status"] == 200
+        assert len(profile["sql"]) == 1
+        assert profile["sql"][0]["statement"].startswith("SELECT")
+        assert 0 <= profile["sql"][0]["offset_ms"] <= profile["duration_ms"]
+
+        folded = profiled_client.get(f"/admin/profiles/{profile_id}/folded")
+        assert folded.status_code == 200
+        assert folded.text == "".join(f"{stack} {samples}\n" for stack, samples in profile["stacks"].items())
+
+    def test_only_the_request_threads_are_sampled(self, profiled_client, db_session):
+        uuid = profiled_client.post("/test/", json=valid_json).json()
+        stopped = threading.Event()
+
+        def busy_elsewhere():
+            while not stopped.is_set():
+                time.sleep(0.0001)
+
+        thread = threading.Thread(target=busy_elsewhere)
+        thread.start()
+        try:
+            stacks = {}
+            # a request may finish between two samples
+            for _ in range(20):
+                response = profiled_client.get(f"/test/{uuid}/state/", headers={"X-Profile": "1"})
+                profile = profiled_client.get(f"/admin/profiles/{response.headers['X-Profile-Id']}/").json()
+                stacks.update(profile["stacks"])
+        finally:
+            stopped.set()
+            thread.join()
+        assert not any("busy_elsewhere" in stack for stack in stacks)
+        # the sync endpoint runs in a worker thread
+        assert any("get_document_state" in stack for stack in stacks)
+
+    def test_unprofiled_requests(self, profiled_client, db_session):
+        uuid = profiled_client.post("/test/", json=valid_json).json()
+        response = profiled_client.get(f"/test/{uuid}/state/", headers={"X-Profile": "0"})
+        assert "X-Profile-Id" not in response.headers
+        assert profiled_client.get("/admin/profiles/").json() == []
+
+    def test_sample_rate(self, db_session):
+        buffer = ProfileBuffer(10)
+        with TestClient(ProfilingMiddleware(app, buffer, sample_rate=1.0)) as client:
+            for _ in range(3):
+                assert "X-Profile-Id" in client.get("/admin/kinds/").headers
+        assert len(buffer.list()) == 3
+
+    def test_unknown_profile(self, profiled_client):
+        assert profiled_client.get("/admin/profiles/12345/").status_code == 404
+        assert profiled_client.get("/admin/profiles/12345/folded").status_code == 404
+
+
+def in_the_request():
+    time.sleep(0.005)
+
+
+def in_another_request():
+    time.sleep(0.005)
+
+
+def in_a_worker():
+    time.sleep(0.02)
+
+
+async def profiled_app(scope, receive, send):
+    for _ in range(5):
+        in_the_request()
+        await asyncio.sleep(0)
+    await run_in_threadpool(in_a_worker)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def another_request():
+    for _ in range(10):
+        in_another_request()
+        await asyncio.sleep(0)
+
+
+class TestRequestTask:
+    def test_samples_are_attributed_to_the_request_task(self):
+        buffer = ProfileBuffer(10)
+        middleware = ProfilingMiddleware(profiled_app, buffer, interval=0.001)
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"x-profile", b"1")]}
+
+        async def send(message):
+            pass
+
+        async def main():
+            # both share the event loop thread, interleaving at every await
+            other = asyncio.create_task(another_request())
+            await middleware(scope, None, send)
+            await other
+
+        asyncio.run(main())
+        stacks = "\n".join(buffer.list()[0].stacks)
+        assert "in_the_request" in stacks
+        assert "in_another_request" not in stacks
+        # the work an async endpoint hands to the threadpool
+        assert "in_a_worker" in stacks
+
+
+class TestProfileBuffer:
+    def test_keeps_the_last_profiles(self):
+        buffer = ProfileBuffer(2)
+        for _ in range(3):
+            buffer.add(Profile(buffer.next_id(), "GET", "/"))
+        assert [profile.id for profile in buffer.list()] == [3, 2]
+        assert buffer.get(1) is None
+        assert buffer.get(3).path == "/"
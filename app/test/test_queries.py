@@ -0,0 +1,61 @@
+from uuid import uuid4
+
+import pytest
+
+from app.db import crud
+from app.models.app_model import App, StateEnum
+from app.test.test_api import endpoint, valid_json
+
+config = {"settings": {"settingA": "valueA"}, "specification": {"specificationA": "valueA"}}
+merge_patch = {"Content-Type": "application/merge-patch+json"}
+
+requests = {
+    "get_document": lambda client, uuid: client.get(f"{endpoint}/{uuid}"),
+    "get_document_state": lambda client, uuid: client.get(f"{endpoint}/{uuid}/state"),
+    "put_document_state": lambda client, uuid: client.put(
+        f"{endpoint}/{uuid}/state", params={"state": StateEnum.RUNNING.name}
+    ),
+    "put_document_config": lambda client, uuid: client.put(f"{endpoint}/{uuid}/configuration", json=config),
+    "patch_document_config": lambda client, uuid: client.patch(
+        f"{endpoint}/{uuid}/configuration", json={"settings": {"settingB": "valueB"}}, headers=merge_patch
+    ),
+    "put_document_settings": lambda client, uuid: client.put(f"{endpoint}/{uuid}/settings", json={"a": "b"}),
+    "delete_document": lambda client, uuid: client.delete(f"{endpoint}/{uuid}"),
+}
+
+
+class TestQueriesPerRequest:
+    def test_post_document(self, test_client, db_session, query_counter):
+        response = test_client.post(endpoint, json=valid_json)
+        assert response.status_code == 201
+        assert len(query_counter) == 1
+
+    @pytest.mark.parametrize("request_name", requests.keys())
+    def test_existing_document(self, test_client, db_session, query_counter, request_name):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        query_counter.clear()
+        response = requests[request_name](test_client, uuid)
+        assert response.status_code < 300
+        assert len(query_counter) == 1, query_counter
+
+    @pytest.mark.parametrize("request_name", requests.keys())
+    def test_missing_document(self, test_client, db_session, query_counter, request_name):
+        response = requests[request_name](test_client, uuid4())
+        assert response.status_code == 404
+        assert len(query_counter) == 1, query_counter
+
+    def test_create_conflict(self, db_session, query_counter):
+        uuid = uuid4()
+        document = dict(
+            uuid=uuid,
+            kind="kind",
+            document_kind="kind",
+            name="name",
+            version="1.0.0",
+            description="d",
+            configuration=valid_json["configuration"],
+        )
+        assert crud.create_document(db_session, App(state=StateEnum.NEW, **document)) is not None
+        assert crud.create_document(db_session, App(state=StateEnum.RUNNING, **document)) is None
+        assert crud.read_document(db_session, uuid).state == StateEnum.NEW
+        assert len(query_counter) == 3
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from fastapi import routing
+from fastapi.responses import ORJSONResponse
+
+from app.fastapi_app import app
+from app.models.app_model import StateEnum
+from app.test.test_api import endpoint, valid_json
+
+
+def forbid_serialization(monkeypatch):
+    def serialize_response(*args, **kwargs):
+        pytest.fail("the document must not be serialized in Python")
+
+    monkeypatch.setattr(routing, "serialize_response", serialize_response)
+
+
+class TestRawDocumentResponse:
+    def test_body_rendered_by_postgres(self, test_client, db_session, monkeypatch):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        forbid_serialization(monkeypatch)
+        response = test_client.get(f"{endpoint}/{uuid}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["ETag"] == '"1"'
+        assert response.json() == {
+            "uuid": uuid,
+            "kind": valid_json["kind"],
+            "name": valid_json["name"],
+            "version": valid_json["version"],
+            "description": valid_json["description"],
+            "state": StateEnum.NEW.name,
+            "json": valid_json,
+            "revision": 1,
+        }
+
+    def test_stream_rendered_by_postgres(self, test_client, db_session, monkeypatch):
+        test_client.post(f"{endpoint}/batch", json=[valid_json] * 3)
+        forbid_serialization(monkeypatch)
+        lines = test_client.get(f"{endpoint}/", params={"stream": True}).text.splitlines()
+        assert [json.loads(line)["json"]["kind"] for line in lines] == [valid_json["kind"]] * 3
+
+    def test_default_response_class(self):
+        assert app.router.default_response_class is ORJSONResponse
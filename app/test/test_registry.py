@@ -0,0 +1,217 @@
+import json
+import time
+from copy import deepcopy
+
+import pytest
+
+from app.fastapi_app import app
+from app.models import main_validator
+from app.routers.factory import create_async_router, create_router
+from app.routers.registry import SchemasWatcher, registry
+from app.settings import registry_settings
+from app.test.test_api import valid_json
+from benchmarks.bench_dispatch import kind_router
+
+with open("app/schemas/user_schema1.json") as f:
+    user_schema = json.load(f)
+
+
+ADMIN_HEADERS = {"Authorization": "Bearer secret"}
+
+
+@pytest.fixture
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(registry_settings, "admin_token", "secret")
+    yield registry
+    for kind in registry.kinds():
+        registry.unregister(kind)
+
+
+class TestFactory:
+    def test_async_router_has_the_same_routes(self):
+        def routes(router):
+            return sorted((route.path, tuple(sorted(route.methods))) for route in router.routes)
+
+        router = create_router("test", main_validator.validate, main_validator.validate_json)
+        async_router = create_async_router("test", main_validator.validate, main_validator.validate_json)
+        assert routes(async_router) == routes(router)
+
+
+class TestAdminKinds:
+    def test_register_and_serve(self, test_client, db_session, clean_registry):
+        response = test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        assert response.status_code == 201
+        assert response.json() == "check"
+        assert test_client.get("/admin/kinds/").json() == ["check", "test"]
+
+        post_response = test_client.post("/check/", json=valid_json)
+        assert post_response.status_code == 201
+        get_response = test_client.get(f"/check/{post_response.json()}/")
+        assert get_response.status_code == 200
+        assert get_response.json()["json"] == valid_json
+
+    def test_validation_uses_the_schema(self, test_client, db_session, clean_registry):
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        response = test_client.post("/check/", json={**valid_json, "kind": "short"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "ensure this value has at least 10 characters"
+
+    def test_configuration_uses_the_schema(self, test_client, db_session, clean_registry):
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        uuid = test_client.post("/check/", json=valid_json).json()
+        configuration = {"specification": {}, "settings": {"settings_aaa": {"nested": 1}}}
+        assert test_client.put(f"/check/{uuid}/configuration/", json=configuration).status_code == 400
+        configuration = {"specification": {}, "settings": {"settings_aaa": "value"}}
+        assert test_client.put(f"/check/{uuid}/configuration/", json=configuration).status_code == 200
+
+    def test_merged_configuration_uses_the_schema(self, test_client, db_session, clean_registry):
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        uuid = test_client.post("/check/", json=valid_json).json()
+        headers = {"Content-Type": "application/merge-patch+json"}
+        patch = {"settings": {"settings_aaa": {"nested": 1}}}
+        response = test_client.patch(f"/check/{uuid}/configuration/", json=patch, headers=headers)
+        assert response.status_code == 400
+        # the invalid merge is rolled back
+        response = test_client.get(f"/check/{uuid}/")
+        assert response.headers["ETag"] == '"1"'
+        assert response.json()["json"] == valid_json
+        patch = {"settings": {"settings_aaa": "value"}}
+        assert test_client.patch(f"/check/{uuid}/configuration/", json=patch, headers=headers).status_code == 200
+
+    def test_replace(self, test_client, db_session, clean_registry):
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        assert test_client.post("/check/", json=valid_json).status_code == 201
+        schema = deepcopy(user_schema)
+        schema["properties"]["name"]["maxLength"] = 21
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=schema)
+        response = test_client.post("/check/", json=valid_json)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "ensure this value has at most 21 characters"
+
+    def test_unregister(self, test_client, db_session, clean_registry):
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema)
+        assert test_client.delete("/admin/kinds/check/", headers=ADMIN_HEADERS).status_code == 204
+        assert test_client.post("/check/", json=valid_json).status_code == 404
+        assert test_client.delete("/admin/kinds/check/", headers=ADMIN_HEADERS).status_code == 404
+
+    def test_disabled_without_a_token(self, test_client, clean_registry, monkeypatch):
+        monkeypatch.setattr(registry_settings, "admin_token", None)
+        assert test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=user_schema).status_code == 403
+        assert test_client.delete("/admin/kinds/test/", headers=ADMIN_HEADERS).status_code == 403
+        assert registry.kinds() == ["test"]
+
+    def test_wrong_token(self, test_client, clean_registry):
+        response = test_client.post("/admin/kinds/", headers={"Authorization": "Bearer wrong"}, json=user_schema)
+        assert response.status_code == 401
+        assert test_client.post("/admin/kinds/", json=user_schema).status_code == 401
+        assert registry.kinds() == ["test"]
+
+    def test_invalid_schema(self, test_client, clean_registry):
+        response = test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json={"type": "object", "properties": {}})
+        assert response.status_code == 400
+        assert registry.kinds() == ["test"]
+
+    def test_static_routes_take_precedence(self, test_client, db_session, clean_registry):
+        schema = deepcopy(user_schema)
+        schema["properties"]["kind"]["title"] = "test"
+        test_client.post("/admin/kinds/", headers=ADMIN_HEADERS, json=schema)
+        assert test_client.post("/test/", json={**valid_json, "kind": "short"}).status_code == 201
+
+
+class TestSchemasWatcher:
+    def test_scan(self, tmp_path, clean_registry):
+        watcher = SchemasWatcher(registry, str(tmp_path))
+        (tmp_path / "check.json").write_text(json.dumps(user_schema))
+        (tmp_path / "broken.json").write_text("{not json")
+        watcher.scan()
+        assert registry.kinds() == ["check", "test"]
+
+        schema = deepcopy(user_schema)
+        schema["properties"]["kind"]["title"] = "renamed"
+        (tmp_path / "check.json").write_text(json.dumps(schema))
+        watcher.scan()
+        assert registry.kinds() == ["renamed", "test"]
+
+        (tmp_path / "check.json").unlink()
+        watcher.scan()
+        assert registry.kinds() == ["test"]
+
+    def test_delete_unloaded_schema(self, tmp_path, clean_registry):
+        watcher = SchemasWatcher(registry, str(tmp_path))
+        (tmp_path / "broken.json").write_text("{not json")
+        watcher.scan()
+        (tmp_path / "broken.json").unlink()
+        watcher.scan()
+        assert registry.kinds() == ["test"]
+
+    def test_failed_scan_keeps_the_thread(self, tmp_path, clean_registry, monkeypatch):
+        (tmp_path / "check.json").write_text(json.dumps(user_schema))
+        watcher = SchemasWatcher(registry, str(tmp_path), interval=0.01)
+        scans = []
+
+        def scan():
+            scans.append(None)
+            if len(scans) == 1:
+                raise OSError("schemas directory is unavailable")
+            SchemasWatcher.scan(watcher)
+
+        monkeypatch.setattr(watcher, "scan", scan)
+        watcher.start()
+        for _ in range(500):
+            if registry.kinds() == ["check", "test"]:
+                break
+            time.sleep(0.01)
+        watcher.stop()
+        assert registry.kinds() == ["check", "test"]
+
+    def test_invalid_schema_is_skipped(self, tmp_path, test_client, clean_registry):
+        schema = deepcopy(user_schema)
+        schema["properties"]["description"]["minLength"] = -1
+        (tmp_path / "check.json").write_text(json.dumps(schema))
+        SchemasWatcher(registry, str(tmp_path)).scan()
+        assert registry.kinds() == ["test"]
+
+    def test_built_before_the_first_request(self, tmp_path, clean_registry, monkeypatch):
+        (tmp_path / "check.json").write_text(json.dumps(user_schema))
+        SchemasWatcher(registry, str(tmp_path)).scan()
+        # dispatching only looks the router up
+        monkeypatch.setattr(registry, "_build", lambda kind, schema: pytest.fail("built while dispatching"))
+        assert registry.get("check") is not None
+
+    def test_background_thread(self, tmp_path, clean_registry):
+        (tmp_path / "check.json").write_text(json.dumps(user_schema))
+        watcher = SchemasWatcher(registry, str(tmp_path), interval=0.01)
+        watcher.start()
+        watcher.stop()
+        assert registry.kinds() == ["check", "test"]
+
+
+class TestDispatch:
+    def test_kinds_do_not_add_app_routes(self, test_client, clean_registry):
+        routes = len(app.routes)
+        for index in range(100):
+            registry.register_router(f"kind{index}", kind_router(f"kind{index}"))
+        try:
+            assert len(app.routes) == routes
+            response = test_client.put("/kind99/00000000-0000-0000-0000-000000000000/state/")
+            assert response.status_code == 200
+        finally:
+            for index in range(100):
+                registry.unregister_router(f"kind{index}")
+
+    def test_unknown_kind(self, test_client):
+        assert test_client.get("/unknown/").status_code == 404
+
+    def test_generated_routers_are_documented(self, test_client):
+        paths = test_client.get("/openapi.json").json()["paths"]
+        assert "/test/{uuid}/state/" in paths
+        assert "/admin/kinds/" in paths
+
+    def test_request_bodies_are_documented(self, test_client):
+        paths = test_client.get("/openapi.json").json()["paths"]
+        schema = paths["/test/"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+        assert schema["required"] == ["kind", "name", "description", "version", "configuration"]
+        assert schema["properties"]["configuration"]["required"] == ["specification", "settings"]
+        content = paths["/test/batch"]["post"]["requestBody"]["content"]
+        assert content["application/json"]["schema"] == {"type": "array", "items": schema}
+        assert content["application/x-ndjson"]["schema"] == schema
@@ -0,0 +1,80 @@
+import json
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.db import crud, statements
+from app.models.app_model import StateEnum
+from app.models.search_model import SearchQuery
+from app.routers.batch import build_document
+from app.test.test_api import endpoint, valid_json
+
+
+def document(settings: dict) -> dict:
+    return {**valid_json, "configuration": {"settings": settings, "specification": {}}}
+
+
+def post_documents(test_client, documents):
+    response = test_client.post(f"{endpoint}/batch", json=documents)
+    return [result["uuid"] for result in response.json()]
+
+
+def found(test_client, query: dict) -> set:
+    response = test_client.post(f"{endpoint}/search", json=query)
+    assert response.status_code == 200, response.json()
+    return {document["uuid"] for document in response.json()["items"]}
+
+
+class TestSearchDocuments:
+    def test_contains(self, test_client, db_session):
+        a, b, _ = post_documents(
+            test_client,
+            [document({"env": "prod", "n": 1}), document({"env": "prod", "n": 2}), document({"env": "dev"})],
+        )
+        assert found(test_client, {"contains": {"configuration": {"settings": {"env": "prod"}}}}) == {a, b}
+        assert found(test_client, {"contains": {"configuration": {"settings": {"env": "prod", "n": 2}}}}) == {b}
+
+    def test_equals(self, test_client, db_session):
+        a, b, c = post_documents(
+            test_client,
+            [document({"n": 1, "key.with dot": "x"}), document({"n": 2, "flag": True}), document({"n": "1"})],
+        )
+        assert found(test_client, {"equals": {"configuration.settings.n": 1}}) == {a}
+        assert found(test_client, {"equals": {"configuration.settings.n": "1"}}) == {c}
+        assert found(test_client, {"equals": {"configuration.settings.flag": True, "name": valid_json["name"]}}) == {b}
+
+    def test_posted_through_the_router(self, test_client, db_session):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        assert found(test_client, {}) == {uuid}
+        # a kind condition compares the kind field of the document, not the router's
+        assert found(test_client, {"equals": {"kind": valid_json["kind"]}}) == {uuid}
+        assert found(test_client, {"contains": {"kind": "test"}}) == set()
+
+    def test_only_own_kind(self, test_client, db_session):
+        crud.create_document(db_session, build_document(document({"a": 1}), "other", StateEnum.NEW))
+        assert found(test_client, {"contains": {"configuration": {"settings": {"a": 1}}}}) == set()
+
+    def test_pagination(self, test_client, db_session):
+        uuids = sorted(post_documents(test_client, [document({"a": 1})] * 5))
+        response = test_client.post(f"{endpoint}/search", json={"equals": {"configuration.settings.a": 1}, "limit": 2})
+        assert [document["uuid"] for document in response.json()["items"]] == uuids[:2]
+        assert response.json()["next"] == uuids[1]
+
+    def test_invalid_query(self, test_client, db_session):
+        assert test_client.post(f"{endpoint}/search", json={"equals": {"a..b": 1}}).status_code == 400
+        assert test_client.post(f"{endpoint}/search", json={"equals": {"a": {"b": 1}}}).status_code == 400
+        assert test_client.post(f"{endpoint}/search", json={"unknown": 1}).status_code == 400
+
+    def test_index_backed(self, test_client, db_session):
+        post_documents(test_client, [document({"env": f"env{i}"}) for i in range(5000)])
+        db_session.execute(text("ANALYZE apps"))
+        # a table this small is cheaper to scan sequentially; the point is that the index is usable
+        db_session.execute(text("SET enable_seqscan = off"))
+        query = SearchQuery(contains={"configuration": {"settings": {"env": "prod"}}}, equals={"name": "x"})
+        stmt = statements.search_documents("test", query)
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        params = {
+            key: json.dumps(value) if isinstance(value, dict) else value for key, value in compiled.params.items()
+        }
+        plan = "\n".join(row[0] for row in db_session.connection().exec_driver_sql(f"EXPLAIN {compiled}", params))
+        assert "ix_apps_configuration" in plan, plan
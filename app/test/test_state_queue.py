@@ -0,0 +1,123 @@
+from uuid import uuid4
+
+import pytest
+
+from app.db import state_queue
+from app.db.state_queue import StateQueue
+from app.models.app_model import App
+from app.test.conftest import TestingSessionLocal
+from app.test.test_api import valid_json
+
+endpoint = "/test"
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = StateQueue(TestingSessionLocal, max_size=100, window=0.05, retry_delay=0.01)
+    monkeypatch.setattr(state_queue, "state_queue", queue)
+    yield queue
+    queue.close()
+
+
+def create(test_client) -> str:
+    return test_client.post(endpoint, json=valid_json).json()
+
+
+def stored(db_session, uuid: str) -> App:
+    db_session.expire_all()
+    return db_session.get(App, uuid)
+
+
+class TestWriteBehind:
+    def test_transitions_are_acknowledged_and_coalesced(self, test_client, db_session, queue):
+        uuid = create(test_client)
+        for state in ("INSTALLING", "RUNNING", "INSTALLING"):
+            response = test_client.put(f"{endpoint}/{uuid}/state/", params={"state": state})
+            assert response.status_code == 202
+            assert response.json() == {"uuid": uuid, "state": state}
+
+        response = test_client.get(f"{endpoint}/{uuid}/state/")
+        assert response.json() == "INSTALLING"
+        assert "ETag" not in response.headers
+
+        assert queue.flush(timeout=5)
+        document = stored(db_session, uuid)
+        assert document.state.value == "INSTALLING"
+        assert document.revision == 2
+        assert queue.stats()["coalesced"] == 2
+        response = test_client.get(f"{endpoint}/{uuid}/state/")
+        assert response.json() == "INSTALLING"
+        assert response.headers["ETag"] == '"2"'
+
+    def test_one_update_per_batch(self, test_client, db_session, queue, query_counter):
+        uuids = [create(test_client) for _ in range(5)]
+        query_counter.clear()
+        for uuid in uuids:
+            assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "RUNNING"}).status_code == 202
+        assert queue.flush(timeout=5)
+        updates = [statement for statement in query_counter if statement.startswith("UPDATE")]
+        assert len(updates) == 1
+        assert "FROM (VALUES" in updates[0]
+        assert all(stored(db_session, uuid).state.value == "RUNNING" for uuid in uuids)
+
+    def test_backpressure(self, test_client, db_session, monkeypatch):
+        queue = StateQueue(TestingSessionLocal, max_size=1, window=60)
+        monkeypatch.setattr(state_queue, "state_queue", queue)
+        first, second = create(test_client), create(test_client)
+        assert test_client.put(f"{endpoint}/{first}/state/", params={"state": "RUNNING"}).status_code == 202
+        # the same document is coalesced and takes no extra room
+        assert test_client.put(f"{endpoint}/{first}/state/", params={"state": "NEW"}).status_code == 202
+        response = test_client.put(f"{endpoint}/{second}/state/", params={"state": "RUNNING"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert queue.stats()["rejected"] == 1
+        queue.close()
+        assert stored(db_session, first).state.value == "NEW"
+
+    def test_unknown_document(self, test_client, db_session, queue):
+        response = test_client.put(f"{endpoint}/{uuid4()}/state/", params={"state": "RUNNING"})
+        assert response.status_code == 404
+        assert queue.stats()["enqueued"] == 0
+
+    def test_direct_write_without_queued_transitions(self, test_client, db_session, queue, monkeypatch):
+        uuid = create(test_client)
+        monkeypatch.setattr(queue, "settle", lambda uuid: pytest.fail("settled a document with nothing queued"))
+        response = test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "NEW"}, headers={"If-Match": '"1"'})
+        assert response.status_code == 200
+
+    def test_conditional_write_waits_for_queued_transitions(self, test_client, db_session, queue):
+        uuid = create(test_client)
+        assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "RUNNING"}).status_code == 202
+        # the queued transition lands first and bumps the revision the client saw
+        response = test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "NEW"}, headers={"If-Match": '"1"'})
+        assert response.status_code == 412
+        response = test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "NEW"}, headers={"If-Match": '"2"'})
+        assert response.status_code == 200
+        assert response.json()["revision"] == 3
+
+    def test_close_flushes(self, test_client, db_session, monkeypatch):
+        queue = StateQueue(TestingSessionLocal, window=60)
+        monkeypatch.setattr(state_queue, "state_queue", queue)
+        uuid = create(test_client)
+        assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "RUNNING"}).status_code == 202
+        queue.close(timeout=5)
+        assert stored(db_session, uuid).state.value == "RUNNING"
+        assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "NEW"}).status_code == 503
+
+    def test_failed_batch_is_retried(self, test_client, db_session, monkeypatch):
+        failures = []
+
+        def flaky_session():
+            if not failures:
+                failures.append(True)
+                raise ConnectionError("database is restarting")
+            return TestingSessionLocal()
+
+        queue = StateQueue(flaky_session, window=0.01, retry_delay=0.01)
+        monkeypatch.setattr(state_queue, "state_queue", queue)
+        uuid = create(test_client)
+        assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "RUNNING"}).status_code == 202
+        assert queue.flush(timeout=5)
+        queue.close()
+        assert queue.stats()["failures"] == 1
+        assert stored(db_session, uuid).state.value == "RUNNING"
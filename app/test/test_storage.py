@@ -0,0 +1,53 @@
+import json
+
+from sqlalchemy import inspect, select, text
+
+from app.db import statements
+from app.test.conftest import DATABASE_URL, engine
+from app.test.test_api import endpoint, valid_json
+from benchmarks.bench_storage import SCHEMA, bench_engine, create_legacy, migrate, run, synthetic_documents
+
+
+class TestStorage:
+    def test_only_the_configuration_is_stored(self, test_client, db_session):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        assert "json" not in {column["name"] for column in inspect(engine).get_columns("apps")}
+        stored = db_session.execute(text("SELECT configuration FROM apps WHERE uuid = :uuid"), {"uuid": uuid}).scalar()
+        assert stored == valid_json["configuration"]
+        assert test_client.get(f"{endpoint}/{uuid}/").json()["json"] == valid_json
+        assert test_client.put(f"{endpoint}/{uuid}/state/", params={"state": "RUNNING"}).json()["json"] == valid_json
+
+    def test_search_by_metadata_and_configuration(self, test_client, db_session):
+        uuid = test_client.post(endpoint, json=valid_json).json()
+        test_client.post(endpoint, json={**valid_json, "name": "other"})
+        query = {
+            "contains": {"name": valid_json["name"], "configuration": {"settings": {}}},
+            "equals": {"version": "1.0.0"},
+        }
+        items = test_client.post(f"{endpoint}/search", json=query).json()["items"]
+        assert [item["uuid"] for item in items] == [uuid]
+        assert test_client.post(f"{endpoint}/search", json={"contains": {"uuid": uuid}}).json()["items"] == []
+        assert test_client.post(f"{endpoint}/search", json={"equals": {"name.first": "x"}}).json()["items"] == []
+
+
+class TestMigration:
+    def test_documents_survive(self, db_session):
+        documents = synthetic_documents(3, 100, 2)
+        with bench_engine(DATABASE_URL).connect() as connection:
+            try:
+                create_legacy(connection, documents)
+                migrate(connection)
+                rows = connection.execute(select(statements.document_json())).scalars().all()
+            finally:
+                connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        migrated = {document["uuid"]: document for document in map(json.loads, rows)}
+        for document in documents:
+            uuid = document.pop("uuid")
+            assert migrated[uuid]["json"] == document
+            assert migrated[uuid]["name"] == document["name"]
+
+    def test_size_report(self, db_session):
+        report = run(50, 3000, 2, DATABASE_URL)
+        assert report["before"]["rows"] == report["after"]["rows"] == 50
+        assert report["after"]["row_bytes"] < report["before"]["row_bytes"]
+        assert report["after"]["toast"] < report["before"]["toast"]
@@ -0,0 +1,125 @@
+import json
+import timeit
+from copy import deepcopy
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+from app.models import main_validator
+from app.models.main_model import MainModel
+from app.models.validation import DocumentValidationError
+from app.test.test_api import valid_json
+from app.utils.validator_generator import compile_validator, generate_validator_source
+
+invalid_documents = [
+    {},
+    {**valid_json, "kind": ""},
+    {**valid_json, "name": "n" * 129},
+    {**valid_json, "version": "1.0"},
+    {**valid_json, "description": None},
+    {**valid_json, "extra": 1},
+    {**valid_json, "configuration": "test"},
+    {**valid_json, "configuration": None},
+    {**valid_json, "configuration": {"settings": {}}},
+    {**valid_json, "configuration": {"settings": {}, "specification": {}, "extra": {}}},
+    {**valid_json, "configuration": {"settings": 1, "specification": {}}},
+]
+
+
+def validation_error(validate, document) -> tuple[str, tuple]:
+    with pytest.raises(DocumentValidationError) as exc:
+        validate(document)
+    return exc.value.msg, exc.value.loc
+
+
+class TestMainValidator:
+    def test_valid(self):
+        assert main_validator.validate(deepcopy(valid_json)) == jsonable_encoder(MainModel.parse_obj(valid_json))
+
+    @pytest.mark.parametrize("document", invalid_documents)
+    def test_same_errors_as_pydantic(self, document):
+        with pytest.raises(ValidationError) as exc:
+            MainModel.parse_obj(document)
+        error = exc.value.errors()[0]
+        assert validation_error(main_validator.validate, document) == (error["msg"], error["loc"])
+
+    def test_invalid_json(self):
+        with pytest.raises(DocumentValidationError):
+            main_validator.validate_json(b"{not json")
+
+    def test_checked_in_module_is_up_to_date(self):
+        with open("app/schemas/main_schema.json") as f:
+            source = generate_validator_source(json.load(f))
+        with open("app/models/main_validator.py") as f:
+            assert f.read() == source
+
+    def test_faster_than_pydantic(self):
+        body = json.dumps(valid_json).encode()
+        pydantic_time = min(timeit.repeat(lambda: jsonable_encoder(MainModel.parse_raw(body)), number=1000, repeat=5))
+        compiled_time = min(timeit.repeat(lambda: main_validator.validate_json(body), number=1000, repeat=5))
+        assert compiled_time * 2 < pydantic_time
+
+
+class TestGeneratedValidator:
+    def test_refs_and_alternatives(self):
+        validate = compile_validator(
+            {
+                "type": "object",
+                "properties": {
+                    "tags": {"type": "array", "items": {"$ref": "#/$defs/Tag"}, "maxItems": 2},
+                    "size": {"anyOf": [{"type": "integer", "minimum": 1}, {"enum": ["auto"]}]},
+                },
+                "$defs": {"Tag": {"type": "string", "pattern": "^[a-z]+$"}},
+            }
+        ).validate
+        assert validate({"tags": ["a", "b"], "size": "auto"}) == {"tags": ["a", "b"], "size": "auto"}
+        assert validate({"size": None}) == {"size": None}
+        assert validation_error(validate, {"tags": ["a", "B"]}) == (
+            'string does not match regex "^[a-z]+$"',
+            ("tags", 1),
+        )
+        assert validation_error(validate, {"tags": ["a", "b", "c"]}) == (
+            "ensure this value has at most 2 items",
+            ("tags",),
+        )
+        assert validation_error(validate, {"size": 0}) == ("ensure this value is greater than or equal to 1", ("size",))
+
+    def test_recursive_ref(self):
+        validate = compile_validator(
+            {
+                "$ref": "#/definitions/Node",
+                "definitions": {
+                    "Node": {
+                        "type": "object",
+                        "properties": {"children": {"type": "array", "items": {"$ref": "#/definitions/Node"}}},
+                        "additionalProperties": False,
+                    }
+                },
+            }
+        ).validate
+        assert validate({"children": [{"children": []}]})
+        assert validation_error(validate, {"children": [{"x": 1}]}) == (
+            "extra fields not permitted",
+            ("children", 0, "x"),
+        )
+
+    def test_booleans_are_not_numbers(self):
+        validate = compile_validator({"type": "object", "properties": {"count": {"type": "integer"}}}).validate
+        assert validate({"count": 2.0})
+        assert validation_error(validate, {"count": True}) == ("value is not a valid integer", ("count",))
+
+    @pytest.mark.parametrize(
+        "limit, valid, invalid",
+        [(0.1, [0.3, 0.7, 2, -1.1], [0.35, 1e308]), (2, [4, 6.0], [3, 4.5])],
+    )
+    def test_multiple_of(self, limit, valid, invalid):
+        schema = {"type": "object", "properties": {"value": {"type": "number", "multipleOf": limit}}}
+        validate = compile_validator(schema).validate
+        for value in valid:
+            assert validate({"value": value})
+        for value in invalid:
+            assert validation_error(validate, {"value": value}) == (
+                f"ensure this value is a multiple of {limit}",
+                ("value",),
+            )
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import tempfile
+from importlib.metadata import version
+from pathlib import Path
+
+MANIFEST_NAME = ".gen-manifest.json"
+
+_GENERATOR_MODULES = ("model_generator.py", "validator_generator.py", "rest_generator.py", "manifest.py")
+
+
+def fingerprint(*parts: str | bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def generator_version() -> str:
+    # any change to the generators or to datamodel-code-generator invalidates every output
+    utils_directory = Path(__file__).parent
+    sources = [(utils_directory / name).read_bytes() for name in _GENERATOR_MODULES]
+    return fingerprint(version("datamodel-code-generator"), *sources)
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    path = Path(path)
+    if path.exists() and path.read_text() == content:
+        return False
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w") as f:
+            f.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return True
+
+
+class Manifest:
+    def __init__(self, directory: str | Path):
+        self.path = Path(directory) / MANIFEST_NAME
+        try:
+            self.entries: dict[str, dict] = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def is_fresh(self, key: str, digest: str) -> bool:
+        entry = self.entries.get(key)
+        if entry is None or entry["fingerprint"] != digest:
+            return False
+        return all((self.path.parent / output).exists() for output in entry["outputs"])
+
+    def outputs(self, key: str) -> list[str]:
+        return self.entries[key]["outputs"]
+
+    def record(self, key: str, digest: str, outputs: list[str]) -> None:
+        self.entries[key] = {"fingerprint": digest, "outputs": outputs}
+
+    def save(self) -> None:
+        write_if_changed(self.path, json.dumps(self.entries, indent=2, sort_keys=True) + "\n")
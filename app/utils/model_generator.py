@@ -1,28 +1,49 @@
 import json
+import sys
+import tempfile
 from pathlib import Path
+from types import ModuleType
 
 from datamodel_code_generator import DataModelType, InputFileType, generate
 from jsonschema.exceptions import ValidationError
-from pathvalidate import sanitize_filename
 
+from app.utils.manifest import write_if_changed
+from app.utils.schema_validate import get_kind
 
-def generate_model(schema: dict, filename: str, output_dir: str):
-    kind = schema.get("properties", {}).get("kind", {}).get("title", "")
+
+def generate_model(schema: dict, filename: str, output_dir: str) -> str:
+    kind = get_kind(schema)
     if not kind:
         raise ValidationError(f"Kind is not defined in '{filename}', check the schema for validity.")
-    kind = sanitize_filename(kind).title().replace(" ", "")
     schema["title"] = kind
     output_name = f"{kind}Model.py"
     output = Path(f"{output_dir}/{output_name}")
-    schema_string = json.dumps(schema)
-    generate(
-        schema_string,
-        input_file_type=InputFileType.JsonSchema,
-        input_filename=filename,
-        output=output,
-        output_model_type=DataModelType.PydanticBaseModel,
-    )
-    model: str = output.read_text()
-    with open(output, "w") as file:
-        file.write(model)
-    print(f"Generated model '{output}'")
+    # generated into a scratch directory first so that an unchanged model is not rewritten
+    if write_if_changed(output, generate_model_source(schema, filename)):
+        print(f"Generated model '{output}'")
+    return kind
+
+
+def generate_model_source(schema: dict, filename: str) -> str:
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        scratch = Path(scratch_dir) / "model.py"
+        generate(
+            json.dumps(schema),
+            input_file_type=InputFileType.JsonSchema,
+            input_filename=filename,
+            output=scratch,
+            output_model_type=DataModelType.PydanticBaseModel,
+            disable_timestamp=True,
+        )
+        return scratch.read_text()
+
+
+def compile_model(schema: dict, name: str = "model") -> ModuleType:
+    module = ModuleType(name)
+    # pydantic resolves the postponed annotations of the generated classes through sys.modules
+    sys.modules[name] = module
+    try:
+        exec(compile(generate_model_source(schema, f"{name}.json"), name, "exec"), module.__dict__)
+    finally:
+        del sys.modules[name]
+    return module
@@ -1,22 +1,38 @@
 import os
+from functools import lru_cache
+from pathlib import Path
 
-from jinja2 import Template
+from app.utils.manifest import write_if_changed
 
 # placeholders = {
 #     'model_dir': 'models',
+#     'validator_dir': 'models',
 #     'main_model': 'Test',
-#     'config_model': 'TestConfig',
 #     'kind': 'test',
 # }
 
+template_directory = os.path.dirname(os.path.abspath(__file__)) + '/../templates'
 
-def generate_router(values: dict[str, str], filename: str, output_dir: str):
-    template_directory = os.path.dirname(os.path.abspath(__file__)) + '/../templates'
-    with open(f'{template_directory}/router_template.jinja') as f:
-        content = f.read()
 
-    template = Template(content)
-    rendered_form = template.render(values)
+def template_name(use_async: bool = False) -> str:
+    return 'router_template_async.jinja' if use_async else 'router_template.jinja'
 
-    with open(f'{output_dir}/{filename}Router.py', 'w') as f:
-        f.write(rendered_form)
+
+def template_path(use_async: bool = False) -> Path:
+    return Path(f'{template_directory}/{template_name(use_async)}')
+
+
+@lru_cache
+def _environment():
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    # compiled templates are cached per process and on disk, so every worker and run skips parsing them
+    return Environment(loader=FileSystemLoader(template_directory), bytecode_cache=FileSystemBytecodeCache())
+
+
+def render_router(values: dict[str, str], use_async: bool = False) -> str:
+    return _environment().get_template(template_name(use_async)).render(values)
+
+
+def generate_router(values: dict[str, str], filename: str, output_dir: str, use_async: bool = False):
+    write_if_changed(Path(f'{output_dir}/{filename}Router.py'), render_router(values, use_async))
@@ -1,5 +1,12 @@
 import sys
 
+from pathvalidate import sanitize_filename
+
+
+def get_kind(schema: dict) -> str:
+    kind = schema.get("properties", {}).get("kind", {}).get("title", "")
+    return sanitize_filename(kind).title().replace(" ", "")
+
 
 def is_subset(user_schema: dict, main_schema: dict) -> bool:
     if not validate_properties(user_schema, main_schema) or not validate_required_field(user_schema, main_schema):
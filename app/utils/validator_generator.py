@@ -0,0 +1,324 @@
+import json
+import os
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from app.utils.manifest import write_if_changed
+
+# JSON types as json.loads returns them; booleans are ints in Python and are excluded explicitly
+TYPE_CHECKS = {
+    "object": "type(value) is dict",
+    "array": "type(value) is list",
+    "string": "type(value) is str",
+    "integer": "(type(value) is int or (type(value) is float and value.is_integer()))",
+    "number": "type(value) in (int, float)",
+    "boolean": "type(value) is bool",
+    "null": "value is None",
+}
+
+# same wording as pydantic v1, so clients see the same errors on both validation paths
+TYPE_ERRORS = {
+    "object": "value is not a valid dict",
+    "array": "value is not a valid list",
+    "string": "str type expected",
+    "integer": "value is not a valid integer",
+    "number": "value is not a valid float",
+    "boolean": "value could not be parsed to a boolean",
+    "null": "value is not none",
+}
+
+ANNOTATIONS = {"title", "description", "default", "examples", "$comment"}
+
+
+class _Compiler:
+    def __init__(self, root: dict):
+        self.root = root
+        self.functions: list[str] = []
+        self.constants: list[str] = []
+        self.refs: dict[str, str] = {}
+        self.modules: set[str] = set()
+        self.imports = {"DocumentValidationError", "parse_json"}
+
+    def constant(self, expression: str) -> str:
+        name = f"_C{len(self.constants)}"
+        self.constants.append(f"{name} = {expression}")
+        return name
+
+    def compile(self, schema: Any) -> str:
+        if isinstance(schema, dict) and set(schema) - ANNOTATIONS == {"$ref"}:
+            return self.resolve(schema["$ref"])
+        # the slot is reserved first so that recursive references can point at it while it is being compiled
+        index = len(self.functions)
+        self.functions.append("")
+        self.functions[index] = self._function(f"_v{index}", schema)
+        return f"_v{index}"
+
+    def resolve(self, ref: str) -> str:
+        if ref not in self.refs:
+            target = self._target(ref)
+            self.refs[ref] = f"_v{len(self.functions)}"
+            self.compile(target)
+        return self.refs[ref]
+
+    def _rejects_null(self, schema: Any) -> bool:
+        # pydantic reports a null sent for a required non-nullable field with its own message
+        if isinstance(schema, dict) and "$ref" in schema and "type" not in schema:
+            return self._rejects_null(self._target(schema["$ref"]))
+        types = schema.get("type") if isinstance(schema, dict) else None
+        return bool(types) and "null" not in types
+
+    def _target(self, ref: str) -> Any:
+        if not ref.startswith("#/"):
+            raise ValueError(f"Only local references are supported, got '{ref}'")
+        target: Any = self.root
+        for part in ref[2:].split("/"):
+            target = target[part.replace("~1", "/").replace("~0", "~")]
+        return target
+
+    def _function(self, name: str, schema: Any) -> str:
+        lines = [f"def {name}(value):"]
+        body = self._body(schema) if isinstance(schema, dict) else self._boolean(schema)
+        lines += ["    " + line for line in body]
+        lines.append("    return value")
+        return "\n".join(lines)
+
+    def _boolean(self, schema: bool) -> list[str]:
+        return [] if schema else ["raise DocumentValidationError('no value is permitted')"]
+
+    def _body(self, schema: dict) -> list[str]:
+        lines: list[str] = []
+        if "$ref" in schema:
+            lines.append(f"{self.resolve(schema['$ref'])}(value)")
+        for subschema in schema.get("allOf", []):
+            lines.append(f"{self.compile(subschema)}(value)")
+        for keyword in ("anyOf", "oneOf"):
+            if keyword in schema:
+                validators = f"({', '.join(self.compile(s) for s in schema[keyword])},)"
+                lines += self._alternatives(validators, exactly_one=keyword == "oneOf")
+        if "enum" in schema or "const" in schema:
+            self.imports.add("in_enum")
+        if "enum" in schema:
+            options = self.constant(repr(schema["enum"]))
+            error = "value is not a valid enumeration member; permitted: " + ", ".join(map(json.dumps, schema["enum"]))
+            lines += [f"if not in_enum(value, {options}):", f"    raise DocumentValidationError({error!r})"]
+        if "const" in schema:
+            options = self.constant(repr([schema["const"]]))
+            error = f"unexpected value; permitted: {json.dumps(schema['const'])}"
+            lines += [f"if not in_enum(value, {options}):", f"    raise DocumentValidationError({error!r})"]
+        types = schema.get("type")
+        if isinstance(types, str):
+            types = [types]
+        if types:
+            check = " or ".join(TYPE_CHECKS[t] for t in types)
+            error = TYPE_ERRORS[types[0]] if len(types) == 1 else f"value is not a valid {' or '.join(types)}"
+            lines += [f"if not ({check}):", f"    raise DocumentValidationError({error!r})"]
+        lines += self._string(schema, types)
+        lines += self._number(schema, types)
+        lines += self._array(schema, types)
+        lines += self._object(schema, types)
+        return lines
+
+    def _alternatives(self, validators: str, exactly_one: bool) -> list[str]:
+        return [
+            "errors, matches = [], 0",
+            f"for validator in {validators}:",
+            "    try:",
+            "        validator(value)",
+            "        matches += 1",
+            "    except DocumentValidationError as e:",
+            "        errors.append(e)",
+            "if matches == 0:",
+            "    raise errors[0]",
+            *(
+                ["if matches > 1:", "    raise DocumentValidationError('value matches more than one schema')"]
+                if exactly_one
+                else []
+            ),
+        ]
+
+    @staticmethod
+    def _guard(types: list[str] | None, json_type: str, checks: list[str]) -> list[str]:
+        # keywords only apply to values of their own JSON type, the guard is dropped when the type is already checked
+        covered = {"number", "integer"} if json_type == "number" else {json_type}
+        if not checks or (types and set(types) <= covered):
+            return checks
+        return [f"if {TYPE_CHECKS[json_type]}:", *("    " + line for line in checks)]
+
+    def _string(self, schema: dict, types: list[str] | None) -> list[str]:
+        checks = []
+        if "minLength" in schema:
+            limit = schema["minLength"]
+            checks += [
+                f"if len(value) < {limit}:",
+                f"    raise DocumentValidationError('ensure this value has at least {limit} characters')",
+            ]
+        if "maxLength" in schema:
+            limit = schema["maxLength"]
+            checks += [
+                f"if len(value) > {limit}:",
+                f"    raise DocumentValidationError('ensure this value has at most {limit} characters')",
+            ]
+        if "pattern" in schema:
+            self.modules.add("re")
+            pattern = self.constant(f"re.compile({schema['pattern']!r})")
+            error = f'string does not match regex "{schema["pattern"]}"'
+            checks += [f"if {pattern}.search(value) is None:", f"    raise DocumentValidationError({error!r})"]
+        return self._guard(types, "string", checks)
+
+    def _number(self, schema: dict, types: list[str] | None) -> list[str]:
+        checks = []
+        bounds = [
+            ("minimum", "<", "greater than or equal to"),
+            ("exclusiveMinimum", "<=", "greater than"),
+            ("maximum", ">", "less than or equal to"),
+            ("exclusiveMaximum", ">=", "less than"),
+        ]
+        for keyword, operator, wording in bounds:
+            if keyword in schema and not isinstance(schema[keyword], bool):
+                limit = schema[keyword]
+                checks += [
+                    f"if value {operator} {limit!r}:",
+                    f"    raise DocumentValidationError('ensure this value is {wording} {limit}')",
+                ]
+        if "multipleOf" in schema:
+            limit = schema["multipleOf"]
+            if isinstance(limit, int):
+                checks.append(f"if value % {limit!r}:")
+            else:
+                # float division is inexact (0.3 / 0.1 == 2.9999999999999996), the same tolerance as pydantic v1
+                checks += [
+                    f"remainder = value / {limit!r} % 1",
+                    "if not (abs(remainder) <= 1e-8 or abs(remainder - 1) <= 1e-8):",
+                ]
+            checks.append(f"    raise DocumentValidationError('ensure this value is a multiple of {limit}')")
+        return self._guard(types, "number", checks)
+
+    def _array(self, schema: dict, types: list[str] | None) -> list[str]:
+        checks = []
+        if "minItems" in schema:
+            limit = schema["minItems"]
+            checks += [
+                f"if len(value) < {limit}:",
+                f"    raise DocumentValidationError('ensure this value has at least {limit} items')",
+            ]
+        if "maxItems" in schema:
+            limit = schema["maxItems"]
+            checks += [
+                f"if len(value) > {limit}:",
+                f"    raise DocumentValidationError('ensure this value has at most {limit} items')",
+            ]
+        items = schema.get("items")
+        if isinstance(items, (dict, bool)):
+            validator = self.compile(items)
+            checks += [
+                "for index, item in enumerate(value):",
+                "    try:",
+                f"        {validator}(item)",
+                "    except DocumentValidationError as e:",
+                "        e.loc = (index, *e.loc)",
+                "        raise",
+            ]
+        return self._guard(types, "array", checks)
+
+    def _object(self, schema: dict, types: list[str] | None) -> list[str]:
+        properties: dict = schema.get("properties", {})
+        required = schema.get("required", [])
+        additional = schema.get("additionalProperties", True)
+        if not properties and not required and additional is True:
+            return []
+        checks = ["key = None", "try:"]
+        for key, subschema in properties.items():
+            checks += [f"    key = {key!r}", f"    if {key!r} in value:"]
+            if key in required:
+                if self._rejects_null(subschema):
+                    checks += [
+                        f"        if value[{key!r}] is None:",
+                        "            raise DocumentValidationError('none is not an allowed value')",
+                    ]
+                checks += [
+                    f"        {self.compile(subschema)}(value[{key!r}])",
+                    "    else:",
+                    "        raise DocumentValidationError('field required')",
+                ]
+            else:
+                # like pydantic, an optional field may be sent as null
+                checks += [
+                    f"        if value[{key!r}] is not None:",
+                    f"            {self.compile(subschema)}(value[{key!r}])",
+                ]
+        for key in required:
+            if key not in properties:
+                checks += [
+                    f"    key = {key!r}",
+                    f"    if {key!r} not in value:",
+                    "        raise DocumentValidationError('field required')",
+                ]
+        if additional is not True:
+            known = self.constant(f"frozenset({tuple(properties)!r})")
+            checks += ["    for key in value:", f"        if key not in {known}:"]
+            if additional is False:
+                checks.append("            raise DocumentValidationError('extra fields not permitted')")
+            else:
+                checks.append(f"            {self.compile(additional)}(value[key])")
+        checks += [
+            "except DocumentValidationError as e:",
+            "    e.loc = (key, *e.loc)",
+            "    raise",
+        ]
+        return self._guard(types, "object", checks)
+
+
+def generate_validator_source(schema: dict, formatted: bool = True) -> str:
+    compiler = _Compiler(schema)
+    root = compiler.compile(schema)
+    title = schema.get("title", "")
+    source = "\n".join(
+        [
+            f"# generated by gen-cli gen-models from the '{title}' JSON schema, do not edit",
+            *(f"import {module}" for module in sorted(compiler.modules)),
+            "from typing import Any",
+            "",
+            f"from app.models.validation import {', '.join(sorted(compiler.imports))}",
+            "",
+            *compiler.constants,
+            "",
+            "",
+            "\n\n\n".join(compiler.functions),
+            "",
+            "",
+            "def validate(document: Any) -> dict:",
+            f"    return {root}(document)",
+            "",
+            "",
+            "def validate_json(body: bytes) -> dict:",
+            f"    return {root}(parse_json(body))",
+            "",
+        ]
+    )
+    if not formatted:
+        return source
+
+    import black
+
+    return black.format_str(source, mode=black.Mode(line_length=120, string_normalization=False))
+
+
+def compile_validator(schema: dict, name: str = "validator") -> ModuleType:
+    module = ModuleType(name)
+    exec(compile(generate_validator_source(schema, formatted=False), name, "exec"), module.__dict__)
+    return module
+
+
+def generate_validator(schema: dict, kind: str, output_dir: str) -> None:
+    output = Path(f"{output_dir}/{kind}Validator.py")
+    if write_if_changed(output, generate_validator_source(schema)):
+        print(f"Generated validator '{output}'")
+
+
+if __name__ == '__main__':
+    models_directory = os.path.dirname(os.path.abspath(__file__)) + '/../models'
+    schemas_directory = os.path.dirname(os.path.abspath(__file__)) + '/../schemas'
+    with open(f'{schemas_directory}/main_schema.json') as f:
+        main_schema = json.load(f)
+    Path(f'{models_directory}/main_validator.py').write_text(generate_validator_source(main_schema))
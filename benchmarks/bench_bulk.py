@@ -0,0 +1,80 @@
+import argparse
+import time
+from typing import Optional
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, delete, event, insert
+
+from app.db.database import Base, SessionLocal, engine
+from app.fastapi_app import app
+from app.models.app_model import App, StateEnum
+from benchmarks.bench_watch import QueryCounter
+
+KIND = "test"
+
+
+def create_documents(count: int) -> list[str]:
+    rows = [
+        {
+            "uuid": uuid4(),
+            "kind": KIND,
+            "document_kind": KIND,
+            "name": "bench",
+            "version": "1.0.0",
+            "description": "bench",
+            "state": StateEnum.INSTALLING,
+            "configuration": {},
+        }
+        for _ in range(count)
+    ]
+    with SessionLocal() as db:
+        db.execute(insert(App), rows)
+        db.commit()
+    return [str(row["uuid"]) for row in rows]
+
+
+def one_by_one(client: TestClient, uuids: list[str]) -> None:
+    for uuid in uuids:
+        client.put(f"/{KIND}/{uuid}/state/", params={"state": StateEnum.RUNNING.value})
+
+
+def bulk(client: TestClient, uuids: list[str]) -> None:
+    response = client.put(f"/{KIND}/state/", params={"state": StateEnum.RUNNING.value}, json={"state": "INSTALLING"})
+    assert response.json()["count"] == len(uuids), response.json()
+
+
+def measure(client: TestClient, rollout, documents: int) -> tuple[float, int]:
+    uuids = create_documents(documents)
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+    try:
+        start = time.perf_counter()
+        rollout(client, uuids)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(Engine, "before_cursor_execute", counter)
+        with SessionLocal() as db:
+            db.execute(delete(App).where(App.kind == KIND, App.name == "bench"))
+            db.commit()
+    return elapsed, counter.count
+
+
+def init_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Moving a kind from INSTALLING to RUNNING one by one and in bulk")
+    parser.add_argument("--documents", type=int, default=2000)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = init_parser().parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as client:
+        for rollout in (one_by_one, bulk):
+            elapsed, queries = measure(client, rollout, args.documents)
+            print(f"{rollout.__name__:<12}{elapsed * 1000:10.1f} ms{queries:8d} queries for {args.documents} documents")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import time
+
+COMMANDS = {
+    "--help": ["-m", "app.cli", "--help"],
+    "gen-rest --help": ["-m", "app.cli", "gen-rest", "--help"],
+    "gen-models --help": ["-m", "app.cli", "gen-models", "--help"],
+}
+REPEAT = 5
+
+
+def import_time_us(module: str) -> int:
+    # cumulative time of the module itself, as reported by the last -X importtime line for it
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    lines = [line for line in result.stderr.splitlines() if line.split("|")[-1].strip() == module]
+    return int(lines[-1].split("|")[1])
+
+
+def wall_time_ms(arguments: list[str]) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    print(f"{'import app.cli':<24}{import_time_us('app.cli') / 1000:8.1f} ms (-X importtime, cumulative)")
+    for name, arguments in COMMANDS.items():
+        print(f"{name:<24}{wall_time_ms(arguments):8.1f} ms (wall, best of {REPEAT})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.routers.registry import KindRegistry, RegistryRoute
+from app.templates.router_template import router as router_template
+
+KIND_COUNTS = (10, 100, 1000, 5000)
+REQUESTS = 2000
+# the linear scan over thousands of kinds is slow enough that a time budget bounds each measurement
+BUDGET_SECONDS = 1.0
+
+# the paths and methods of a generated router, with a trivial endpoint so that only routing is measured
+ROUTE_TEMPLATES = [(route.path.removeprefix(router_template.prefix), route.methods) for route in router_template.routes]
+
+
+async def endpoint(request):
+    return PlainTextResponse("")
+
+
+def kind_router(kind: str) -> APIRouter:
+    router = APIRouter(prefix=f"/{kind}")
+    for path, methods in ROUTE_TEMPLATES:
+        router.routes.append(Route(f"/{kind}{path}", endpoint, methods=list(methods)))
+    return router
+
+
+def linear_app(kinds: list[str]) -> FastAPI:
+    app = FastAPI()
+    for kind in kinds:
+        app.router.routes.extend(kind_router(kind).routes)
+    return app
+
+
+def dispatch_app(kinds: list[str]) -> FastAPI:
+    app = FastAPI()
+    registry = KindRegistry(app)
+    for kind in kinds:
+        registry.register_router(kind, kind_router(kind))
+    app.router.routes.append(RegistryRoute(registry))
+    return app
+
+
+async def request_time_us(app: FastAPI, path: str) -> float:
+    scope = {
+        "type": "http",
+        "method": "PUT",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    start = time.perf_counter()
+    requests = 0
+    while requests < REQUESTS and time.perf_counter() - start < BUDGET_SECONDS:
+        await app(scope, receive, send)
+        requests += 1
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main() -> None:
+    print(f"{'kinds':>6}{'linear':>12}{'dispatch':>12}  (us/request, last registered kind)")
+    for count in KIND_COUNTS:
+        kinds = [f"kind{index}" for index in range(count)]
+        # the last kind is the worst case for the linear scan
+        path = f"/{kinds[-1]}/00000000-0000-0000-0000-000000000000/state/"
+        linear = asyncio.run(request_time_us(linear_app(kinds), path))
+        dispatch = asyncio.run(request_time_us(dispatch_app(kinds), path))
+        print(f"{count:>6}{linear:>12.1f}{dispatch:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
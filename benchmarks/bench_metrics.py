@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, FastAPI, Response
+from sqlalchemy import create_engine, text
+
+from app.metrics import MetricsMiddleware, install_query_events, remove_query_events
+from app.routers.registry import KindRegistry, RegistryRoute
+from app.settings import database_settings
+
+REQUESTS = 10_000
+QUERIES = 2_000
+ROUNDS = 5
+PATH = "/bench/00000000-0000-0000-0000-000000000000/state/"
+
+
+async def endpoint(uuid: str) -> Response:
+    return Response(b'"NEW"', media_type="application/json")
+
+
+def kind_app() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(prefix="/bench")
+    router.add_api_route("/{uuid}/state/", endpoint, methods=["PUT"])
+    registry = KindRegistry(app)
+    registry.register_router("bench", router)
+    app.router.routes.append(RegistryRoute(registry))
+    return app
+
+
+async def request_time_us(app) -> float:
+    scope = {
+        "type": "http",
+        "method": "PUT",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def query_time_us() -> float:
+    engine = create_engine(database_settings.url)
+    with engine.connect() as connection:
+        statement = text("SELECT 1")
+        connection.execute(statement)
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            connection.execute(statement)
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed / QUERIES * 1e6
+
+
+def main() -> None:
+    # bare and instrumented runs are interleaved so that drift of a shared machine hits both alike
+    app = kind_app()
+    requests = {"bare": [], "instrumented": []}
+    queries = {"bare": [], "instrumented": []}
+    for _ in range(ROUNDS):
+        requests["bare"].append(asyncio.run(request_time_us(app)))
+        requests["instrumented"].append(asyncio.run(request_time_us(MetricsMiddleware(app))))
+        remove_query_events()
+        queries["bare"].append(query_time_us())
+        install_query_events()
+        queries["instrumented"].append(query_time_us())
+    for name, timings in (("request", requests), ("query", queries)):
+        bare, instrumented = min(timings["bare"]), min(timings["instrumented"])
+        print(f"{name:<10}{bare:10.1f}{instrumented:10.1f} us  (+{instrumented - bare:.1f} us, best of {ROUNDS})")
+
+
+if __name__ == '__main__':
+    main()
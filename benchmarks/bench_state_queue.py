@@ -0,0 +1,67 @@
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete
+
+from app.db import crud
+from app.db.database import Base, SessionLocal, engine
+from app.db.state_queue import StateQueue
+from app.models.app_model import App, StateEnum
+
+DOCUMENTS = 500
+TRANSITIONS = (StateEnum.INSTALLING, StateEnum.RUNNING)
+
+
+def create_documents() -> list:
+    documents = [
+        App(
+            uuid=uuid4(),
+            kind="bench",
+            document_kind="bench",
+            name="bench",
+            version="1.0.0",
+            description="bench",
+            state=StateEnum.NEW,
+            configuration={},
+        )
+        for _ in range(DOCUMENTS)
+    ]
+    with SessionLocal() as db:
+        crud.create_documents(db, documents)
+    return [document.uuid for document in documents]
+
+
+def direct(uuids: list) -> float:
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        for state in TRANSITIONS:
+            for uuid in uuids:
+                crud.update_document_state(db, uuid, state)
+    return time.perf_counter() - start
+
+
+def queued(uuids: list) -> float:
+    queue = StateQueue(SessionLocal)
+    start = time.perf_counter()
+    for state in TRANSITIONS:
+        for uuid in uuids:
+            queue.enqueue(uuid, state)
+    queue.close()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    transitions = DOCUMENTS * len(TRANSITIONS)
+    try:
+        for function in (direct, queued):
+            seconds = function(create_documents())
+            print(f"{function.__name__:<10}{seconds * 1e6 / transitions:10.1f} us/transition ({seconds:.2f}s)")
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(App).where(App.kind == "bench"))
+            db.commit()
+
+
+if __name__ == '__main__':
+    main()
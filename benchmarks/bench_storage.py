@@ -0,0 +1,164 @@
+import argparse
+import json
+import random
+import string
+import time
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import Connection, Engine, create_engine, select, text
+
+from app.db import statements
+from app.db.database import Base, engine
+from app.settings import database_settings
+from benchmarks.bench_suite import synthetic_document
+
+ROOT = Path(__file__).resolve().parents[1]
+# up to the current layout, whose document JSON also reads document_kind; 005 does not depend on 004 and runs first,
+# so the VACUUM FULL of 004 also compacts the rows 005 rewrites
+MIGRATIONS = (ROOT / "db/migrations/005-document-kind.sql", ROOT / "db/migrations/004-configuration-column.sql")
+SCHEMA = "bench_storage"
+CHUNK_SIZE = 1000
+ROUNDS = 3
+# random letters barely compress, so long descriptions end up in TOAST as real ones do
+LETTERS = string.ascii_lowercase + "     "
+
+# the layout before the migration: the whole document is stored in json, metadata included
+LEGACY_TABLE = """
+    CREATE TABLE apps (
+        uuid UUID PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        name VARCHAR(128) NOT NULL,
+        version VARCHAR(255) NOT NULL,
+        description VARCHAR(4096) NOT NULL,
+        state public.state_enum,
+        json JSONB NOT NULL,
+        revision INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE INDEX ix_apps_kind_uuid ON apps (kind, uuid);
+    CREATE INDEX ix_apps_kind_state_uuid ON apps (kind, state, uuid);
+    CREATE INDEX ix_apps_json ON apps USING gin (json jsonb_path_ops)
+"""
+
+INSERT_LEGACY = """
+    INSERT INTO apps (uuid, kind, name, version, description, state, json)
+    SELECT (d ->> 'uuid')::uuid, d ->> 'kind', d ->> 'name', d ->> 'version', d ->> 'description', 'NEW', d - 'uuid'
+    FROM jsonb_array_elements(CAST(:documents AS jsonb)) AS d
+"""
+
+SIZES = """
+    SELECT
+        pg_relation_size(c.oid) AS heap,
+        coalesce(pg_total_relation_size(nullif(c.reltoastrelid, 0)), 0) AS toast,
+        pg_indexes_size(c.oid) AS indexes,
+        pg_total_relation_size(c.oid) AS total,
+        (SELECT count(*) FROM apps) AS rows,
+        (SELECT avg(pg_column_size(apps.*))::int FROM apps) AS row_bytes
+    FROM pg_class c
+    WHERE c.oid = 'apps'::regclass
+"""
+
+
+def synthetic_documents(count: int, description_length: int, fields: int) -> list[dict]:
+    documents = []
+    for index in range(count):
+        description = "".join(random.Random(index).choices(LETTERS, k=description_length))
+        documents.append(
+            {"uuid": str(uuid4()), **synthetic_document("bench", fields, index), "description": description}
+        )
+    return documents
+
+
+def bench_engine(url: str) -> Engine:
+    return create_engine(
+        url,
+        isolation_level="AUTOCOMMIT",
+        connect_args={"options": f"-c search_path={SCHEMA},public"},
+    )
+
+
+def create_legacy(connection: Connection, documents: list[dict]) -> None:
+    connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+    connection.exec_driver_sql(LEGACY_TABLE)
+    for start in range(0, len(documents), CHUNK_SIZE):
+        connection.execute(text(INSERT_LEGACY), {"documents": json.dumps(documents[start : start + CHUNK_SIZE])})
+    connection.exec_driver_sql("VACUUM ANALYZE apps")
+
+
+def migrate(connection: Connection) -> None:
+    # the statements run one by one, VACUUM FULL cannot run inside the implicit transaction of a multi-statement query
+    for migration in MIGRATIONS:
+        for statement in migration.read_text().split(";\n"):
+            lines = [line for line in statement.splitlines() if not line.startswith("--")]
+            if "".join(lines).strip():
+                connection.exec_driver_sql("\n".join(lines))
+
+
+def sizes(connection: Connection) -> dict:
+    return dict(connection.execute(text(SIZES)).one()._mapping)
+
+
+def read_time(connection: Connection, statement) -> float:
+    # every document rendered as the JSON the API serves, which reads the JSONB and its TOAST
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        connection.execute(statement).all()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(documents: int, description_length: int, fields: int, url: str = database_settings.url) -> dict:
+    # the legacy table lives in a schema of its own next to the application's, whose state_enum it uses
+    with bench_engine(url).connect() as connection:
+        try:
+            create_legacy(connection, synthetic_documents(documents, description_length, fields))
+            before = {
+                **sizes(connection),
+                "read_s": read_time(connection, text("SELECT row_to_json(apps)::text FROM apps")),
+            }
+            migrate(connection)
+            after = {**sizes(connection), "read_s": read_time(connection, select(statements.document_json()))}
+        finally:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    meta = {"documents": documents, "description_length": description_length, "fields": fields}
+    return {"meta": meta, "before": before, "after": after}
+
+
+def print_report(report: dict) -> None:
+    print(", ".join(f"{key}={value}" for key, value in report["meta"].items()))
+    print(f"{'':<12}{'before':>14}{'after':>14}{'change':>10}")
+    for key in ("heap", "toast", "indexes", "total", "row_bytes", "read_s"):
+        before, after = report["before"][key], report["after"][key]
+        change = f"{(after - before) / before:+.1%}" if before else "-"
+        if key == "read_s":
+            print(f"{'read (ms)':<12}{before * 1000:>14.1f}{after * 1000:>14.1f}{change:>10}")
+        elif key == "row_bytes":
+            print(f"{key:<12}{before:>14}{after:>14}{change:>10}")
+        else:
+            print(f"{key + ' (kB)':<12}{before // 1024:>14}{after // 1024:>14}{change:>10}")
+
+
+def init_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Table and TOAST size before and after the configuration-only JSONB")
+    parser.add_argument("--documents", type=int, default=20_000)
+    parser.add_argument("--description-length", type=int, default=2000)
+    parser.add_argument("--fields", type=int, default=10, help="fields in every configuration section")
+    parser.add_argument("-o", "--output", help="write the report as JSON")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = init_parser().parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    report = run(args.documents, args.description_length, args.fields)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
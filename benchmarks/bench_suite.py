@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+BATCH_SIZE = 100
+# lower is better for every metric except the throughput
+HIGHER_IS_BETTER = {"rps"}
+
+Request = tuple[str, str, dict[str, Any]]
+
+
+def synthetic_schema(index: int, fields: int) -> dict:
+    def section(name: str) -> dict:
+        return {
+            "title": name.title(),
+            "type": "object",
+            "properties": {
+                f"{name}_{field}": {"title": f"{name} {field}", "type": "string"} for field in range(fields)
+            },
+        }
+
+    with open(ROOT / "app/schemas/main_schema.json") as f:
+        schema = json.load(f)
+    schema["properties"]["kind"]["title"] = f"Bench{index:04d}"
+    schema["properties"]["configuration"] = {
+        "type": "object",
+        "properties": {"specification": section("specification"), "settings": section("settings")},
+        "additionalProperties": False,
+        "required": ["specification", "settings"],
+    }
+    schema.pop("definitions")
+    return schema
+
+
+def synthetic_document(kind: str, fields: int, index: int) -> dict:
+    return {
+        "kind": kind,
+        "name": f"{kind} document {index}",
+        "description": f"synthetic {kind} document",
+        "version": f"1.0.{index}",
+        "configuration": synthetic_configuration(fields, index),
+    }
+
+
+def synthetic_configuration(fields: int, index: int) -> dict:
+    return {
+        name: {f"{name}_{field}": f"{name} {field} value {index}" for field in range(fields)}
+        for name in ("specification", "settings")
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def generation_time(arguments: list[str], cwd: Path) -> float:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "app.cli", *arguments], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise RuntimeError(f"app.cli {' '.join(arguments)} failed:\n{result.stdout}{result.stderr}")
+    return time.perf_counter() - start
+
+
+def generate(work: Path, kinds: int, fields: int, jobs: int, use_async: bool) -> dict:
+    schemas = work / "schemas"
+    for directory in (schemas, work / "app/bench_models", work / "app/bench_routes"):
+        directory.mkdir(parents=True)
+    for index in range(kinds):
+        (schemas / f"bench{index}.json").write_text(json.dumps(synthetic_schema(index, fields)))
+    models = generation_time(["gen-models", "-j", "schemas", "-o", "app/bench_models", "--jobs", str(jobs)], work)
+    rest = ["gen-rest", "-m", "app/bench_models", "-o", "app/bench_routes", "--jobs", str(jobs)]
+    routers = generation_time(rest + ["--async"] if use_async else rest, work)
+    return {
+        "gen-models": {"seconds": models, "per_kind_ms": models / kinds * 1000},
+        "gen-rest": {"seconds": routers, "per_kind_ms": routers / kinds * 1000},
+    }
+
+
+async def run_phase(client, requests: list[Request], expected: int, concurrency: int) -> tuple[list[float], list]:
+    latencies: list[float] = [0.0] * len(requests)
+    responses: list = [None] * len(requests)
+    queue = iter(range(len(requests)))
+
+    async def worker() -> None:
+        for index in queue:
+            method, url, options = requests[index]
+            start = time.perf_counter()
+            response = await client.request(method, url, **options)
+            latencies[index] = time.perf_counter() - start
+            if response.status_code != expected:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text}")
+            responses[index] = response
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, responses
+
+
+async def exercise(app, kinds: list[str], fields: int, documents: int, concurrency: int) -> dict:
+    import httpx
+
+    results = {}
+
+    async def phase(name: str, requests: list[Request], expected: int = 200) -> list:
+        start = time.perf_counter()
+        latencies, responses = await run_phase(client, requests, expected, concurrency)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "requests": len(requests),
+            "p50_ms": percentile(latencies, 0.5) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "rps": len(requests) / elapsed,
+        }
+        return responses
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        owners = [kind for kind in kinds for _ in range(documents)]
+        created = await phase(
+            "POST /{kind}/",
+            [
+                ("POST", f"/{kind}/", {"json": synthetic_document(kind, fields, index)})
+                for index, kind in enumerate(owners)
+            ],
+            201,
+        )
+        singles = [(kind, response.json()) for kind, response in zip(owners, created)]
+
+        batch_owners = [kind for kind in kinds for _ in range(max(1, documents // BATCH_SIZE))]
+        batch = [synthetic_document("", fields, index) for index in range(BATCH_SIZE)]
+        batches = await phase(
+            "POST /{kind}/batch",
+            [("POST", f"/{kind}/batch", {"json": [{**item, "kind": kind} for item in batch]}) for kind in batch_owners],
+        )
+        batched = [(kind, item["uuid"]) for kind, response in zip(batch_owners, batches) for item in response.json()]
+
+        await phase("GET /{kind}/{uuid}/", [("GET", f"/{kind}/{uuid}/", {}) for kind, uuid in singles])
+        await phase("GET /{kind}/{uuid}/state/", [("GET", f"/{kind}/{uuid}/state/", {}) for kind, uuid in singles])
+        await phase(
+            "PUT /{kind}/{uuid}/state/",
+            [("PUT", f"/{kind}/{uuid}/state/", {"params": {"state": "RUNNING"}}) for kind, uuid in singles],
+        )
+        configurations = [synthetic_configuration(fields, index + 1) for index in range(len(singles))]
+        await phase(
+            "PUT /{kind}/{uuid}/configuration/",
+            [
+                ("PUT", f"/{kind}/{uuid}/configuration/", {"json": configuration})
+                for (kind, uuid), configuration in zip(singles, configurations)
+            ],
+        )
+        patch_headers = {"Content-Type": "application/merge-patch+json"}
+        await phase(
+            "PATCH /{kind}/{uuid}/configuration/",
+            [
+                (
+                    "PATCH",
+                    f"/{kind}/{uuid}/configuration/",
+                    {"content": json.dumps({"settings": configuration["settings"]}), "headers": patch_headers},
+                )
+                for (kind, uuid), configuration in zip(singles, configurations)
+            ],
+        )
+        await phase(
+            "PUT /{kind}/{uuid}/settings/",
+            [
+                ("PUT", f"/{kind}/{uuid}/settings/", {"json": {"replicas": index}})
+                for index, (kind, uuid) in enumerate(singles)
+            ],
+        )
+        await phase("GET /{kind}/", [("GET", f"/{kind}/", {"params": {"limit": 100}}) for kind in owners])
+        await phase(
+            "POST /{kind}/search",
+            [
+                (
+                    "POST",
+                    f"/{kind}/search",
+                    {"json": {"equals": {"configuration.settings.settings_0": f"settings 0 value {index}"}}},
+                )
+                for index, kind in enumerate(owners)
+            ],
+        )
+        await phase(
+            "DELETE /{kind}/{uuid}/", [("DELETE", f"/{kind}/{uuid}/", {}) for kind, uuid in singles + batched], 204
+        )
+    return results
+
+
+def run(kinds: int, fields: int, documents: int, concurrency: int, jobs: int, use_async: bool) -> dict:
+    import app
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        work = Path(work_dir)
+        generation = generate(work, kinds, fields, jobs, use_async)
+        # the generated modules are addressed as app.bench_models and app.bench_routes
+        app.__path__.append(str(work / "app"))
+        from app.fastapi_app import app as fastapi_app
+        from app.fastapi_app import include_routers_from_init
+        from app.routers.registry import registry
+
+        names = [f"bench{index:04d}" for index in range(kinds)]
+        include_routers_from_init("app.bench_routes")
+        try:
+            endpoints = asyncio.run(exercise(fastapi_app, names, fields, documents, concurrency))
+        finally:
+            for name in names:
+                registry.unregister_router(name)
+            app.__path__.remove(str(work / "app"))
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "kinds": kinds,
+            "fields": fields,
+            "documents": documents,
+            "concurrency": concurrency,
+            "jobs": jobs,
+            "async": use_async,
+        },
+        "generation": generation,
+        "endpoints": endpoints,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    parameters = [
+        key
+        for key in ("kinds", "fields", "documents", "concurrency", "jobs", "async")
+        if baseline["meta"].get(key) != current["meta"].get(key)
+    ]
+    if parameters:
+        print(f"warning: the runs differ in {', '.join(parameters)}, the comparison may not be meaningful")
+    for section in ("generation", "endpoints"):
+        for name, metrics in current[section].items():
+            previous = baseline[section].get(name)
+            if previous is None:
+                continue
+            for metric, value in metrics.items():
+                if metric in ("requests", "seconds") or not previous.get(metric):
+                    continue
+                change = (value - previous[metric]) / previous[metric]
+                regressed = -change > threshold if metric in HIGHER_IS_BETTER else change > threshold
+                print(
+                    f"{'REGRESSION' if regressed else '':<12}{name:<40}{metric:<12}{previous[metric]:>12.2f}{value:>12.2f}{change:>+9.1%}"
+                )
+                if regressed:
+                    regressions.append(f"{name} {metric}")
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    for name, metrics in results["generation"].items():
+        print(f"{name:<40}{metrics['per_kind_ms']:>10.1f} ms/kind")
+    print(f"{'endpoint':<40}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, metrics in results["endpoints"].items():
+        print(f"{name:<40}{metrics['p50_ms']:>10.2f}{metrics['p99_ms']:>10.2f}{metrics['rps']:>10.1f}")
+
+
+def init_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load and regression benchmarks of the generated routers and the CLI")
+    subparsers = parser.add_subparsers(dest="subcommand", required=True)
+    run_subparser = subparsers.add_parser("run", help="Generate synthetic kinds and benchmark them")
+    run_subparser.add_argument("--kinds", type=int, default=5, help="Number of synthetic schemas")
+    run_subparser.add_argument("--fields", type=int, default=10, help="Fields per configuration section")
+    run_subparser.add_argument("--documents", type=int, default=200, help="Documents per kind")
+    run_subparser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    run_subparser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="Parallel gen-models/gen-rest jobs"
+    )
+    run_subparser.add_argument("--async", dest="use_async", action="store_true", help="Benchmark the async routers")
+    run_subparser.add_argument("-o", "--output", help="Write the results as a JSON baseline")
+    compare_subparser = subparsers.add_parser("compare", help="Compare a run against a baseline")
+    compare_subparser.add_argument("baseline", help="Baseline JSON")
+    compare_subparser.add_argument("current", help="Current JSON")
+    compare_subparser.add_argument(
+        "--threshold", type=float, default=0.1, help="Relative change reported as a regression (default: 0.1)"
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = init_parser()
+    args = parser.parse_args(argv)
+    if args.subcommand == "run":
+        if min(args.kinds, args.fields, args.documents, args.concurrency, args.jobs) < 1:
+            parser.error("--kinds, --fields, --documents, --concurrency and --jobs must be positive")
+        results = run(args.kinds, args.fields, args.documents, args.concurrency, args.jobs, args.use_async)
+        print_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import main_validator
+from app.models.main_model import MainModel
+from app.test.test_api import valid_json
+
+NUMBER = 10_000
+
+
+def pydantic_validation(body: bytes) -> dict:
+    return jsonable_encoder(MainModel.parse_raw(body))
+
+
+def compiled_validation(body: bytes) -> dict:
+    return main_validator.validate_json(body)
+
+
+def main() -> None:
+    body = json.dumps(valid_json).encode()
+    results = {}
+    for function in (pydantic_validation, compiled_validation):
+        seconds = min(timeit.repeat(lambda: function(body), number=NUMBER, repeat=5))
+        results[function.__name__] = seconds / NUMBER * 1e6
+        print(f"{function.__name__:<24}{results[function.__name__]:8.2f} us/document")
+    print(f"speedup {results['pydantic_validation'] / results['compiled_validation']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import Engine, delete, event
+
+from app.db import crud, notifications
+from app.db.database import Base, SessionLocal, engine
+from app.fastapi_app import app
+from app.models.app_model import App, StateEnum
+
+WATCHERS = 200
+# the transition happens this long after the watchers start, pollers ask every POLL_INTERVAL until then
+WAIT = 2.0
+POLL_INTERVAL = 0.25
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def create_document() -> str:
+    document = App(
+        uuid=uuid4(),
+        kind="bench",
+        document_kind="bench",
+        name="bench",
+        version="1.0.0",
+        description="bench",
+        state=StateEnum.NEW,
+        configuration={},
+    )
+    with SessionLocal() as db:
+        crud.create_document(db, document)
+    return str(document.uuid)
+
+
+async def poll(client: httpx.AsyncClient, uuid: str) -> float:
+    while (await client.get(f"/test/{uuid}/state/")).json() != StateEnum.RUNNING.value:
+        await asyncio.sleep(POLL_INTERVAL)
+    return time.perf_counter()
+
+
+async def watch(client: httpx.AsyncClient, uuid: str) -> float:
+    response = await client.get(
+        f"/test/{uuid}/state/watch", params={"timeout": WAIT * 5}, headers={"If-None-Match": '"1"'}
+    )
+    assert response.json() == StateEnum.RUNNING.value, response
+    return time.perf_counter()
+
+
+async def measure(watcher) -> tuple[int, float]:
+    uuid = create_document()
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            watchers = [asyncio.create_task(watcher(client, uuid)) for _ in range(WATCHERS)]
+            await asyncio.sleep(WAIT)
+            with SessionLocal() as db:
+                await asyncio.to_thread(crud.update_document_state, db, uuid, StateEnum.RUNNING)
+            committed = time.perf_counter()
+            seen = await asyncio.gather(*watchers)
+    finally:
+        event.remove(Engine, "before_cursor_execute", counter)
+    # the transition itself is one SELECT and one UPDATE
+    return counter.count - 2, max(seen) - committed
+
+
+async def run() -> None:
+    for watcher in (poll, watch):
+        queries, latency = await measure(watcher)
+        print(f"{watcher.__name__:<8}{queries:8d} queries{latency * 1000:10.1f} ms until the last of {WATCHERS} saw it")
+    if notifications.notifier is not None:
+        await notifications.notifier.close()
+
+
+def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    try:
+        asyncio.run(run())
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(App).where(App.kind == "bench"))
+            db.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,51 @@ CREATE TYPE state_enum AS ENUM ('NEW', 'INSTALLING', 'RUNNING');
 CREATE TABLE IF NOT EXISTS apps (
     uuid UUID PRIMARY KEY,
     kind VARCHAR(32) NOT NULL,
+    document_kind VARCHAR(32) NOT NULL,
     name VARCHAR(128) NOT NULL,
     version VARCHAR(255) NOT NULL,
     description VARCHAR(4096) NOT NULL,
     state state_enum,
-    json JSONB NOT NULL
+    configuration JSONB NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1
 );
+CREATE INDEX IF NOT EXISTS ix_apps_kind_uuid ON apps (kind, uuid);
+CREATE INDEX IF NOT EXISTS ix_apps_kind_state_uuid ON apps (kind, state, uuid);
+CREATE INDEX IF NOT EXISTS ix_apps_configuration ON apps USING gin (configuration jsonb_path_ops);
+
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF jsonb_typeof(patch) IS DISTINCT FROM 'object' THEN
+        RETURN patch;
+    END IF;
+    IF jsonb_typeof(target) IS DISTINCT FROM 'object' THEN
+        target := '{}'::jsonb;
+    END IF;
+    RETURN (
+        SELECT coalesce(
+            jsonb_object_agg(
+                coalesce(p.key, t.key),
+                CASE WHEN p.key IS NULL THEN t.value ELSE jsonb_merge_patch(t.value, p.value) END
+            ),
+            '{}'::jsonb
+        )
+        FROM jsonb_each(target) AS t
+        FULL OUTER JOIN jsonb_each(patch) AS p ON t.key = p.key
+        WHERE p.key IS NULL OR jsonb_typeof(p.value) <> 'null'
+    );
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_app_state() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify(
+        'app_state',
+        json_build_object('uuid', NEW.uuid, 'kind', NEW.kind, 'state', NEW.state, 'revision', NEW.revision)::text
+    );
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER apps_notify_state AFTER UPDATE OF state ON apps
+FOR EACH ROW WHEN (OLD.state IS DISTINCT FROM NEW.state) EXECUTE FUNCTION notify_app_state();
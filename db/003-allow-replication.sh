@@ -0,0 +1,7 @@
+#!/bin/bash
+
+set -e
+set -u
+
+# the db-replica service clones and streams from this server over the network
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
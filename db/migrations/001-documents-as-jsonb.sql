@@ -0,0 +1,3 @@
+-- Documents used to be stored as a JSON-encoded string inside the JSONB column.
+-- Unwrap them into real JSONB objects so jsonb_set and jsonb_merge_patch can work on them.
+UPDATE apps SET json = (json #>> '{}')::jsonb WHERE jsonb_typeof(json) = 'string';
@@ -0,0 +1,2 @@
+-- Per-row revision counter backing the ETag / If-Match support of the document endpoints.
+ALTER TABLE apps ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,14 @@
+-- Publishes every state transition on the app_state channel for the watch endpoints (LISTEN/NOTIFY).
+CREATE OR REPLACE FUNCTION notify_app_state() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify(
+        'app_state',
+        json_build_object('uuid', NEW.uuid, 'kind', NEW.kind, 'state', NEW.state, 'revision', NEW.revision)::text
+    );
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS apps_notify_state ON apps;
+CREATE TRIGGER apps_notify_state AFTER UPDATE OF state ON apps
+FOR EACH ROW WHEN (OLD.state IS DISTINCT FROM NEW.state) EXECUTE FUNCTION notify_app_state();
@@ -0,0 +1,12 @@
+-- The metadata of a document (kind, name, version, description) is kept in its columns only and the JSONB holds
+-- just the configuration; the whole document is rebuilt on read.
+BEGIN;
+ALTER TABLE apps ADD COLUMN IF NOT EXISTS configuration JSONB;
+UPDATE apps SET configuration = coalesce(json -> 'configuration', '{}'::jsonb) WHERE configuration IS NULL;
+ALTER TABLE apps ALTER COLUMN configuration SET NOT NULL;
+DROP INDEX IF EXISTS ix_apps_json;
+CREATE INDEX IF NOT EXISTS ix_apps_configuration ON apps USING gin (configuration jsonb_path_ops);
+ALTER TABLE apps DROP COLUMN IF EXISTS json;
+COMMIT;
+-- a dropped column keeps its space until the table is rewritten; VACUUM FULL locks the table while it runs
+VACUUM FULL apps;
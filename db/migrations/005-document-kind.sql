@@ -0,0 +1,9 @@
+-- apps.kind becomes the kind of the router a document was posted to and the kind field of the document moves to
+-- document_kind. The router of existing rows was never recorded, so they keep their own kind in apps.kind: rows whose
+-- kind does not name their router stay invisible to its listing, search and bulk writes until they are moved, e.g.
+-- UPDATE apps SET kind = 'check' WHERE kind = 'this kind of check';
+BEGIN;
+ALTER TABLE apps ADD COLUMN IF NOT EXISTS document_kind VARCHAR(32);
+UPDATE apps SET document_kind = kind WHERE document_kind IS NULL;
+ALTER TABLE apps ALTER COLUMN document_kind SET NOT NULL;
+COMMIT;